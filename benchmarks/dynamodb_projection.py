@@ -0,0 +1,53 @@
+"""
+Reads a DynamoDB table through utils.read_from_dynamodb in full and pruned to its declared
+DYNAMODB_SCHEMAS entry, and reports for each: ingestion time (read + toDF), number of
+columns, cached size in memory, and the time to explode Interactions where the table has it.
+
+Run with the AWS Glue 4.0 libraries available (e.g. the amazon/aws-glue-libs image), against
+the real table or DynamoDB Local (see benchmarks/dynamodb_scan.py to seed one):
+    spark-submit benchmarks/dynamodb_projection.py --table EnterpriseCampaigns
+    spark-submit benchmarks/dynamodb_projection.py --table CustomerSupport --DYNAMODB_ENDPOINT http://localhost:8000
+"""
+import argparse
+import time
+from pyspark.context import SparkContext
+from pyspark.sql import functions as F
+from awsglue.context import GlueContext
+from glue_etl_pipeline.glue_config import DYNAMODB_REGION
+from glue_etl_pipeline.utils import read_from_dynamodb
+
+
+def cached_size(spark, df):
+    """
+    Bytes the DataFrame takes in the block manager once cached.
+    """
+    df.persist()
+    df.count()
+    storage = spark.sparkContext._jsc.sc().getRDDStorageInfo()
+    size_bytes = sum(info.memSize() + info.diskSize() for info in storage)
+    df.unpersist(blocking=True)
+    return size_bytes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--table", default="EnterpriseCampaigns")
+    parser.add_argument("--region", default=DYNAMODB_REGION)
+    options, _ = parser.parse_known_args()
+
+    glueContext = GlueContext(SparkContext.getOrCreate())
+    spark = glueContext.spark_session
+
+    for label, prune in (("full", False), ("pruned", True)):
+        start_time = time.time()
+        df = read_from_dynamodb(glueContext, options.table, options.region, verbose=False, prune=prune)
+        ingest_seconds = time.time() - start_time
+        size_bytes = cached_size(spark, df)
+        line = (f"{label:<7} ingest {ingest_seconds:7.2f}s  columns {len(df.columns):>3}  "
+                f"cached {size_bytes / (1024 * 1024):9.1f} MB")
+        if "Interactions" in df.columns:
+            start_time = time.time()
+            df.select("CustomerID", F.explode("Interactions").alias("Interaction")).select("Interaction.*") \
+                .write.format("noop").mode("overwrite").save()
+            line += f"  explode {time.time() - start_time:7.2f}s"
+        print(line)
@@ -0,0 +1,65 @@
+"""
+Seeds a table in DynamoDB Local and times glue_etl_pipeline.dynamodb_scan.scan_table with
+different segment counts, printing every segment's item count, pages and time.
+
+Start DynamoDB Local (docker run -p 8000:8000 amazon/dynamodb-local), then run with pyspark
+and boto3:
+    AWS_ACCESS_KEY_ID=local AWS_SECRET_ACCESS_KEY=local \\
+    spark-submit benchmarks/dynamodb_scan.py --endpoint http://localhost:8000 --items 50000 --segments 1 4 8
+"""
+import argparse
+import random
+import time
+import boto3
+from pyspark.sql import SparkSession
+from glue_etl_pipeline.dynamodb_scan import scan_table
+
+REGION = "ap-south-1"
+
+
+def seed_table(endpoint_url, table_name, items):
+    client = boto3.client("dynamodb", region_name=REGION, endpoint_url=endpoint_url)
+    if table_name in client.list_tables()["TableNames"]:
+        client.delete_table(TableName=table_name)
+        client.get_waiter("table_not_exists").wait(TableName=table_name)
+    client.create_table(
+        TableName=table_name,
+        KeySchema=[{"AttributeName": "TicketID", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "TicketID", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    client.get_waiter("table_exists").wait(TableName=table_name)
+
+    table = boto3.resource("dynamodb", region_name=REGION, endpoint_url=endpoint_url).Table(table_name)
+    rng = random.Random(42)
+    with table.batch_writer() as batch:
+        for index in range(items):
+            batch.put_item(Item={
+                "TicketID": f"T{index:08d}",
+                "CustomerID": rng.randint(1, items // 5 + 1),
+                "Timestamp": f"2025-0{rng.randint(1, 9)}-{rng.randint(10, 28)}T10:00:00",
+                "Issue": {"Status": rng.choice(["Open", "Resolved", "Pending"]), "Category": "Billing"},
+            })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--endpoint", default="http://localhost:8000")
+    parser.add_argument("--table", default="CustomerSupportBenchmark")
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--segments", type=int, nargs="+", default=[1, 4, 8])
+    options = parser.parse_args()
+
+    seed_table(options.endpoint, options.table, options.items)
+    spark = SparkSession.builder.appName("dynamodb_scan").getOrCreate()
+
+    for total_segments in options.segments:
+        start_time = time.time()
+        df, stats = scan_table(spark, options.table, REGION, total_segments, endpoint_url=options.endpoint)
+        row_count = df.count()
+        duration = time.time() - start_time
+        for segment in stats:
+            print(f"  segment {segment['segment']:>3}  items {segment['items']:>8}  pages {segment['pages']:>4}  "
+                  f"time {segment['seconds']:>6.2f}s")
+        print(f"{total_segments:>3} segment(s): {row_count} rows in {duration:.2f}s "
+              f"(slowest segment {max(segment['seconds'] for segment in stats):.2f}s)")
@@ -0,0 +1,89 @@
+"""
+Compares the customers fraud_detection flags from exact COUNT(DISTINCT ip_address) with the
+ones flagged from merged daily HyperLogLog sketches (--FRAUD_LOGIN_MODE sketch), for several
+precisions, on generated LoginHistory. Reports precision/recall of the flagged set and the
+sketch storage per customer-day.
+
+Runs in plain Python, no Spark session or Glue job:
+    python benchmarks/fraud_sketch_accuracy.py --customers 20000 --precisions 8 10 12 14
+"""
+import argparse
+import random
+import time
+from glue_etl_pipeline import hll
+
+WINDOW_DAYS = 31
+UNIQUE_IP_THRESHOLD = 3
+ATTEMPT_THRESHOLD = 10
+
+
+def generate_logins(customers, seed):
+    """
+    Yields (customer_id, day, ip_address). Most customers log in from one or two addresses;
+    a few (shared accounts, bots) rotate through many.
+    """
+    rng = random.Random(seed)
+    for customer_id in range(customers):
+        address_count = rng.choice([1, 1, 1, 2, 2, 3, 4, 5]) if rng.random() > 0.02 else rng.randint(50, 5000)
+        addresses = [f"10.{customer_id % 256}.{rng.randint(0, 255)}.{rng.randint(0, 255)}" for _ in range(address_count)]
+        for _ in range(rng.randint(1, 9) if address_count < 50 else address_count * 2):
+            yield customer_id, rng.randrange(WINDOW_DAYS), rng.choice(addresses)
+
+
+def flagged(features):
+    return {customer_id for customer_id, (unique_ips, attempts) in features.items()
+            if unique_ips > UNIQUE_IP_THRESHOLD or attempts > ATTEMPT_THRESHOLD}
+
+
+def exact_features(logins):
+    addresses, attempts = {}, {}
+    for customer_id, _, ip_address in logins:
+        addresses.setdefault(customer_id, set()).add(ip_address)
+        attempts[customer_id] = attempts.get(customer_id, 0) + 1
+    return {customer_id: (len(addresses[customer_id]), attempts[customer_id]) for customer_id in addresses}
+
+
+def sketch_features(logins, precision):
+    # One sketch per customer per day, as update_login_sketches stores them
+    daily = {}
+    for customer_id, day, ip_address in logins:
+        daily.setdefault((customer_id, day), []).append(ip_address)
+    sketches = {key: (len(addresses), hll.add_all(hll.empty_sketch(precision), addresses)) for key, addresses in daily.items()}
+    stored_bytes = sum(len(sketch) for _, sketch in sketches.values())
+
+    # 30-day window: merge the daily sketches, as read_login_features does
+    merged = {}
+    for (customer_id, _), (attempts, sketch) in sketches.items():
+        if customer_id in merged:
+            merged_attempts, merged_sketch = merged[customer_id]
+            merged[customer_id] = (merged_attempts + attempts, hll.merge(merged_sketch, sketch))
+        else:
+            merged[customer_id] = (attempts, sketch)
+    features = {customer_id: (hll.estimate(sketch), attempts) for customer_id, (attempts, sketch) in merged.items()}
+    return features, stored_bytes / len(sketches)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=20000)
+    parser.add_argument("--precisions", type=int, nargs="+", default=[8, 10, 12, 14])
+    parser.add_argument("--seed", type=int, default=42)
+    options = parser.parse_args()
+
+    logins = list(generate_logins(options.customers, options.seed))
+    exact = exact_features(logins)
+    expected = flagged(exact)
+    print(f"{len(logins)} logins, {len(exact)} customers, {len(expected)} flagged by the exact path")
+    print(f"{'precision':>9} {'std error':>9} {'precision':>10} {'recall':>8} {'max ip error':>12} {'bytes/day':>10} {'seconds':>8}")
+
+    for precision in options.precisions:
+        start_time = time.time()
+        features, bytes_per_day = sketch_features(logins, precision)
+        duration = time.time() - start_time
+        actual = flagged(features)
+        true_positives = len(actual & expected)
+        max_error = max(abs(features[customer_id][0] - exact[customer_id][0]) / exact[customer_id][0] for customer_id in exact)
+        print(f"{precision:>9} {hll.relative_error(precision):>9.2%} "
+              f"{true_positives / len(actual) if actual else 1.0:>10.4f} "
+              f"{true_positives / len(expected) if expected else 1.0:>8.4f} "
+              f"{max_error:>12.2%} {bytes_per_day:>10.1f} {duration:>8.2f}")
@@ -0,0 +1,189 @@
+"""
+Runs each job's transform_sql and transform_dataframe on the same generated sources
+(local_harness) and checks that they return the same rows. The columns must match by name
+and type, and no row of one may be missing from the other (doubles rounded to --decimals).
+For every output it prints how the two physical plans differ in operators (the full plans
+with --plans), and the time, stages and shuffle of computing each. The summary names the
+faster implementation of each job whose results match, the one to set in JOB_IMPLEMENTATIONS.
+The run exits 1 when any output differs.
+
+Needs pyspark only:
+    spark-submit benchmarks/implementation_compare.py --jobs pricing_trends fraud_detection --scale 1
+"""
+import argparse
+import difflib
+import importlib
+import re
+import sys
+from collections import Counter
+from pyspark.sql import DataFrame
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+from pyspark.sql.types import DoubleType, FloatType
+from glue_etl_pipeline.glue_config import RUNNER_JOBS,JOB_IMPLEMENTATIONS
+from glue_etl_pipeline.instrumentation import measure
+from glue_etl_pipeline.utils import write_json
+from local_harness import get_local_spark,synthetic_sources,materialize_sources
+
+IMPLEMENTATIONS = ["sql", "dataframe"]
+# Names of the outputs of jobs whose transforms return several DataFrames, as in run_job
+OUTPUT_NAMES = {"pricing_trends": ["monthly", "quarterly", "yearly"]}
+
+
+def get_outputs(name: str, result):
+    """
+    {output: DataFrame} of what a transform returned.
+    """
+    if isinstance(result, DataFrame):
+        return {name: result}
+    return dict(zip(OUTPUT_NAMES[name], result))
+
+
+def run_transforms(spark: SparkSession, name: str):
+    """
+    {implementation: {output: DataFrame}} of both transforms of a job over the same sources,
+    read in a new session as the job would.
+    """
+    module = importlib.import_module(f"glue_etl_pipeline.{name}")
+    spark = spark.newSession()
+    sources = module.read_sources(spark)
+    return {
+        "sql": get_outputs(name, module.transform_sql(spark)),
+        "dataframe": get_outputs(name, module.transform_dataframe(*sources)),
+    }
+
+
+def compare_schemas(sql_df: DataFrame, dataframe_df: DataFrame):
+    """
+    Differences in column names and types, nullability aside.
+    """
+    sql_types = {field.name: field.dataType for field in sql_df.schema.fields}
+    dataframe_types = {field.name: field.dataType for field in dataframe_df.schema.fields}
+    differences = [f"only in sql: {column}" for column in sql_types if column not in dataframe_types]
+    differences += [f"only in dataframe: {column}" for column in dataframe_types if column not in sql_types]
+    differences += [f"{column}: sql {sql_types[column].simpleString()}, dataframe {dataframe_types[column].simpleString()}"
+                    for column in sql_types if column in dataframe_types and sql_types[column] != dataframe_types[column]]
+    return differences
+
+
+def normalize(df: DataFrame, columns, types, decimals: int) -> DataFrame:
+    """
+    The columns in one order and with the given types, floating point rounded to decimals.
+    """
+    def normalized(column):
+        value = F.col(column).cast(types[column])
+        return F.round(value, decimals).alias(column) if isinstance(types[column], (DoubleType, FloatType)) else value.alias(column)
+    return df.select(*[normalized(column) for column in columns])
+
+
+def compare_rows(sql_df: DataFrame, dataframe_df: DataFrame, decimals=6):
+    """
+    Row counts, and the rows of each result missing from the other (as multisets), over
+    the columns both have, cast to the SQL result's types.
+    """
+    types = {field.name: field.dataType for field in sql_df.schema.fields}
+    columns = sorted(column for column in types if column in dataframe_df.columns)
+    sql_rows = normalize(sql_df, columns, types, decimals)
+    dataframe_rows = normalize(dataframe_df, columns, types, decimals)
+    return {
+        "sql_rows": sql_df.count(),
+        "dataframe_rows": dataframe_df.count(),
+        "only_in_sql": sql_rows.exceptAll(dataframe_rows).count(),
+        "only_in_dataframe": dataframe_rows.exceptAll(sql_rows).count(),
+    }
+
+
+def get_plan(df: DataFrame) -> str:
+    """
+    The physical plan without expression and exchange ids, which differ between any two plans.
+    """
+    plan = df._jdf.queryExecution().executedPlan().toString()
+    return re.sub(r"#\d+|\[(plan_)?id=#?\d+\]|plan_id=\d+", "", plan)
+
+
+def get_plan_operators(plan: str) -> Counter:
+    return Counter(re.findall(r"^[\s:+\-*()\d]*([A-Z]\w+)", plan, re.MULTILINE))
+
+
+def compare_plans(sql_df: DataFrame, dataframe_df: DataFrame):
+    """
+    (operator count differences {operator: (sql, dataframe)}, unified diff of the plans).
+    """
+    sql_plan, dataframe_plan = get_plan(sql_df), get_plan(dataframe_df)
+    sql_operators, dataframe_operators = get_plan_operators(sql_plan), get_plan_operators(dataframe_plan)
+    operators = {operator: (sql_operators[operator], dataframe_operators[operator])
+                 for operator in sorted(set(sql_operators) | set(dataframe_operators))
+                 if sql_operators[operator] != dataframe_operators[operator]}
+    diff = "\n".join(difflib.unified_diff(sql_plan.splitlines(), dataframe_plan.splitlines(), "sql", "dataframe", lineterm=""))
+    return operators, diff
+
+
+def compute(spark: SparkSession, outputs):
+    """
+    Metrics of computing every output of one implementation, discarding the rows.
+    """
+    def write_all():
+        for df in outputs.values():
+            df.write.format("noop").mode("overwrite").save()
+    return measure(spark, write_all)[1]
+
+
+def compare_job(spark: SparkSession, name: str, decimals=6, show_plans=False):
+    results = run_transforms(spark, name)
+    comparison = {"job": name, "configured": JOB_IMPLEMENTATIONS.get(name), "outputs": {}}
+    # Timed first: the row comparison computes the outputs again, with persisted parts cached
+    for implementation in IMPLEMENTATIONS:
+        comparison[implementation] = compute(spark, results[implementation])
+        metrics = comparison[implementation]
+        print(f"{name} {implementation:<9} {metrics['seconds']:8.2f}s  stages {metrics['stages']:4}  "
+              f"shuffle {metrics['shuffle_read_bytes'] / 2 ** 20:9.1f} MiB")
+    for output in results["sql"]:
+        sql_df, dataframe_df = results["sql"][output], results["dataframe"][output]
+        schema_differences = compare_schemas(sql_df, dataframe_df)
+        rows = compare_rows(sql_df, dataframe_df, decimals)
+        operators, diff = compare_plans(sql_df, dataframe_df)
+        matches = not schema_differences and rows["only_in_sql"] == 0 and rows["only_in_dataframe"] == 0
+        comparison["outputs"][output] = {"matches": matches, "schema_differences": schema_differences,
+                                         **rows, "operator_differences": operators}
+
+        print(f"{name} {output}: {'MATCH' if matches else 'DIFFERENT'}  rows sql {rows['sql_rows']} "
+              f"dataframe {rows['dataframe_rows']}  only in sql {rows['only_in_sql']}  "
+              f"only in dataframe {rows['only_in_dataframe']}")
+        for difference in schema_differences:
+            print(f"    schema  {difference}")
+        for operator, (sql_count, dataframe_count) in operators.items():
+            print(f"    plan    {operator:<28} sql {sql_count}  dataframe {dataframe_count}")
+        if show_plans:
+            print(diff)
+
+    comparison["matches"] = all(output["matches"] for output in comparison["outputs"].values())
+    comparison["faster"] = min(IMPLEMENTATIONS, key=lambda implementation: comparison[implementation]["seconds"])
+    return comparison
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", nargs="*", default=RUNNER_JOBS, choices=RUNNER_JOBS)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--decimals", type=int, default=6)
+    parser.add_argument("--plans", action="store_true", help="print the unified diff of the physical plans")
+    parser.add_argument("--results", help="JSON file to write the comparisons to")
+    options, _ = parser.parse_known_args()
+
+    spark = get_local_spark("implementation_compare")
+    with synthetic_sources(materialize_sources(spark, options.scale, options.seed)):
+        comparisons = [compare_job(spark, name, options.decimals, options.plans) for name in options.jobs]
+    if options.results:
+        write_json(options.results, {"scale": options.scale, "comparisons": comparisons})
+
+    print()
+    for comparison in comparisons:
+        if comparison["matches"]:
+            verdict = f"use {comparison['faster']}"
+        else:
+            verdict = "results differ, fix before choosing"
+        print(f"{comparison['job']:<26} configured {comparison['configured']:<9} "
+              f"sql {comparison['sql']['seconds']:8.2f}s  dataframe {comparison['dataframe']['seconds']:8.2f}s  {verdict}")
+    if not all(comparison["matches"] for comparison in comparisons):
+        sys.exit(1)
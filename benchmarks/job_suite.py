@@ -0,0 +1,93 @@
+"""
+Runs every analytics job through local_harness at several scale factors and records, per
+job and scale, wall time, stages, tasks, shuffle read/write bytes, spill, skew and peak
+memory. Each job also writes its per-phase and per-stage metrics under _metrics/<job>/, next
+to its output.
+Results are written as JSON; with --baseline (an earlier results file) every job and scale
+whose time or shuffle grew by more than --tolerance is reported, and the run exits 1.
+
+Needs pyspark only. Give the driver room for the largest scale:
+    spark-submit --driver-memory 8g benchmarks/job_suite.py --scales 1 10 --results /tmp/job_suite.json
+    spark-submit --driver-memory 8g benchmarks/job_suite.py --scales 1 10 --baseline /tmp/job_suite.json
+"""
+import argparse
+import sys
+from datetime import datetime, timezone
+from pyspark.sql import SparkSession
+from glue_etl_pipeline.glue_config import RUNNER_JOBS
+from glue_etl_pipeline.instrumentation import measure
+from glue_etl_pipeline.utils import read_json,write_json,delete_path
+from local_harness import get_local_spark,synthetic_sources,materialize_sources,run_local
+
+# Compared against the baseline; memory and spill vary too much between runs to gate on
+REGRESSION_METRICS = ["seconds", "shuffle_read_bytes", "shuffle_write_bytes"]
+
+
+def run_suite(spark: SparkSession, jobs, scales, output_root: str, seed=42):
+    """
+    [{"job", "scale", metrics...}] for every job at every scale. Each scale starts from
+    empty outputs, so merged outputs are written in full.
+    """
+    results = []
+    for scale in scales:
+        output_path = f"{output_root.rstrip('/')}/scale={scale}/"
+        delete_path(output_path)
+        sources = materialize_sources(spark, scale, seed)
+        with synthetic_sources(sources):
+            for name in jobs:
+                _, metrics = measure(spark, lambda: run_local(spark, name, output_path), f"job_suite-{name}-{scale}")
+                print(f"{name:<26} scale {scale:<6} {metrics['seconds']:8.2f}s  stages {metrics['stages']:4}  "
+                      f"shuffle {metrics['shuffle_read_bytes'] / 2 ** 20:9.1f} MiB  "
+                      f"peak task memory {metrics['peak_execution_memory'] / 2 ** 20:8.1f} MiB")
+                results.append({"job": name, "scale": scale, **metrics})
+        for df in sources.values():
+            df.unpersist()
+    return results
+
+
+def find_regressions(results, baseline, tolerance=0.2):
+    """
+    (job, scale, metric, baseline value, value) for every metric that grew by more than
+    tolerance over the baseline run of the same job and scale.
+    """
+    baseline_results = {(result["job"], result["scale"]): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline_results.get((result["job"], result["scale"]))
+        if previous is None:
+            continue
+        for metric in REGRESSION_METRICS:
+            if previous[metric] and result[metric] > previous[metric] * (1 + tolerance):
+                regressions.append((result["job"], result["scale"], metric, previous[metric], result[metric]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", nargs="*", default=RUNNER_JOBS, choices=RUNNER_JOBS)
+    parser.add_argument("--scales", nargs="*", type=float, default=[1.0, 10.0])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="/tmp/job_suite")
+    parser.add_argument("--results", help="JSON file to write the results to")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--shuffle-partitions", type=int, default=8)
+    options, _ = parser.parse_known_args()
+
+    spark = get_local_spark("job_suite", options.shuffle_partitions)
+    results = run_suite(spark, options.jobs, options.scales, options.output, options.seed)
+    if options.results:
+        write_json(options.results, {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "spark_version": spark.version,
+            "default_parallelism": spark.sparkContext.defaultParallelism,
+            "shuffle_partitions": options.shuffle_partitions,
+            "results": results,
+        })
+
+    if options.baseline:
+        regressions = find_regressions(results, read_json(options.baseline), options.tolerance)
+        for job, scale, metric, previous, value in regressions:
+            print(f"REGRESSION {job} scale {scale} {metric}: {previous} -> {value}")
+        if regressions:
+            sys.exit(1)
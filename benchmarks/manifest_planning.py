@@ -0,0 +1,53 @@
+"""
+Writes a generated, partitioned output as many small files and compares the time to plan
+a read of it (building the DataFrame and its file index, then a count) by listing the
+prefix with spark.read.parquet against table_format.read_table planning from the manifest.
+
+Needs pyspark and boto3, not the Glue libraries. The listing cost grows with the prefix, so
+point --output at S3 for realistic numbers:
+    spark-submit benchmarks/manifest_planning.py --output s3://<bucket>/benchmarks/manifest_planning --files 5000
+"""
+import argparse
+import time
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+from glue_etl_pipeline.table_format import write_table,read_manifest,read_table
+
+
+def timed(action):
+    start_time = time.time()
+    result = action()
+    return result, time.time() - start_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default="/tmp/manifest_planning")
+    parser.add_argument("--rows", type=int, default=5000000)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--partitions", type=int, default=20)
+    options = parser.parse_args()
+
+    spark = SparkSession.builder.appName("manifest_planning").getOrCreate()
+    df = (
+        spark.range(options.rows)
+        .withColumn("order_year", (F.col("id") % options.partitions).cast("int") + 2000)
+        .withColumn("product_id", (F.col("id") * 7919) % 100000)
+        .withColumn("avg_price", F.rand(42) * 100)
+        .repartition(options.files // options.partitions)
+    )
+    # No target file size, so every task writes one small file per partition value
+    write_table(df, options.output, partition_by=["order_year"], target_file_bytes=None)
+    manifest = read_manifest(options.output)
+    print(f"version {manifest['version']}: {len(manifest['files'])} files, {manifest['row_count']} rows")
+
+    listed_path = manifest["snapshot_path"]
+    for label, read in (
+        ("listing ", lambda: spark.read.parquet(listed_path)),
+        ("manifest", lambda: read_table(spark, options.output)),
+        ("listing, order_year=2001 ", lambda: spark.read.parquet(listed_path).filter(F.col("order_year") == 2001)),
+        ("manifest, order_year=2001", lambda: read_table(spark, options.output, partition_filter={"order_year": 2001})),
+    ):
+        plan_df, plan_seconds = timed(read)
+        row_count, count_seconds = timed(plan_df.count)
+        print(f"{label:<26} plan {plan_seconds:7.2f}s  count {count_seconds:7.2f}s  rows {row_count}")
@@ -0,0 +1,105 @@
+"""
+Compares the legacy omni_channel_engagement query (engagement scanned twice, three chained
+FULL OUTER JOINs) with the single-pass union-and-aggregate in transform_sql, on generated data.
+Reports shuffle exchanges in the physical plan, stages run and wall time for each.
+
+Needs pyspark and boto3, not the Glue libraries:
+    spark-submit benchmarks/omni_channel_engagement_shuffle.py --customers 100000
+"""
+import argparse
+import time
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+from glue_etl_pipeline import omni_channel_engagement
+
+LEGACY_QUERY = """
+    WITH email_engagement AS (
+        SELECT CustomerID,
+            COUNT(CASE WHEN Action = 'Opened' AND Channel = 'Email' THEN 1 END) AS EmailsOpened,
+            COUNT(CASE WHEN Action = 'Clicked' AND Channel = 'Email' THEN 1 END) AS EmailsClicked
+        FROM engagement WHERE Timestamp >= date_add(current_date(), -90) GROUP BY CustomerID
+    ),
+    ad_engagement AS (
+        SELECT CustomerID,
+            COUNT(CASE WHEN Action = 'Clicked' AND Channel IN ('Web', 'App') THEN 1 END) AS AdClicks,
+            COUNT(CASE WHEN Action = 'Opened' AND Channel IN ('Web', 'App') THEN 1 END) AS AdViews
+        FROM engagement WHERE Timestamp >= date_add(current_date(), -90) GROUP BY CustomerID
+    ),
+    purchase_activity AS (
+        SELECT customer_id, COUNT(order_id) AS purchases, SUM(total_amount) AS total_spent
+        FROM Orders WHERE order_date >= date_add(current_date(), -90) GROUP BY customer_id
+    ),
+    support_analysis AS (
+        SELECT CustomerID, COUNT(TicketID) AS TotalTickets,
+            COUNT(CASE WHEN Status = 'Open' THEN 1 END) AS OpenTickets,
+            COUNT(CASE WHEN Status = 'Resolved' THEN 1 END) AS ResolvedTickets
+        FROM SupportTickets WHERE Timestamp >= date_add(current_date(), -90) GROUP BY CustomerID
+    )
+    SELECT customer_id,
+        COALESCE(EmailsOpened, 0) AS emails_opened, COALESCE(EmailsClicked, 0) AS emails_clicked,
+        COALESCE(AdClicks, 0) AS ad_clicks, COALESCE(AdViews, 0) AS ad_views,
+        COALESCE(purchases, 0) AS purchases, COALESCE(total_spent, 0) AS total_spent,
+        COALESCE(TotalTickets, 0) AS total_ticket, COALESCE(OpenTickets, 0) AS open_ticket,
+        COALESCE(ResolvedTickets, 0) AS resolved_ticjet
+    FROM email_engagement e
+    FULL OUTER JOIN ad_engagement a ON e.CustomerID = a.CustomerID
+    FULL OUTER JOIN purchase_activity p ON a.CustomerID = p.customer_id
+    FULL OUTER JOIN support_analysis s ON a.CustomerID = s.CustomerID ORDER BY total_spent DESC
+"""
+
+
+def register_sources(spark, customers):
+    """
+    Registers generated engagement, Orders and SupportTickets views, ~20/5/1 rows per customer.
+    """
+    def recent_timestamp():
+        return F.date_sub(F.current_date(), (F.rand() * 120).cast("int"))
+
+    spark.range(customers * 20).select(
+        (F.col("id") % customers).alias("CustomerID"),
+        F.element_at(F.array(*[F.lit(c) for c in ["Email", "Web", "App"]]), (F.rand() * 3).cast("int") + 1).alias("Channel"),
+        F.element_at(F.array(F.lit("Opened"), F.lit("Clicked")), (F.rand() * 2).cast("int") + 1).alias("Action"),
+        recent_timestamp().alias("Timestamp"),
+    ).createOrReplaceTempView("engagement")
+    spark.range(customers * 5).select(
+        F.col("id").alias("order_id"),
+        (F.col("id") % customers).alias("customer_id"),
+        (F.rand() * 500).cast("decimal(10,2)").alias("total_amount"),
+        recent_timestamp().alias("order_date"),
+    ).createOrReplaceTempView("Orders")
+    spark.range(customers).select(
+        F.col("id").alias("TicketID"),
+        ((F.col("id") * 7) % customers).alias("CustomerID"),
+        F.when(F.rand() < 0.5, "Open").otherwise("Resolved").alias("Status"),
+        recent_timestamp().alias("Timestamp"),
+    ).createOrReplaceTempView("SupportTickets")
+
+
+def measure(spark, name, df):
+    sc = spark.sparkContext
+    plan = df._jdf.queryExecution().executedPlan().toString()
+    sc.setJobGroup(name, name)
+    start_time = time.time()
+    df.write.format("noop").mode("overwrite").save()
+    duration = time.time() - start_time
+    tracker = sc.statusTracker()
+    stages = {stage for job_id in tracker.getJobIdsForGroup(name) for stage in tracker.getJobInfo(job_id).stageIds}
+    return {"plan": name, "shuffle_exchanges": plan.count("Exchange "), "stages": len(stages), "seconds": round(duration, 2)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=100000)
+    options, _ = parser.parse_known_args()
+
+    spark = SparkSession.builder.appName("omni_channel_engagement_shuffle").getOrCreate()
+    # Compare static plans; adaptive execution would coalesce and re-plan exchanges at runtime
+    spark.conf.set("spark.sql.adaptive.enabled", "false")
+    register_sources(spark, options.customers)
+
+    results = [
+        measure(spark, "legacy_full_outer_joins", spark.sql(LEGACY_QUERY)),
+        measure(spark, "union_aggregate", omni_channel_engagement.transform_sql(spark)),
+    ]
+    for result in results:
+        print(result)
@@ -0,0 +1,53 @@
+"""
+Times writing a generated per-customer output with a global ORDER BY (as the jobs used to),
+unsorted, and unsorted plus a sorted top-n sidecar (table_format.write_top_n).
+
+Only needs pyspark:
+    spark-submit benchmarks/sort_free_write.py --rows 20000000 --output /tmp/sort_free_write
+"""
+import argparse
+import time
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+
+def generate_output(spark, rows):
+    return spark.range(rows).select(
+        F.col("id").alias("customer_id"),
+        (F.rand(7) * 100000).cast("decimal(12,2)").alias("total_spent"),
+        (F.rand(11) * 365).cast("int").alias("days_since_last_purchase"),
+    )
+
+
+def timed(label, action):
+    start_time = time.time()
+    action()
+    duration = time.time() - start_time
+    print(f"{label:<28} {duration:8.2f}s")
+    return duration
+
+
+def write_top_n(spark, path, order_by, n):
+    # Same plan as glue_etl_pipeline.table_format.write_top_n, without the Glue imports or manifest
+    spark.read.parquet(path).orderBy(F.col(order_by).desc()).limit(n).coalesce(1) \
+        .write.mode("overwrite").parquet(f"{path}_top_{n}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000000)
+    parser.add_argument("--output", default="/tmp/sort_free_write")
+    options = parser.parse_args()
+
+    spark = SparkSession.builder.appName("sort_free_write").getOrCreate()
+    # Materialise the input once so every variant measures only sort + write
+    df = generate_output(spark, options.rows).localCheckpoint()
+
+    sorted_seconds = timed("global ORDER BY",
+                           lambda: df.orderBy(F.desc("total_spent")).write.mode("overwrite").parquet(f"{options.output}/sorted"))
+    unsorted_seconds = timed("unsorted",
+                             lambda: df.write.mode("overwrite").parquet(f"{options.output}/unsorted"))
+    sidecar_seconds = timed("unsorted + top-100 sidecar",
+                            lambda: (df.write.mode("overwrite").parquet(f"{options.output}/unsorted"),
+                                     write_top_n(spark, f"{options.output}/unsorted", "total_spent", 100)))
+    print(f"speed-up unsorted: {sorted_seconds / unsorted_seconds:.2f}x, with sidecar: {sorted_seconds / sidecar_seconds:.2f}x")
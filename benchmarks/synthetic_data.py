@@ -0,0 +1,170 @@
+"""
+Generates the job sources (the RDS tables Orders, Order_Items, Products, Customers and
+LoginHistory, and the DynamoDB tables CustomerSupport and EnterpriseCampaigns) with the
+columns and value domains the jobs read. Rows scale linearly with the scale factor, from
+SCALE_ROWS at scale 1. The same scale, seed and parallelism generate the same rows, dated
+in the HISTORY_DAYS days before the run, so every job window selects part of each table.
+
+Needs pyspark only. Writes each table as Parquet under --output:
+    spark-submit benchmarks/synthetic_data.py --scale 10 --output /tmp/synthetic_sf10
+"""
+import argparse
+from pyspark.sql import DataFrame
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+from glue_etl_pipeline.utils import get_dynamodb_schema
+
+# Rows per table at scale 1
+SCALE_ROWS = {
+    "Customers": 10000,
+    "Products": 1000,
+    "Orders": 50000,
+    "Order_Items": 150000,
+    "LoginHistory": 100000,
+    "CustomerSupport": 5000,
+    "EnterpriseCampaigns": 10000,
+}
+INTERACTIONS_PER_CAMPAIGN = 5
+HISTORY_DAYS = 400
+COUNTRIES = ["United States", "United Kingdom", "United Arab Emirates", "India", "Germany", "Brazil"]
+RDS_TABLES = ["Orders", "Order_Items", "Products", "Customers", "LoginHistory"]
+DYNAMODB_TABLES = ["CustomerSupport", "EnterpriseCampaigns"]
+
+
+def get_row_count(tablename: str, scale: float) -> int:
+    return max(int(SCALE_ROWS[tablename] * scale), 1)
+
+
+def pick(values, seed):
+    """
+    One of values, uniformly at random.
+    """
+    return F.element_at(F.array(*[F.lit(v) for v in values]), (F.rand(seed) * len(values)).cast("int") + 1)
+
+
+def recent_timestamp(seed):
+    """
+    A timestamp in the last HISTORY_DAYS days.
+    """
+    seconds_ago = (F.rand(seed) * HISTORY_DAYS * 86400).cast("long")
+    return (F.unix_timestamp(F.current_timestamp()) - seconds_ago).cast("timestamp")
+
+
+def generate_customers(spark: SparkSession, scale=1.0, seed=42) -> DataFrame:
+    return spark.range(get_row_count("Customers", scale)).select(
+        F.col("id").alias("customer_id"),
+        F.concat(F.lit("first_"), F.col("id")).alias("first_name"),
+        F.concat(F.lit("last_"), F.col("id")).alias("last_name"),
+        F.concat(F.lit("customer_"), F.col("id"), F.lit("@example.com")).alias("email"),
+        pick(COUNTRIES, seed).alias("country"),
+    )
+
+
+def generate_products(spark: SparkSession, scale=1.0, seed=42) -> DataFrame:
+    return spark.range(get_row_count("Products", scale)).select(
+        F.col("id").alias("product_id"),
+        F.concat(F.lit("product_"), F.col("id")).alias("product_name"),
+        pick(["Electronics", "Books", "Home", "Fashion", "Grocery"], seed).alias("category"),
+        (F.rand(seed + 1) * 500 + 1).cast("decimal(10,2)").alias("price"),
+    )
+
+
+def generate_orders(spark: SparkSession, scale=1.0, seed=42) -> DataFrame:
+    customers = get_row_count("Customers", scale)
+    return spark.range(get_row_count("Orders", scale)).select(
+        F.col("id").alias("order_id"),
+        # Squaring the uniform draw skews orders towards the low customer ids
+        (F.pow(F.rand(seed), 2) * customers).cast("long").alias("customer_id"),
+        recent_timestamp(seed + 1).alias("order_date"),
+        (F.rand(seed + 2) * 1000 + 5).cast("decimal(10,2)").alias("total_amount"),
+        pick(["Delivered", "Shipped", "Cancelled"], seed + 3).alias("status"),
+    )
+
+
+def generate_order_items(spark: SparkSession, scale=1.0, seed=42) -> DataFrame:
+    orders = get_row_count("Orders", scale)
+    products = get_row_count("Products", scale)
+    return spark.range(get_row_count("Order_Items", scale)).select(
+        F.col("id").alias("order_item_id"),
+        (F.rand(seed) * orders).cast("long").alias("order_id"),
+        (F.rand(seed + 1) * products).cast("long").alias("product_id"),
+        (F.rand(seed + 2) * 5 + 1).cast("int").alias("quantity"),
+        (F.rand(seed + 3) * 500 + 1).cast("decimal(10,2)").alias("unit_price"),
+    )
+
+
+def generate_login_history(spark: SparkSession, scale=1.0, seed=42) -> DataFrame:
+    customers = get_row_count("Customers", scale)
+    return spark.range(get_row_count("LoginHistory", scale)).select(
+        F.col("id").alias("login_id"),
+        (F.rand(seed) * customers).cast("long").alias("customer_id"),
+        # A few hundred addresses, so some customers log in from many distinct IPs
+        F.concat_ws(".", F.lit("10"), F.lit("0"), (F.rand(seed + 1) * 4).cast("int"),
+                    (F.rand(seed + 2) * 100).cast("int")).alias("ip_address"),
+        recent_timestamp(seed + 3).alias("login_date"),
+    )
+
+
+def generate_customer_support(spark: SparkSession, scale=1.0, seed=42) -> DataFrame:
+    customers = get_row_count("Customers", scale)
+    df = spark.range(get_row_count("CustomerSupport", scale)).select(
+        (F.rand(seed) * customers).cast("long").alias("CustomerID"),
+        F.concat(F.lit("T"), F.col("id")).alias("TicketID"),
+        F.date_format(recent_timestamp(seed + 1), "yyyy-MM-dd'T'HH:mm:ss").alias("Timestamp"),
+        F.struct(pick(["Open", "Resolved", "Pending"], seed + 2).alias("Status")).alias("Issue"),
+    )
+    return conform_to_declared(df, "CustomerSupport")
+
+
+def generate_enterprise_campaigns(spark: SparkSession, scale=1.0, seed=42) -> DataFrame:
+    customers = get_row_count("Customers", scale)
+    # Each interaction of a campaign draws from its own seeds
+    interactions = [F.struct(
+        F.date_format(recent_timestamp(seed + 10 * i + 1), "yyyy-MM-dd'T'HH:mm:ss").alias("Timestamp"),
+        pick(["Email", "Web", "App"], seed + 10 * i + 2).alias("Channel"),
+        pick(["Opened", "Clicked"], seed + 10 * i + 3).alias("Action"),
+    ) for i in range(INTERACTIONS_PER_CAMPAIGN)]
+    df = spark.range(get_row_count("EnterpriseCampaigns", scale)).select(
+        (F.col("id") % customers).alias("CustomerID"),
+        F.array(*interactions).alias("Interactions"),
+    )
+    return conform_to_declared(df, "EnterpriseCampaigns")
+
+
+def conform_to_declared(df: DataFrame, tablename: str) -> DataFrame:
+    """
+    The generated DynamoDB table with exactly the DYNAMODB_SCHEMAS types the jobs read it as.
+    """
+    return df.select(*[F.col(field.name).cast(field.dataType) for field in get_dynamodb_schema(tablename).fields])
+
+
+GENERATORS = {
+    "Orders": generate_orders,
+    "Order_Items": generate_order_items,
+    "Products": generate_products,
+    "Customers": generate_customers,
+    "LoginHistory": generate_login_history,
+    "CustomerSupport": generate_customer_support,
+    "EnterpriseCampaigns": generate_enterprise_campaigns,
+}
+
+
+def generate_sources(spark: SparkSession, scale=1.0, seed=42, tablenames=None):
+    """
+    {table: DataFrame} of generated sources at the scale factor, every table by default.
+    """
+    return {tablename: GENERATORS[tablename](spark, scale, seed) for tablename in tablenames or GENERATORS}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="/tmp/synthetic_data")
+    parser.add_argument("--tables", nargs="*", choices=list(GENERATORS))
+    options = parser.parse_args()
+
+    spark = SparkSession.builder.appName("synthetic_data").getOrCreate()
+    for tablename, df in generate_sources(spark, options.scale, options.seed, options.tables).items():
+        df.write.mode("overwrite").parquet(f"{options.output.rstrip('/')}/{tablename}")
+        print(f"{tablename:<20} {get_row_count(tablename, options.scale):>12} rows")
@@ -0,0 +1,116 @@
+from datetime import date, datetime, timedelta, timezone
+from pyspark.sql import DataFrame
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+from glue_etl_pipeline.glue_config import DAILY_AGGREGATE_WINDOW_DAYS,DAILY_AGGREGATE_REBUILD_DAYS
+from glue_etl_pipeline.utils import write_to_s3,is_enabled_for,read_json,write_json,delete_path
+from glue_etl_pipeline.logging import get_logger
+
+STORE_STATE = "_daily_aggregates.json"
+PARTITION_COLUMN = "dt"
+
+# Additive per-customer, per-day counters; any N-day window is their sum. channel_rows counts
+# the engagement, order and ticket rows (not logins), whatever their counters: the customers
+# omni_channel_engagement publishes are those with at least one
+DAILY_COUNTERS = ["order_count", "total_spent", "login_attempts",
+                  "emails_opened", "emails_clicked", "ad_clicks", "ad_views",
+                  "total_ticket", "open_ticket", "resolved_ticket", "channel_rows"]
+
+logger = get_logger("daily aggregates")
+
+
+def get_daily_aggregates_path(state_root: str) -> str:
+    return f"{state_root}daily_aggregates/"
+
+
+def use_daily_aggregates(state_root, job_name: str) -> bool:
+    """
+    True when the job is opted into the store (--DAILY_AGGREGATES true, or a list of jobs
+    naming it) and has a state root to read the store from.
+    """
+    return bool(state_root) and is_enabled_for("DAILY_AGGREGATES", job_name)
+
+
+def project_activity(df: DataFrame, customer_col: str, date_col: str, total_amount=None, last_order_date=None, **counters) -> DataFrame:
+    """
+    One row per source row: customer_id, dt, a 0/1 value per counter (0 when not given),
+    the order amount and the order date.
+    """
+    return df.select(
+        F.col(customer_col).alias("customer_id"),
+        F.to_date(F.col(date_col)).alias(PARTITION_COLUMN),
+        *[F.coalesce(counters[name].cast("long"), F.lit(0)).alias(name) if name in counters else F.lit(0).cast("long").alias(name)
+          for name in DAILY_COUNTERS if name != "total_spent"],
+        (total_amount if total_amount is not None else F.lit(None)).cast("decimal(20,2)").alias("total_spent"),
+        (last_order_date if last_order_date is not None else F.lit(None)).cast("timestamp").alias("last_order_date"),
+    )
+
+
+def aggregate_daily(*activity_dfs) -> DataFrame:
+    """
+    Combines projected activity with one UNION ALL and a single GROUP BY customer_id, dt.
+    """
+    activity = activity_dfs[0]
+    for activity_df in activity_dfs[1:]:
+        activity = activity.unionByName(activity_df)
+    return activity.groupBy("customer_id", PARTITION_COLUMN).agg(
+        *[F.sum(name).alias(name) for name in DAILY_COUNTERS],
+        F.max("last_order_date").alias("last_order_date"),
+    )
+
+
+def get_days_to_build(store_state, today, window_days=DAILY_AGGREGATE_WINDOW_DAYS, rebuild_days=DAILY_AGGREGATE_REBUILD_DAYS):
+    """
+    Returns the days of the window that are not in the store yet plus the last rebuild_days,
+    oldest first. today is the session's current_date (utils.get_current_date), which
+    read_window also filters on. A store built with other DAILY_COUNTERS is rebuilt whole.
+    """
+    store_state = store_state or {}
+    built_days = set(store_state.get("days", [])) if store_state.get("counters") == DAILY_COUNTERS else set()
+    window = [today - timedelta(days=offset) for offset in range(window_days + 1)]
+    return sorted(day for offset, day in enumerate(window) if offset < rebuild_days or day.isoformat() not in built_days)
+
+
+def update_daily_aggregates(store_path: str, daily_df: DataFrame, days, today, window_days=DAILY_AGGREGATE_WINDOW_DAYS):
+    """
+    Replaces the dt partitions of the rebuilt days, records them in the store state and
+    deletes the days that left the window. daily_df is the aggregate_daily output.
+    The rebuilt partitions are deleted before the rows are appended: a dynamic partition
+    overwrite only replaces the partitions that receive rows, so a day that lost all its
+    rows would keep its old ones. The jobs reading the store run after this one.
+    """
+    store_state = read_json(store_path + STORE_STATE) or {}
+    for day in days:
+        delete_path(f"{store_path}{PARTITION_COLUMN}={day.isoformat()}/")
+    row_count = write_to_s3(daily_df.filter(F.col(PARTITION_COLUMN).isin(days)), store_path,
+                            mode="append", partition_by=[PARTITION_COLUMN])
+
+    window_start = today - timedelta(days=window_days)
+    built_days = set(store_state.get("days", [])) | {day.isoformat() for day in days}
+    for day in sorted(built_days):
+        if date.fromisoformat(day) < window_start:
+            delete_path(f"{store_path}{PARTITION_COLUMN}={day}/")
+    built_days = sorted(day for day in built_days if date.fromisoformat(day) >= window_start)
+
+    write_json(store_path + STORE_STATE, {
+        "days": built_days,
+        "window_days": window_days,
+        "counters": DAILY_COUNTERS,
+        "rebuilt_days": [day.isoformat() for day in days],
+        "row_count": row_count,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    })
+    logger.info(f"Daily aggregates: rebuilt {len(days)} day(s), {row_count} rows, {len(built_days)} day(s) stored")
+    return row_count
+
+
+def read_window(spark: SparkSession, store_path: str, window_days: int) -> DataFrame:
+    """
+    Per-customer counters over the last window_days (dt >= current_date - window_days, as the
+    jobs filter their raw sources), read from the daily partitions only.
+    """
+    daily_df = spark.read.parquet(store_path).filter(F.col(PARTITION_COLUMN) >= F.date_add(F.current_date(), -int(window_days)))
+    return daily_df.groupBy("customer_id").agg(
+        *[F.sum(name).alias(name) for name in DAILY_COUNTERS],
+        F.max("last_order_date").alias("last_order_date"),
+    )
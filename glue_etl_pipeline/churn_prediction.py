@@ -1,42 +1,27 @@
-import sys
 import boto3
 import time
-from pyspark.context import SparkContext
+from datetime import timedelta
 from pyspark.sql import SparkSession
-from awsglue.context import GlueContext
-from awsglue.job import Job
-from awsglue.utils import getResolvedOptions
 from pyspark.sql import functions as F
 from pyspark.sql.window import Window
-from glue_etl_pipeline.utils import read_from_rds,write_to_s3
-from glue_etl_pipeline.glue_config import USER_MYSQL_URL,ORDER_MYSQL_URL,PRODUCT_MYSQL_URL
+from glue_etl_pipeline.snapshot import read_source
+from glue_etl_pipeline.state import get_state_root,read_state
+from glue_etl_pipeline.table_format import BUCKET_COLUMN,write_table,write_top_n,merge_table,read_manifest,read_table
+from glue_etl_pipeline.utils import debug_show,get_output_layout,get_implementation,is_enabled_for
+from glue_etl_pipeline.glue_config import USER_MYSQL_URL,ORDER_MYSQL_URL,PRODUCT_MYSQL_URL,JOB_RDS_SOURCES,OUTPUT_TOP_N,INCREMENTAL_TABLES
+from glue_etl_pipeline.instrumentation import new_run,phase,plan_capture,write_run_metrics
+from glue_etl_pipeline.glue_job import start_job
 from glue_etl_pipeline.logging import get_logger
 
-# Parse job arguments
-args = getResolvedOptions(sys.argv, ["JOB_NAME", "S3_TARGET_PATH"])
-
-# Initialize Spark and Glue Context
-sc = SparkContext()
-glueContext = GlueContext(sc)
-spark = glueContext.spark_session
-job = Job(glueContext)
-job.init(args["JOB_NAME"], args)
-s3_output_path =args['S3_TARGET_PATH'] +args["JOB_NAME"]
-
 # Initialize Logger
 logger = get_logger("churn_prediction")
 
 def run_etl():
+    args, glueContext, job = start_job(["JOB_NAME", "S3_TARGET_PATH"])
     start_time = time.time()
     try:
         logger.info(f"Starting ETL Job {args['JOB_NAME']}")
-        order_df =read_from_rds(spark,ORDER_MYSQL_URL,"Orders")
-
-        #common tranformation 
-        churn_risk=transform_sql()
-        #churn_risk=transform_dataframe(order_df)
-
-        write_to_s3(churn_risk,s3_output_path)
+        run_job(glueContext.spark_session, args['S3_TARGET_PATH'] + args["JOB_NAME"], glueContext)
 
         logger.info("ETL Job Completed Successfully")
     except Exception as e:
@@ -48,8 +33,90 @@ def run_etl():
         job.commit()
 
 
-
-def transform_sql():
+def run_job(spark: SparkSession, s3_output_path: str, glueContext=None):
+    """
+    Churn risk from the orders (or the customer state) to s3_output_path, in the given session:
+    the Glue job's, or one of job_runner's. Phase timings, stage metrics and the output plan
+    are written to the metrics root (get_metrics_path).
+    """
+    run = new_run("churn_prediction")
+    state_root = get_state_root()
+    # Opt-in (--INCREMENTAL_STATE true, or a list of jobs naming churn_prediction)
+    if state_root and is_enabled_for("INCREMENTAL_STATE", "churn_prediction"):
+        # Reads the new orders and commits the customer state
+        with phase(spark, run, "incremental"):
+            churn_risk=run_incremental(spark,state_root + "churn_prediction/customer_state/")
+    else:
+        with phase(spark, run, "extract"):
+            (order_df,) =read_sources(spark)
+
+        #common tranformation (--IMPLEMENTATION or JOB_IMPLEMENTATIONS)
+        with phase(spark, run, "transform"):
+            if get_implementation("churn_prediction") == "sql":
+                churn_risk=transform_sql(spark)
+            else:
+                churn_risk=transform_dataframe(order_df)
+
+    with phase(spark, run, "write"):
+        # Rewritten in full: days_since_last_purchase moves with current_date, so every row
+        # changes daily and a merge would rewrite every bucket anyway
+        write_table(churn_risk,s3_output_path,on_write=plan_capture(run, "churn_prediction"),**get_output_layout("churn_prediction"))
+        write_top_n(spark,s3_output_path,**OUTPUT_TOP_N["churn_prediction"])
+    write_run_metrics(run, s3_output_path)
+
+
+def run_incremental(spark: SparkSession, state_path):
+    """
+    Folds the settled orders into the per-customer state table and derives the churn risk
+    from the committed state plus the orders still open to change. Orders within the
+    lookback of the latest one are not folded: late orders, and orders committed after this
+    run with an order_date it already saw, still land in that window and are read again by
+    the next run. The state only ever covers orders up to its watermark and every run reads
+    the orders after it, so a rerun neither drops nor double counts an order.
+    The state is a manifest table bucketed on customer_id, committed with its watermark by
+    merge_table: only the customers with settled orders are folded, and only their buckets
+    are rewritten.
+    """
+    current = read_manifest(state_path)
+    if current is None:
+        # A state committed by commit_state, before it was a table, is carried into one
+        state_df, pointer = read_state(spark, state_path)
+        since = pointer["watermark"] if pointer else None
+    else:
+        state_df, since = read_table(spark, state_path).drop(BUCKET_COLUMN), current["watermark"]
+    orders_df =read_source(spark,ORDER_MYSQL_URL,"Orders",since=since,**JOB_RDS_SOURCES["churn_prediction"]["Orders"])
+
+    last_order_date = orders_df.agg(F.max("order_date")).first()[0]
+    watermark = since
+    if last_order_date is not None:
+        settled_through = str(last_order_date - timedelta(days=INCREMENTAL_TABLES["Orders"]["lookback_days"]))
+        # Same column type on both sides, so the ISO strings order like the values
+        if since is None or settled_through > since:
+            watermark = settled_through
+    logger.info(f"Customer state watermark {since} -> {watermark}")
+
+    if watermark is None:
+        settled_orders_df, open_orders_df = orders_df.limit(0), orders_df
+    else:
+        settled_through = F.lit(watermark).cast(orders_df.schema["order_date"].dataType)
+        settled_orders_df = orders_df.filter(F.col("order_date") <= settled_through)
+        open_orders_df = orders_df.filter(F.col("order_date") > settled_through)
+    changed_keys = settled_orders_df.select("customer_id").distinct()
+    merge_table(fold_changed_customers(state_df, settled_orders_df, changed_keys), state_path, ["customer_id"],
+                changed_keys=changed_keys, details={"watermark": watermark}, catalog=False)
+    return transform_state(update_customer_state(read_table(spark, state_path).drop(BUCKET_COLUMN), open_orders_df))
+
+
+def read_sources(spark: SparkSession, glueContext=None):
+    """
+    (order_df,): the arguments of transform_dataframe, also registered as the Orders view
+    transform_sql reads.
+    """
+    order_df =read_source(spark,ORDER_MYSQL_URL,"Orders",**JOB_RDS_SOURCES["churn_prediction"]["Orders"])
+    return (order_df,)
+
+
+def transform_sql(spark: SparkSession):
         # Run Spark SQL Query
         churn_risk = spark.sql(""" WITH customer_activity AS (
                                         SELECT
@@ -71,8 +138,7 @@ def transform_sql():
                                     )
                                     SELECT *
                                     FROM churn_risk
-                                    WHERE days_since_last_purchase > (avg_order_gap * 2)  -- Customers inactive for double their average gap
-                                    ORDER BY days_since_last_purchase DESC;
+                                    WHERE days_since_last_purchase > (avg_order_gap * 2);  -- Customers inactive for double their average gap
                                     """)
         return churn_risk
 
@@ -101,9 +167,80 @@ def transform_dataframe(order_df):
     # Filter customers who are inactive for more than twice their average order gap
     churn_risk_filtered = churn_risk.filter(
         F.col("days_since_last_purchase") > (F.col("avg_order_gap") * 2)
-    ).orderBy(F.desc("days_since_last_purchase"))
+    )
 
     # Show results
-    churn_risk_filtered.show(10)
+    debug_show(churn_risk_filtered, 10)
+
+    return churn_risk_filtered
+
+
+def update_customer_state(state_df, new_orders_df):
+    """
+    Folds new orders into the per-customer state (total_orders, last_order_date, gap_sum, gap_count).
+    The LAG window only runs over the new orders; the gap between a customer's previous last
+    order and their first new one is added separately. New orders are expected to be later
+    than the customer's last_order_date, which the state watermark guarantees: the state
+    only holds orders up to it and new_orders_df only orders after it.
+    """
+    window_spec = Window.partitionBy("customer_id").orderBy("order_date")
+    new_activity = (
+        new_orders_df.withColumn("prev_order_date", F.lag("order_date").over(window_spec))
+        .groupBy("customer_id")
+        .agg(
+            F.count("order_id").alias("new_orders"),
+            F.min("order_date").alias("first_new_order_date"),
+            F.max("order_date").alias("last_new_order_date"),
+            F.sum(F.datediff("order_date", "prev_order_date")).alias("new_gap_sum"),
+            F.count("prev_order_date").alias("new_gap_count"),
+        )
+    )
+    if state_df is None:
+        return new_activity.select(
+            "customer_id",
+            F.col("new_orders").alias("total_orders"),
+            F.col("last_new_order_date").alias("last_order_date"),
+            F.coalesce(F.col("new_gap_sum"), F.lit(0)).cast("long").alias("gap_sum"),
+            F.col("new_gap_count").cast("long").alias("gap_count"),
+        )
+
+    bridge_gap = F.datediff("first_new_order_date", "last_order_date")
+    return (
+        state_df.join(new_activity, "customer_id", "full_outer")
+        .select(
+            "customer_id",
+            (F.coalesce(F.col("total_orders"), F.lit(0)) + F.coalesce(F.col("new_orders"), F.lit(0))).alias("total_orders"),
+            F.greatest(F.col("last_order_date"), F.col("last_new_order_date")).alias("last_order_date"),
+            (F.coalesce(F.col("gap_sum"), F.lit(0)) + F.coalesce(F.col("new_gap_sum"), F.lit(0))
+             + F.coalesce(bridge_gap, F.lit(0))).cast("long").alias("gap_sum"),
+            (F.coalesce(F.col("gap_count"), F.lit(0)) + F.coalesce(F.col("new_gap_count"), F.lit(0))
+             + F.when(bridge_gap.isNotNull(), 1).otherwise(0)).cast("long").alias("gap_count"),
+        )
+    )
 
-    return churn_risk_filtered
\ No newline at end of file
+
+def fold_changed_customers(state_df, new_orders_df, changed_keys):
+    """
+    The state with new_orders_df folded in, as update_customer_state returns it, but only the
+    customers in changed_keys (those with new orders) go through the join; the other rows
+    are passed through as they are.
+    """
+    if state_df is None:
+        return update_customer_state(None, new_orders_df)
+    folded_df = update_customer_state(state_df.join(changed_keys, "customer_id", "left_semi"), new_orders_df)
+    return state_df.join(changed_keys, "customer_id", "left_anti").unionByName(folded_df)
+
+
+def transform_state(state_df):
+    # Same output as transform_sql, with avg_order_gap carried as gap_sum / gap_count
+    churn_risk = state_df.select(
+        "customer_id",
+        "total_orders",
+        "last_order_date",
+        F.datediff(F.current_date(), F.col("last_order_date")).alias("days_since_last_purchase"),
+        (F.col("gap_sum") / F.col("gap_count")).alias("avg_order_gap"),
+    )
+
+    return churn_risk.filter(
+        F.col("days_since_last_purchase") > (F.col("avg_order_gap") * 2)
+    )
@@ -0,0 +1,78 @@
+import time
+from pyspark.sql import functions as F
+from glue_etl_pipeline.aggregate_store import STORE_STATE,get_daily_aggregates_path,project_activity,aggregate_daily,get_days_to_build,update_daily_aggregates
+from glue_etl_pipeline.snapshot import read_source
+from glue_etl_pipeline.state import get_state_root
+from glue_etl_pipeline.utils import read_from_dynamodb,read_json,get_current_date
+from glue_etl_pipeline.glue_config import USER_MYSQL_URL,ORDER_MYSQL_URL,JOB_RDS_SOURCES,DYNAMODB_REGION
+from glue_etl_pipeline.glue_job import start_job
+from glue_etl_pipeline.logging import get_logger
+
+# Initialize Logger
+logger = get_logger("daily aggregates")
+
+def run_etl():
+    args, glueContext, job = start_job(["JOB_NAME", "STATE_PATH"])
+    spark = glueContext.spark_session
+    start_time = time.time()
+    try:
+        logger.info(f"Starting ETL Job {args['JOB_NAME']}")
+        store_path = get_daily_aggregates_path(get_state_root())
+        today = get_current_date(spark)
+        days = get_days_to_build(read_json(store_path + STORE_STATE), today)
+        logger.info(f"Building daily aggregates for {len(days)} day(s) from {days[0]}")
+
+        # RDS sources are read back to the oldest day being rebuilt, normally just yesterday
+        window_days = (today - days[0]).days
+        order_df =read_source(spark,ORDER_MYSQL_URL,"Orders",window_days=window_days,**JOB_RDS_SOURCES["daily_aggregates"]["Orders"])
+        login_df =read_source(spark,USER_MYSQL_URL,"LoginHistory",window_days=window_days,**JOB_RDS_SOURCES["daily_aggregates"]["LoginHistory"])
+
+        campaigns_df=read_from_dynamodb(glueContext,"EnterpriseCampaigns",DYNAMODB_REGION)
+        engagement_df=campaigns_df.select("CustomerID", F.explode(F.col("Interactions")).alias("Interaction")).select(
+            F.col("CustomerID"),
+            F.col("Interaction.Timestamp").alias("Timestamp"),
+            F.col("Interaction.Channel").alias("Channel"),
+            F.col("Interaction.Action").alias("Action"),
+        )
+        support_df=read_from_dynamodb(glueContext,"CustomerSupport",DYNAMODB_REGION).select("CustomerID","TicketID","Timestamp","Issue.Status")
+
+        daily_df=transform_dataframe(order_df,login_df,engagement_df,support_df)
+        update_daily_aggregates(store_path,daily_df,days,today)
+
+        logger.info("ETL Job Completed Successfully")
+    except Exception as e:
+        logger.error(f"ETL Job Failed: {str(e)}")
+        raise e
+    finally:
+        duration = time.time() - start_time
+        logger.info(f"ETL Job Duration: {duration:.2f} seconds")
+        job.commit()
+
+
+def transform_dataframe(order_df,login_df,engagement_df,support_df):
+    # Same counter definitions as fraud_detection, omni_channel_engagement and purchase_behavior,
+    # kept per customer per day
+    order_activity = project_activity(
+        order_df, "customer_id", "order_date",
+        total_amount=F.col("total_amount"),
+        last_order_date=F.col("order_date"),
+        order_count=F.col("order_id").isNotNull(),
+        channel_rows=F.lit(1),
+    )
+    login_activity = project_activity(login_df, "customer_id", "login_date", login_attempts=F.lit(1))
+    engagement_activity = project_activity(
+        engagement_df, "CustomerID", "Timestamp",
+        emails_opened=(F.col("Action") == "Opened") & (F.col("Channel") == "Email"),
+        emails_clicked=(F.col("Action") == "Clicked") & (F.col("Channel") == "Email"),
+        ad_clicks=(F.col("Action") == "Clicked") & F.col("Channel").isin("Web", "App"),
+        ad_views=(F.col("Action") == "Opened") & F.col("Channel").isin("Web", "App"),
+        channel_rows=F.lit(1),
+    )
+    support_activity = project_activity(
+        support_df, "CustomerID", "Timestamp",
+        total_ticket=F.col("TicketID").isNotNull(),
+        open_ticket=F.col("Status") == "Open",
+        resolved_ticket=F.col("Status") == "Resolved",
+        channel_rows=F.lit(1),
+    )
+    return aggregate_daily(order_activity, login_activity, engagement_activity, support_activity)
@@ -0,0 +1,94 @@
+import base64
+import json
+import time
+from decimal import Decimal
+from functools import partial
+import boto3
+from boto3.dynamodb.types import Binary, TypeDeserializer
+from pyspark import StorageLevel
+from pyspark.sql import SparkSession
+
+
+def to_json_value(value):
+    """
+    Converts a deserialised DynamoDB attribute into a JSON-serialisable value.
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, Binary):
+        return base64.b64encode(value.value).decode("ascii")
+    if isinstance(value, dict):
+        return {key: to_json_value(item) for key, item in value.items()}
+    if isinstance(value, (list, set, frozenset)):
+        return [to_json_value(item) for item in value]
+    return value
+
+
+def get_read_capacity(table_name: str, region, endpoint_url=None):
+    """
+    Provisioned read capacity units of a table, None for on-demand tables.
+    """
+    client = boto3.client("dynamodb", region_name=region, endpoint_url=endpoint_url)
+    table = client.describe_table(TableName=table_name)["Table"]
+    if table.get("BillingModeSummary", {}).get("BillingMode") == "PAY_PER_REQUEST":
+        return None
+    return table.get("ProvisionedThroughput", {}).get("ReadCapacityUnits") or None
+
+
+def scan_segment(segment: int, table_name: str, region, total_segments: int, endpoint_url=None, capacity_per_second=None,
+                 attributes=None):
+    """
+    Scans one segment of a parallel scan, yielding (None, items as JSON lines) per page as it
+    is read and (stats, []) once the segment is done, so a task holds one page at a time. With
+    capacity_per_second the segment sleeps between pages to stay under its share of the
+    table's read capacity. With attributes, only those top-level attributes are returned.
+    """
+    client = boto3.client("dynamodb", region_name=region, endpoint_url=endpoint_url)
+    deserializer = TypeDeserializer()
+    request = {"TableName": table_name, "Segment": segment, "TotalSegments": total_segments,
+               "ReturnConsumedCapacity": "TOTAL"}
+    if attributes:
+        # Placeholders, since attribute names such as Timestamp are DynamoDB reserved words
+        request["ProjectionExpression"] = ", ".join(f"#a{index}" for index in range(len(attributes)))
+        request["ExpressionAttributeNames"] = {f"#a{index}": name for index, name in enumerate(attributes)}
+    item_count, pages, consumed = 0, 0, 0.0
+    start_time = time.time()
+    while True:
+        page = client.scan(**request)
+        pages += 1
+        consumed += page.get("ConsumedCapacity", {}).get("CapacityUnits", 0)
+        item_count += len(page["Items"])
+        yield None, [json.dumps(to_json_value({name: deserializer.deserialize(value) for name, value in item.items()}))
+                     for item in page["Items"]]
+        if capacity_per_second:
+            ahead = consumed / capacity_per_second - (time.time() - start_time)
+            if ahead > 0:
+                time.sleep(ahead)
+        if "LastEvaluatedKey" not in page:
+            break
+        request["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+    stats = {"segment": segment, "items": item_count, "pages": pages, "consumed_capacity": consumed,
+             "seconds": round(time.time() - start_time, 2)}
+    yield stats, []
+
+
+def scan_table(spark: SparkSession, table_name: str, region, total_segments: int, read_percent=None, endpoint_url=None, schema=None):
+    """
+    Parallel scan with one Spark task per segment. Returns (DataFrame, per-segment stats).
+    The segments are scanned once: their pages are kept, spilling to disk, until the
+    DataFrame has been read. With a schema
+    only its top-level attributes are fetched and the items are parsed with it, without inference.
+    """
+    capacity = get_read_capacity(table_name, region, endpoint_url)
+    capacity_per_second = capacity * read_percent / total_segments if capacity and read_percent else None
+    pages_rdd = (
+        spark.sparkContext.parallelize(range(total_segments), total_segments)
+        .flatMap(partial(scan_segment, table_name=table_name, region=region, total_segments=total_segments,
+                         endpoint_url=endpoint_url, capacity_per_second=capacity_per_second,
+                         attributes=[field.name for field in schema.fields] if schema is not None else None))
+        .persist(StorageLevel.MEMORY_AND_DISK)
+    )
+    stats = pages_rdd.filter(lambda page: page[0] is not None).map(lambda page: page[0]).collect()
+    items_rdd = pages_rdd.flatMap(lambda page: page[1])
+    reader = spark.read.schema(schema) if schema is not None else spark.read
+    return reader.json(items_rdd), stats
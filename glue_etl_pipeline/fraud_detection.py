@@ -1,43 +1,35 @@
-import sys
 import boto3
 import time
-from pyspark.context import SparkContext
+from datetime import date, timedelta
+from functools import partial, reduce
 from pyspark.sql import SparkSession
-from awsglue.context import GlueContext
-from awsglue.job import Job
-from awsglue.utils import getResolvedOptions
 from pyspark.sql import functions as F
 from pyspark.sql.window import Window
-from glue_etl_pipeline.utils import read_from_rds,write_to_s3
-from glue_etl_pipeline.glue_config import USER_MYSQL_URL,ORDER_MYSQL_URL,PRODUCT_MYSQL_URL
+from pyspark.sql.types import BinaryType, LongType
+from glue_etl_pipeline.aggregate_store import use_daily_aggregates,get_daily_aggregates_path,read_window
+from glue_etl_pipeline.snapshot import read_source
+from glue_etl_pipeline.state import get_state_root
+from glue_etl_pipeline.table_format import write_table
+from glue_etl_pipeline.utils import write_to_s3,debug_show,get_optional_arg,list_subpaths,delete_path,read_json,write_json,get_current_date,get_output_layout,get_implementation
+from glue_etl_pipeline.glue_config import USER_MYSQL_URL,ORDER_MYSQL_URL,PRODUCT_MYSQL_URL,JOB_RDS_SOURCES,HLL_PRECISION
+from glue_etl_pipeline import hll
+from glue_etl_pipeline.fraud_rules import WINDOW_DAYS,SUSPICIOUS_LOGINS_SQL,HIGH_RISK_ORDERS_SQL,window_start,login_aggregations,order_aggregations,is_suspicious_login,is_high_risk_order
+from glue_etl_pipeline.instrumentation import new_run,phase,plan_capture,write_run_metrics
+from glue_etl_pipeline.glue_job import start_job
 from glue_etl_pipeline.logging import get_logger
 
-# Parse job arguments
-args = getResolvedOptions(sys.argv, ["JOB_NAME", "S3_TARGET_PATH"])
-
-# Initialize Spark and Glue Context
-sc = SparkContext()
-glueContext = GlueContext(sc)
-spark = glueContext.spark_session
-job = Job(glueContext)
-job.init(args["JOB_NAME"], args)
-s3_output_path =args['S3_TARGET_PATH'] +args["JOB_NAME"]
+# Days of the sketch store that were built, with the precision they were built at
+SKETCH_DAYS_FILE = "_built_days.json"
 
 # Initialize Logger
 logger = get_logger("fraud detection")
 
 def run_etl():
+    args, glueContext, job = start_job(["JOB_NAME", "S3_TARGET_PATH"])
     start_time = time.time()
     try:
         logger.info(f"Starting ETL Job {args['JOB_NAME']}")
-        user_logins_df =read_from_rds(spark,USER_MYSQL_URL,"LoginHistory")
-        order_df =read_from_rds(spark,ORDER_MYSQL_URL,"Orders")
-
-        #common tranformation 
-        high_risk_customers=transform_sql()
-        #high_risk_customers=transform_dataframe(order_df,user_logins_df)
-
-        write_to_s3(high_risk_customers,s3_output_path)
+        run_job(glueContext.spark_session, args['S3_TARGET_PATH'] + args["JOB_NAME"], glueContext)
 
         logger.info("ETL Job Completed Successfully")
     except Exception as e:
@@ -49,19 +41,66 @@ def run_etl():
         job.commit()
 
 
+def run_job(spark: SparkSession, s3_output_path: str, glueContext=None):
+    """
+    High-risk customers from the orders and logins (or the login sketches and daily aggregates)
+    to s3_output_path, in the given session: the Glue job's, or one of job_runner's. Phase
+    timings, stage metrics and the output plan go to the metrics root (get_metrics_path).
+    """
+    run = new_run("fraud_detection")
+    if get_optional_arg("FRAUD_LOGIN_MODE", "exact") == "sketch" and get_state_root():
+        # Unique IPs from daily HyperLogLog sketches instead of rescanning 30 days of logins
+        sketch_path = get_state_root() + "fraud_detection/login_sketches/"
+        with phase(spark, run, "login_sketches"):
+            update_login_sketches(spark, sketch_path, precision=int(get_optional_arg("HLL_PRECISION", HLL_PRECISION)))
+        with phase(spark, run, "extract"):
+            if use_daily_aggregates(get_state_root(), "fraud_detection"):
+                # Order count and spend from 30 daily partitions of the aggregate store
+                order_totals_df=read_window(spark,get_daily_aggregates_path(get_state_root()),WINDOW_DAYS)
+            else:
+                order_df =read_source(spark,ORDER_MYSQL_URL,"Orders",**JOB_RDS_SOURCES["fraud_detection"]["Orders"])
+                order_totals_df=get_order_totals(order_df)
+            login_features_df=read_login_features(spark,sketch_path)
+        with phase(spark, run, "transform"):
+            high_risk_customers=transform_sketch(order_totals_df,login_features_df)
+    else:
+        with phase(spark, run, "extract"):
+            order_df,user_logins_df =read_sources(spark)
+
+        #common tranformation (--IMPLEMENTATION or JOB_IMPLEMENTATIONS)
+        with phase(spark, run, "transform"):
+            if get_implementation("fraud_detection") == "sql":
+                high_risk_customers=transform_sql(spark)
+            else:
+                high_risk_customers=transform_dataframe(order_df,user_logins_df)
+
+    with phase(spark, run, "write"):
+        write_table(high_risk_customers,s3_output_path,on_write=plan_capture(run, "fraud_detection"),**get_output_layout("fraud_detection"))
+    write_run_metrics(run, s3_output_path)
+
+
+def read_sources(spark: SparkSession, glueContext=None):
+    """
+    (order_df, user_logins_df): the arguments of transform_dataframe, also registered as the
+    Orders and LoginHistory views transform_sql reads.
+    """
+    order_df =read_source(spark,ORDER_MYSQL_URL,"Orders",**JOB_RDS_SOURCES["fraud_detection"]["Orders"])
+    user_logins_df =read_source(spark,USER_MYSQL_URL,"LoginHistory",**JOB_RDS_SOURCES["fraud_detection"]["LoginHistory"])
+    return order_df,user_logins_df
+
 
-def transform_sql():
-    # Run Spark SQL Query
-    query = """
+def transform_sql(spark: SparkSession):
+    # Run Spark SQL Query (window and thresholds from fraud_rules)
+    query = f"""
     WITH suspicious_logins AS (
         SELECT
             customer_id,
             COUNT(DISTINCT ip_address) AS unique_ips,
             COUNT(*) AS total_attempts
         FROM LoginHistory
-        WHERE login_date >= date_add(current_date(), -30)
+        WHERE login_date >= date_add(current_date(), -{WINDOW_DAYS})
         GROUP BY customer_id
-        HAVING unique_ips > 3 OR total_attempts > 10
+        HAVING {SUSPICIOUS_LOGINS_SQL}
     ),
     high_risk_orders AS (
         SELECT
@@ -69,9 +108,9 @@ def transform_sql():
             COUNT(order_id) AS order_count,
             SUM(total_amount) AS total_spent
         FROM Orders
-        WHERE order_date >= date_add(current_date(), -30)
+        WHERE order_date >= date_add(current_date(), -{WINDOW_DAYS})
         GROUP BY customer_id
-        HAVING total_spent > 5000 OR order_count > 5
+        HAVING {HIGH_RISK_ORDERS_SQL}
     )
     SELECT DISTINCT s.customer_id
     FROM suspicious_logins s
@@ -81,39 +120,25 @@ def transform_sql():
     # Execute the query
     high_risk_customers = spark.sql(query)
     # Show result
-    high_risk_customers.show()
+    debug_show(high_risk_customers)
     return high_risk_customers
 
 
 def transform_dataframe(order_df,user_logins_df):
-    # Define the date range (last 30 days)
-    date_threshold = F.date_add(F.current_date(), -30)
-
-    # Identify suspicious logins
+    # Identify suspicious logins (last WINDOW_DAYS days)
     suspicious_logins = (
-        user_logins_df.filter(F.col("login_date") >= date_threshold)
+        user_logins_df.filter(F.col("login_date") >= window_start())
         .groupBy("customer_id")
-        .agg(
-            F.countDistinct("ip_address").alias("unique_ips"),
-            F.count("*").alias("total_attempts")
-        )
-        .filter((F.col("unique_ips") > 3) | (F.col("total_attempts") > 10))
+        .agg(*login_aggregations())
+        .filter(is_suspicious_login())
     )
 
     # Identify high-risk orders
-    high_risk_orders = (
-        order_df.filter(F.col("order_date") >= date_threshold)
-        .groupBy("customer_id")
-        .agg(
-            F.count("order_id").alias("order_count"),
-            F.sum("total_amount").alias("total_spent")
-        )
-        .filter((F.col("total_spent") > 5000) | (F.col("order_count") > 5))
-    )
+    high_risk_orders = get_high_risk_orders(get_order_totals(order_df))
 
     # Join both datasets to find high-risk
-    suspicious_logins.show()
-    high_risk_orders.show()
+    debug_show(suspicious_logins)
+    debug_show(high_risk_orders)
 
     # Perform the JOIN operation
     suspicious_customers_df = suspicious_logins.join(
@@ -123,6 +148,92 @@ def transform_dataframe(order_df,user_logins_df):
     ).select("customer_id").distinct()
 
     # Show results
-    suspicious_customers_df.show()
+    debug_show(suspicious_customers_df)
+
+    return suspicious_customers_df
+
+
+def get_order_totals(order_df):
+    return (
+        order_df.filter(F.col("order_date") >= window_start())
+        .groupBy("customer_id")
+        .agg(*order_aggregations())
+    )
+
+
+def get_high_risk_orders(order_totals_df):
+    return order_totals_df.filter(is_high_risk_order())
+
+
+def build_sketch(ip_addresses, precision: int):
+    return bytearray(hll.add_all(hll.empty_sketch(precision), ip_addresses))
+
+
+def estimate_union(sketches):
+    return hll.estimate(reduce(hll.merge, [bytes(sketch) for sketch in sketches]))
+
+
+def update_login_sketches(spark: SparkSession, sketch_path, window_days=WINDOW_DAYS, precision=HLL_PRECISION):
+    """
+    Maintains one row per customer per day (dt) with the login attempts and a HyperLogLog
+    sketch of the IP addresses. The built days are tracked in <sketch_path>_built_days.json,
+    so a day without logins is not rebuilt on every run. Only days missing from it, plus
+    yesterday and today, are built from LoginHistory; their partitions are deleted first,
+    so a rebuilt day that lost its rows keeps none. Days that left the window are deleted,
+    and a change of HLL_PRECISION rebuilds the whole window.
+    """
+    today = get_current_date(spark)
+    window_start = today - timedelta(days=window_days)
+    built = read_json(sketch_path + SKETCH_DAYS_FILE) or {}
+    stored_days = {date.fromisoformat(day) for day in built.get("days", [])} if built.get("precision") == precision else set()
+    window = {window_start + timedelta(days=offset) for offset in range(window_days + 1)}
+    days_to_build = sorted((window - stored_days) | {today - timedelta(days=1), today})
+    logger.info(f"Building login sketches for {len(days_to_build)} day(s) from {days_to_build[0]}")
+
+    login_source = dict(JOB_RDS_SOURCES["fraud_detection"]["LoginHistory"], window_days=(today - days_to_build[0]).days)
+    user_logins_df = read_source(spark,USER_MYSQL_URL,"LoginHistory",**login_source)
+    # The distinct addresses are collected in the JVM; Python only hashes each set once
+    sketches_df = (
+        user_logins_df.withColumn("dt", F.to_date("login_date"))
+        .filter(F.col("dt").isin(days_to_build))
+        .groupBy("customer_id", "dt")
+        .agg(F.count(F.lit(1)).alias("login_attempts"), F.collect_set("ip_address").alias("ip_addresses"))
+        .select("customer_id", "login_attempts",
+                F.udf(partial(build_sketch, precision=precision), BinaryType())("ip_addresses").alias("ip_sketch"), "dt")
+    )
+    for day in days_to_build:
+        delete_path(f"{sketch_path}dt={day.isoformat()}/")
+    write_to_s3(sketches_df, sketch_path, mode="append", partition_by=["dt"])
+    built_days = (stored_days & window) | set(days_to_build)
+    write_json(sketch_path + SKETCH_DAYS_FILE, {"precision": precision, "days": sorted(day.isoformat() for day in built_days)})
+
+    for path in list_subpaths(sketch_path):
+        if "dt=" in path and date.fromisoformat(path.rstrip("/").split("dt=")[-1]) < window_start:
+            delete_path(path)
+
+
+def read_login_features(spark: SparkSession, sketch_path, window_days=WINDOW_DAYS):
+    """
+    Merges the daily sketches of the window into unique_ips and total_attempts per customer.
+    """
+    sketches_df = spark.read.parquet(sketch_path).filter(F.col("dt") >= F.date_add(F.current_date(), -int(window_days)))
+    return (
+        sketches_df.groupBy("customer_id")
+        .agg(F.collect_list("ip_sketch").alias("ip_sketches"), F.sum("login_attempts").alias("total_attempts"))
+        .select("customer_id", F.udf(estimate_union, LongType())("ip_sketches").alias("unique_ips"), "total_attempts")
+    )
+
+
+def transform_sketch(order_totals_df,login_features_df):
+    # Same rules as transform_dataframe, with unique_ips estimated from the sketches
+    suspicious_logins = login_features_df.filter(is_suspicious_login())
+
+    suspicious_customers_df = suspicious_logins.join(
+        get_high_risk_orders(order_totals_df),
+        on="customer_id",
+        how="inner"
+    ).select("customer_id").distinct()
+
+    debug_show(suspicious_customers_df)
 
-    return suspicious_customers_df
\ No newline at end of file
+    return suspicious_customers_df
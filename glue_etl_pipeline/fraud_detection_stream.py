@@ -0,0 +1,137 @@
+import time
+from functools import partial
+from pyspark.sql import functions as F
+from pyspark.sql.window import Window
+from glue_etl_pipeline.fraud_rules import WINDOW_DAYS,login_aggregations,order_aggregations,is_flagged
+from glue_etl_pipeline.state import get_state_root
+from glue_etl_pipeline.table_format import register_parquet_table
+from glue_etl_pipeline.utils import write_to_s3,get_optional_arg
+from glue_etl_pipeline.glue_config import FRAUD_EVENT_SCHEMAS,FRAUD_EVENT_TOPICS,FRAUD_STREAM_TRIGGER,FRAUD_STREAM_WATERMARK,FRAUD_STREAM_SLIDE,FRAUD_STREAM_SHUFFLE_PARTITIONS
+from glue_etl_pipeline.glue_job import start_job
+from glue_etl_pipeline.logging import get_logger
+
+# Initialize Logger
+logger = get_logger("fraud detection stream")
+
+def run_etl():
+    args, glueContext, job = start_job(["JOB_NAME", "S3_TARGET_PATH"])
+    spark = glueContext.spark_session
+    s3_output_path =args['S3_TARGET_PATH'] +args["JOB_NAME"]
+    start_time = time.time()
+    try:
+        logger.info(f"Starting Streaming Job {args['JOB_NAME']}")
+        spark.conf.set("spark.sql.shuffle.partitions", FRAUD_STREAM_SHUFFLE_PARTITIONS)
+
+        source = get_optional_arg("FRAUD_STREAM_SOURCE", "files")
+        login_events = read_event_stream(spark, "LoginHistory", source)
+        order_events = read_event_stream(spark, "Orders", source)
+
+        query = (
+            transform_stream(login_events, order_events).writeStream
+            .queryName(args["JOB_NAME"])
+            .outputMode("update")
+            .foreachBatch(partial(write_flags, s3_output_path=s3_output_path, registered=[]))
+            .option("checkpointLocation", get_checkpoint_path())
+            .trigger(processingTime=FRAUD_STREAM_TRIGGER)
+            .start()
+        )
+        logger.info(f"Scoring {source} events every {FRAUD_STREAM_TRIGGER} into {s3_output_path}")
+        query.awaitTermination()
+
+        logger.info("Streaming Job Completed Successfully")
+    except Exception as e:
+        logger.error(f"Streaming Job Failed: {str(e)}")
+        raise e
+    finally:
+        duration = time.time() - start_time
+        logger.info(f"Streaming Job Duration: {duration:.2f} seconds")
+        job.commit()
+
+
+def get_checkpoint_path():
+    """
+    --CHECKPOINT_PATH, or a checkpoint under the state root. The query resumes from it on restart.
+    """
+    checkpoint_path = get_optional_arg("CHECKPOINT_PATH")
+    if checkpoint_path:
+        return checkpoint_path
+    if not get_state_root():
+        raise ValueError("fraud_detection_stream needs --CHECKPOINT_PATH or --STATE_PATH")
+    return get_state_root() + "fraud_detection/stream_checkpoint/"
+
+
+def read_event_stream(spark, tablename, source="files"):
+    """
+    Streams a table's events as JSON, from a Kafka topic (any Kafka-compatible broker, e.g.
+    a local one) or from files dropped under <FRAUD_STREAM_PATH><table>/.
+    """
+    schema = FRAUD_EVENT_SCHEMAS[tablename]
+    if source == "kafka":
+        events = (
+            spark.readStream.format("kafka")
+            .option("kafka.bootstrap.servers", get_optional_arg("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092"))
+            .option("subscribe", FRAUD_EVENT_TOPICS[tablename])
+            .option("startingOffsets", get_optional_arg("KAFKA_STARTING_OFFSETS", "latest"))
+            .load()
+        )
+        return events.select(F.from_json(F.col("value").cast("string"), schema).alias("event")).select("event.*")
+    stream_path = get_optional_arg("FRAUD_STREAM_PATH")
+    if not stream_path:
+        raise ValueError("--FRAUD_STREAM_PATH is required with --FRAUD_STREAM_SOURCE files")
+    return spark.readStream.schema(schema).json(f"{stream_path.rstrip('/')}/{tablename}/")
+
+
+def transform_stream(login_events, order_events):
+    # Logins and orders are unioned into one event stream and aggregated once per customer and
+    # sliding window (a stream-stream join of two aggregations is not supported). The window
+    # spans WINDOW_DAYS + 1 days, as the batch date >= current_date - WINDOW_DAYS does.
+    events = login_events.select(
+        "customer_id",
+        F.col("login_date").alias("event_time"),
+        "ip_address",
+        "login_date",
+        F.lit(None).cast("bigint").alias("order_id"),
+        F.lit(None).cast("decimal(12,2)").alias("total_amount"),
+    ).unionByName(order_events.select(
+        "customer_id",
+        F.col("order_date").alias("event_time"),
+        F.lit(None).cast("string").alias("ip_address"),
+        F.lit(None).cast("timestamp").alias("login_date"),
+        "order_id",
+        "total_amount",
+    ))
+
+    return (
+        events.withWatermark("event_time", FRAUD_STREAM_WATERMARK)
+        .groupBy("customer_id", F.window("event_time", f"{WINDOW_DAYS + 1} days", FRAUD_STREAM_SLIDE))
+        .agg(*login_aggregations(streaming=True), *order_aggregations())
+        .filter(is_flagged())
+    )
+
+
+def write_flags(batch_df, batch_id, s3_output_path, registered=None):
+    # Update mode emits every window the new events fall into; per customer, keep the open
+    # window reaching furthest back, i.e. the last WINDOW_DAYS days up to now
+    now = F.current_timestamp()
+    earliest_open_window = Window.partitionBy("customer_id").orderBy(F.col("window.start"))
+    flags_df = (
+        batch_df.filter((F.col("window.start") <= now) & (F.col("window.end") > now))
+        .withColumn("window_rank", F.row_number().over(earliest_open_window))
+        .filter(F.col("window_rank") == 1)
+        .select(
+            "customer_id",
+            F.col("window.start").alias("window_start"),
+            F.col("window.end").alias("window_end"),
+            "unique_ips",
+            "total_attempts",
+            "order_count",
+            "total_spent",
+            now.alias("flagged_at"),
+            F.lit(batch_id).alias("batch_id"),
+        )
+    )
+    write_to_s3(flags_df, s3_output_path, mode="append")
+    # The flags are plain appended Parquet; the catalog table is (re)registered once per run
+    if registered is not None and not registered and s3_output_path.startswith("s3://"):
+        register_parquet_table(s3_output_path, flags_df.schema)
+        registered.append(s3_output_path)
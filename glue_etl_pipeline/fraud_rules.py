@@ -0,0 +1,50 @@
+from pyspark.sql import functions as F
+
+# Fraud rules shared by the batch (fraud_detection) and streaming (fraud_detection_stream) jobs:
+# a customer is flagged when both their logins and their orders over the window look risky.
+WINDOW_DAYS = 30
+MAX_UNIQUE_IPS = 3
+MAX_LOGIN_ATTEMPTS = 10
+MAX_TOTAL_SPENT = 5000
+MAX_ORDER_COUNT = 5
+
+SUSPICIOUS_LOGINS_SQL = f"unique_ips > {MAX_UNIQUE_IPS} OR total_attempts > {MAX_LOGIN_ATTEMPTS}"
+HIGH_RISK_ORDERS_SQL = f"total_spent > {MAX_TOTAL_SPENT} OR order_count > {MAX_ORDER_COUNT}"
+
+
+def window_start():
+    """
+    First date of the rule window, as the batch jobs filter it: date >= current_date - WINDOW_DAYS.
+    """
+    return F.date_add(F.current_date(), -WINDOW_DAYS)
+
+
+def login_aggregations(streaming=False):
+    """
+    unique_ips and total_attempts per customer. Distinct aggregates are not supported in
+    streaming aggregations, so the stream counts the collected set of addresses (still exact).
+    """
+    unique_ips = F.size(F.collect_set("ip_address")) if streaming else F.countDistinct("ip_address")
+    return [unique_ips.alias("unique_ips"), F.count("login_date").alias("total_attempts")]
+
+
+def order_aggregations():
+    """
+    order_count and total_spent per customer.
+    """
+    return [F.count("order_id").alias("order_count"), F.sum("total_amount").alias("total_spent")]
+
+
+def is_suspicious_login():
+    return F.expr(SUSPICIOUS_LOGINS_SQL)
+
+
+def is_high_risk_order():
+    return F.expr(HIGH_RISK_ORDERS_SQL)
+
+
+def is_flagged():
+    """
+    Both rules, for rows that carry the login and the order features.
+    """
+    return is_suspicious_login() & is_high_risk_order()
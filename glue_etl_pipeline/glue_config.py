@@ -19,4 +19,178 @@ MYSQL_PROPERTIES = {
     'driver': 'com.mysql.cj.jdbc.Driver',
     'allowPublicKeyRetrieval':'true',
     'useSSL':'false'
-}
\ No newline at end of file
+}
+
+# Parallel JDBC reads: each table is split on a numeric column into num_partitions
+# ranges, one connection per range. lower_bound/upper_bound may be set to skip the
+# MIN/MAX discovery query.
+JDBC_FETCH_SIZE = 10000
+RDS_PARTITION_CONFIG = {
+    "Orders": {"column": "order_id", "num_partitions": 8},
+    "Order_Items": {"column": "order_id", "num_partitions": 8},
+    "LoginHistory": {"column": "customer_id", "num_partitions": 8},
+    "Customers": {"column": "customer_id", "num_partitions": 4},
+    "Products": {"column": "product_id", "num_partitions": 2},
+}
+
+# Columns and date window each job needs from its RDS tables, pushed down into the
+# subquery sent to MySQL. window_days keeps rows with date_column in the last N days.
+JOB_RDS_SOURCES = {
+    "churn_prediction": {
+        "Orders": {"columns": ["customer_id", "order_id", "order_date"], "date_column": "order_date"},
+    },
+    "fraud_detection": {
+        "LoginHistory": {"columns": ["customer_id", "ip_address", "login_date"],
+                         "date_column": "login_date", "window_days": 30},
+        "Orders": {"columns": ["customer_id", "order_id", "total_amount", "order_date"],
+                   "date_column": "order_date", "window_days": 30},
+    },
+    "omni_channel_engagement": {
+        "Orders": {"columns": ["customer_id", "order_id", "total_amount", "order_date"],
+                   "date_column": "order_date", "window_days": 90},
+    },
+    "pricing_trends": {
+        "Orders": {"columns": ["order_id", "customer_id", "order_date"]},
+        "Order_Items": {"columns": ["order_id", "product_id", "quantity", "unit_price"]},
+        "Products": {"columns": ["product_id"]},
+    },
+    "daily_aggregates": {
+        "Orders": {"columns": ["customer_id", "order_id", "total_amount", "order_date"], "date_column": "order_date"},
+        "LoginHistory": {"columns": ["customer_id", "login_date"], "date_column": "login_date"},
+    },
+    "purchase_behavior": {
+        "Customers": {"columns": ["customer_id", "country", "first_name", "email"],
+                      "predicate": "country LIKE 'United %'"},
+        "Orders": {"columns": ["customer_id", "order_id", "total_amount", "order_date"],
+                   "date_column": "order_date", "window_days": 365},
+    },
+}
+
+# Source snapshots: every RDS table is extracted once per workflow run into partitioned
+# Parquet under --SNAPSHOT_PATH and shared by the analytics jobs of that run.
+RDS_TABLE_URLS = {
+    "Orders": ORDER_MYSQL_URL,
+    "Order_Items": ORDER_MYSQL_URL,
+    "LoginHistory": USER_MYSQL_URL,
+    "Customers": USER_MYSQL_URL,
+    "Products": PRODUCT_MYSQL_URL,
+}
+# Snapshots of these tables are partitioned by dt = to_date(<column>)
+SNAPSHOT_DATE_COLUMNS = {
+    "Orders": "order_date",
+    "LoginHistory": "login_date",
+}
+SNAPSHOT_TTL_HOURS = 24
+
+# Incremental extraction: only rows whose watermark_column is above the stored high-water
+# mark (minus lookback_days, to pick up late and updated rows) are pulled, then merged into
+# the table's current snapshot on key_columns. append_only tables have a strictly increasing
+# watermark and are appended without a merge. The data and the new mark are committed in one
+# manifest put. Tables not listed are re-extracted in full.
+INCREMENTAL_TABLES = {
+    "Orders": {"watermark_column": "order_date", "key_columns": ["order_id"], "lookback_days": 1},
+    "LoginHistory": {"watermark_column": "login_date", "key_columns": ["customer_id", "login_date", "ip_address"],
+                     "lookback_days": 1},
+    "Order_Items": {"watermark_column": "order_id", "key_columns": ["order_id", "product_id"], "append_only": True},
+}
+
+# Job outputs are written unsorted. Where a consumer needs an ordering, the first n rows
+# by order_by are written as a small sorted sidecar next to the output (<output>_top_<n>).
+OUTPUT_TOP_N = {
+    "churn_prediction": {"order_by": "days_since_last_purchase", "n": 100},
+    "omni_channel_engagement": {"order_by": "total_spent", "n": 100},
+}
+
+# Join planning: a join side estimated at or below this size is broadcast, otherwise the
+# join is planned as a sort-merge join
+BROADCAST_THRESHOLD_BYTES = 64 * 1024 * 1024
+
+# HyperLogLog precision for the fraud_detection sketch mode (--FRAUD_LOGIN_MODE sketch,
+# overridable with --HLL_PRECISION):
+# 2^p registers per dense sketch, relative error ~1.04 / sqrt(2^p). Small sets stay exact.
+HLL_PRECISION = 12
+
+# Daily pre-aggregates: one row of counters per customer per day (dt) under
+# <STATE_PATH>daily_aggregates/, so an N-day window is a sum over N daily partitions.
+# Days up to the longest job window are kept; every run rebuilds the missing days plus the
+# last DAILY_AGGREGATE_REBUILD_DAYS (today is partial and late rows land in yesterday).
+DAILY_AGGREGATE_WINDOW_DAYS = 365
+DAILY_AGGREGATE_REBUILD_DAYS = 2
+
+# Streaming fraud scoring (fraud_detection_stream): login and order events arrive as JSON,
+# either as files dropped under <FRAUD_STREAM_PATH><table>/ or on Kafka topics.
+FRAUD_EVENT_SCHEMAS = {
+    "LoginHistory": "customer_id BIGINT, ip_address STRING, login_date TIMESTAMP",
+    "Orders": "customer_id BIGINT, order_id BIGINT, total_amount DECIMAL(12,2), order_date TIMESTAMP",
+}
+FRAUD_EVENT_TOPICS = {
+    "LoginHistory": "login_events",
+    "Orders": "order_events",
+}
+# Micro-batch interval, how late an event may arrive and still count, and the step of the
+# sliding rule window. The state store is split into FRAUD_STREAM_SHUFFLE_PARTITIONS
+# partitions (fixed by the first run of a checkpoint); 200 would add latency to every batch.
+FRAUD_STREAM_TRIGGER = "5 seconds"
+FRAUD_STREAM_WATERMARK = "1 hour"
+FRAUD_STREAM_SLIDE = "1 day"
+FRAUD_STREAM_SHUFFLE_PARTITIONS = 8
+
+# DynamoDB reads. method "glue" uses the Glue DynamoDB connector with splits parallel scan
+# segments, each allowed read_percent of the table's read capacity. "export" reads a DynamoDB
+# export to S3 (no read capacity, needs point-in-time recovery and --DYNAMODB_EXPORT_PATH).
+# "scan" runs a boto3 segmented scan with per-segment timing. With --DYNAMODB_ENDPOINT it
+# targets e.g. DynamoDB Local, which the Glue connector cannot reach.
+DYNAMODB_REGION = "ap-south-1"
+DYNAMODB_READ_CONFIG = {
+    "CustomerSupport": {"method": "glue", "splits": 8, "read_percent": 0.5},
+    "EnterpriseCampaigns": {"method": "glue", "splits": 16, "read_percent": 0.5},
+}
+# Attributes the jobs use from each DynamoDB table (Spark DDL). Reads are pruned to these
+# before toDF() and cast to the declared types, so unused attributes are never inferred or
+# converted and DynamoDB choice types resolve to one type.
+DYNAMODB_SCHEMAS = {
+    "CustomerSupport": "CustomerID BIGINT, TicketID STRING, Timestamp STRING, Issue STRUCT<Status: STRING>",
+    "EnterpriseCampaigns": "CustomerID BIGINT, Interactions ARRAY<STRUCT<Timestamp: STRING, Channel: STRING, Action: STRING>>",
+}
+
+# Output files: write_to_s3 sizes files towards TARGET_FILE_BYTES and compresses Parquet with
+# OUTPUT_COMPRESSION (--OUTPUT_COMPRESSION overrides it, e.g. zstd). OUTPUT_LAYOUT gives each
+# job output its partition columns and the columns rows are sorted by within each file, so
+# row-group min/max statistics let filtered reads skip most of the file.
+TARGET_FILE_BYTES = 128 * 1024 * 1024
+OUTPUT_COMPRESSION = "snappy"
+OUTPUT_LAYOUT = {
+    "churn_prediction": {"sort_by": ["customer_id"]},
+    "fraud_detection": {"sort_by": ["customer_id"]},
+    "omni_channel_engagement": {"sort_by": ["customer_id"]},
+    "pricing_trends": {"partition_by": ["order_year"], "sort_by": ["product_id"]},
+    "purchase_behavior": {"sort_by": ["country", "spending_rank"]},
+}
+
+# Job outputs are manifest tables (table_format): each run writes a new snapshot and commits
+# it with one manifest put. TABLE_RETAIN_VERSIONS committed versions are kept for time travel
+# and for readers still planning against the previous one.
+TABLE_RETAIN_VERSIONS = 2
+
+# Per-customer outputs are merged (table_format.merge_table): rows are bucketed on the key into
+# about one TARGET_FILE_BYTES file per bucket, at most MERGE_BUCKETS (--MERGE_BUCKETS fixes the
+# count), and a run only rewrites the buckets holding changed keys. Once a version's files span
+# MERGE_MAX_SNAPSHOTS snapshots, the next merge rewrites the whole table into one.
+MERGE_BUCKETS = 256
+MERGE_MAX_SNAPSHOTS = 16
+
+# job_runner runs these analytics jobs in one Spark application (--JOBS selects a subset).
+# Each job runs in its own session and FAIR scheduler pool, so independent jobs share the
+# executors; the application needs --conf spark.scheduler.mode=FAIR for that.
+RUNNER_JOBS = ["purchase_behavior", "churn_prediction", "omni_channel_engagement", "fraud_detection", "pricing_trends"]
+
+# Which of a job's two transforms runs on the raw sources: "sql" (transform_sql over the
+# registered views) or "dataframe" (transform_dataframe). --IMPLEMENTATION overrides it for
+# a run; benchmarks/implementation_compare.py checks both give the same rows and times them.
+JOB_IMPLEMENTATIONS = {
+    "purchase_behavior": "dataframe",
+    "churn_prediction": "sql",
+    "omni_channel_engagement": "sql",
+    "fraud_detection": "sql",
+    "pricing_trends": "dataframe",
+}
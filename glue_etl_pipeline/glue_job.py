@@ -0,0 +1,20 @@
+import sys
+
+
+def start_job(required_args):
+    """
+    Resolves the job arguments and initialises the Glue job on the running SparkContext.
+    Returns (args, glueContext, job). Job modules call it from run_etl, so importing them
+    (e.g. from job_runner, or in a plain pyspark session) creates no context, and awsglue is
+    only needed when a job actually starts.
+    """
+    from pyspark.context import SparkContext
+    from awsglue.context import GlueContext
+    from awsglue.job import Job
+    from awsglue.utils import getResolvedOptions
+
+    args = getResolvedOptions(sys.argv, required_args)
+    glueContext = GlueContext(SparkContext.getOrCreate())
+    job = Job(glueContext)
+    job.init(args["JOB_NAME"], args)
+    return args, glueContext, job
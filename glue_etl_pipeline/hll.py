@@ -0,0 +1,102 @@
+import hashlib
+import math
+import struct
+
+# Serialised sketch: 1 byte mode, 1 byte precision, then the payload.
+# Sparse sketches hold the distinct 64-bit hashes (exact, a few bytes for the handful of
+# values most customers have); they switch to 2^precision dense registers once that is smaller.
+SPARSE = 0
+DENSE = 1
+
+
+def hash_value(value) -> int:
+    """
+    Stable 64-bit hash, identical on every executor (unlike Python's salted hash()).
+    """
+    return int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def empty_sketch(precision: int) -> bytes:
+    return bytes([SPARSE, precision])
+
+
+def relative_error(precision: int) -> float:
+    """
+    Standard error of the dense estimate for a precision (sparse sketches are exact).
+    """
+    return 1.04 / math.sqrt(2 ** precision)
+
+
+def _sparse_hashes(sketch: bytes):
+    payload = sketch[2:]
+    return set(struct.unpack(f">{len(payload) // 8}Q", payload))
+
+
+def _dense_registers(sketch: bytes, precision: int) -> bytearray:
+    if sketch[0] == DENSE:
+        return bytearray(sketch[2:])
+    registers = bytearray(2 ** precision)
+    for hashed in _sparse_hashes(sketch):
+        _update_register(registers, hashed, precision)
+    return registers
+
+
+def _update_register(registers: bytearray, hashed: int, precision: int):
+    index = hashed >> (64 - precision)
+    remaining = hashed & ((1 << (64 - precision)) - 1)
+    rank = (64 - precision) - remaining.bit_length() + 1
+    if rank > registers[index]:
+        registers[index] = rank
+
+
+def _from_hashes(hashes, precision: int) -> bytes:
+    if len(hashes) * 8 < 2 ** precision:
+        return bytes([SPARSE, precision]) + struct.pack(f">{len(hashes)}Q", *sorted(hashes))
+    registers = bytearray(2 ** precision)
+    for hashed in hashes:
+        _update_register(registers, hashed, precision)
+    return bytes([DENSE, precision]) + bytes(registers)
+
+
+def add(sketch: bytes, value) -> bytes:
+    return add_all(sketch, [value])
+
+
+def add_all(sketch: bytes, values) -> bytes:
+    precision = sketch[1]
+    hashes = [hash_value(value) for value in values if value is not None]
+    if sketch[0] == SPARSE:
+        return _from_hashes(_sparse_hashes(sketch).union(hashes), precision)
+    registers = bytearray(sketch[2:])
+    for hashed in hashes:
+        _update_register(registers, hashed, precision)
+    return bytes([DENSE, precision]) + bytes(registers)
+
+
+def merge(left: bytes, right: bytes) -> bytes:
+    precision = left[1]
+    if right[1] != precision:
+        raise ValueError(f"Cannot merge sketches of precision {left[1]} and {right[1]}")
+    if left[0] == SPARSE and right[0] == SPARSE:
+        return _from_hashes(_sparse_hashes(left) | _sparse_hashes(right), precision)
+    left_registers = _dense_registers(left, precision)
+    right_registers = _dense_registers(right, precision)
+    return bytes([DENSE, precision]) + bytes(max(a, b) for a, b in zip(left_registers, right_registers))
+
+
+def estimate(sketch: bytes) -> int:
+    """
+    Distinct count: exact for sparse sketches, HyperLogLog with linear counting for small
+    ranges for dense ones.
+    """
+    if sketch[0] == SPARSE:
+        return (len(sketch) - 2) // 8
+    precision = sketch[1]
+    registers = sketch[2:]
+    m = 2 ** precision
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw_estimate = alpha * m * m / sum(2.0 ** -register for register in registers)
+    zeros = registers.count(0)
+    if raw_estimate <= 2.5 * m and zeros:
+        return int(round(m * math.log(m / zeros)))
+    return int(round(raw_estimate))
@@ -0,0 +1,142 @@
+import time
+from decimal import Decimal
+from pyspark.sql import DataFrame
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+from glue_etl_pipeline.glue_config import INCREMENTAL_TABLES,SNAPSHOT_DATE_COLUMNS
+from glue_etl_pipeline.snapshot import SNAPSHOT_PARTITION_COLUMN,get_snapshot_path,get_snapshot_columns,write_snapshot_manifest
+from glue_etl_pipeline.table_format import read_manifest,read_table,stage_snapshot,commit_snapshot
+from glue_etl_pipeline.utils import read_from_rds,get_optional_arg
+from glue_etl_pipeline.logging import get_logger
+
+logger = get_logger("incremental extraction")
+
+
+def get_current_path(snapshot_root: str, tablename: str) -> str:
+    """
+    Location of the incrementally maintained copy of a table, shared by every workflow run.
+    It is a manifest table (table_format): each extract is staged as a new snapshot and
+    committed, with the new high-water mark, in the same manifest put.
+    """
+    return f"{snapshot_root}{tablename}/current/"
+
+
+def get_bookmark_option() -> str:
+    """
+    The job's --job-bookmark-option: disable forces a full extract, pause extracts
+    incrementally without advancing the high-water mark.
+    """
+    return get_optional_arg("job-bookmark-option", "job-bookmark-enable")
+
+
+def to_watermark_value(value):
+    """
+    Converts a MAX(watermark_column) result into a JSON-serialisable watermark.
+    """
+    if isinstance(value, (int, Decimal)):
+        return int(value)
+    return str(value) if value is not None else None
+
+
+def build_watermark_predicate(config, watermark):
+    """
+    Returns the MySQL predicate selecting the rows above the high-water mark.
+    """
+    if watermark is None:
+        return None
+    column = config["watermark_column"]
+    if isinstance(watermark, int):
+        return f"{column} > {watermark}"
+    return f"{column} >= DATE_SUB('{watermark}', INTERVAL {int(config.get('lookback_days', 0))} DAY)"
+
+
+def merge_into_snapshot(spark: SparkSession, delta_df: DataFrame, current_path: str, current, key_columns, partition_by=None):
+    """
+    Stages the rows of the current version, with delta_df's keys replaced, as a new snapshot
+    of the table. Only the dt partitions the delta touches are rewritten: those of its rows,
+    and those holding one of its keys, since a re-extracted row whose date changed moves to
+    another partition. The files of the other partitions are carried over. Returns the
+    snapshot with its complete file list (its total row count is not known without reading
+    the carried files).
+    """
+    existing_df = read_table(spark, current_path, version=current["version"])
+    kept_files = []
+    if partition_by:
+        # Only the key and dt columns of the current version are read to find the old rows
+        key_partitions = existing_df.join(delta_df.select(*key_columns), key_columns, "left_semi")
+        changed_partitions = [row[0] for row in delta_df.select(SNAPSHOT_PARTITION_COLUMN)
+                              .union(key_partitions.select(SNAPSHOT_PARTITION_COLUMN)).distinct().collect()]
+        existing_df = existing_df.filter(F.col(SNAPSHOT_PARTITION_COLUMN).isin(changed_partitions))
+        changed_values = {str(value) for value in changed_partitions}
+        kept_files = [f for f in current["files"] if f["partition"].get(SNAPSHOT_PARTITION_COLUMN) not in changed_values]
+    merged_df = (existing_df.join(delta_df.select(*key_columns), key_columns, "left_anti")
+                 .unionByName(delta_df))
+    # The merged rows go to a new snapshot, so the files they are read from stay untouched
+    snapshot = stage_snapshot(merged_df, current_path, partition_by=partition_by)
+    return {**snapshot, "files": kept_files + snapshot["files"], "row_count": None, "rewritten_rows": snapshot["row_count"]}
+
+
+def create_incremental_snapshot(spark: SparkSession, database_url, tablename: str, snapshot_root: str, run_id: str, workflow_name=None):
+    """
+    Pulls the rows above the table's high-water mark, stages them (appended, or merged into
+    the current version) as a new snapshot of the current table and commits it together with
+    the new mark, then records this run's snapshot manifest. A run that fails before the
+    commit leaves the previous version and mark in place, so its rerun pulls the same rows
+    once. The run's manifest pins the committed version, whose file list does not change.
+    """
+    start_time = time.time()
+    config = INCREMENTAL_TABLES[tablename]
+    watermark_column = config["watermark_column"]
+    current_path = get_current_path(snapshot_root, tablename)
+    bookmark_option = get_bookmark_option()
+
+    current = read_manifest(current_path)
+    full_refresh = current is None or bookmark_option == "job-bookmark-disable"
+    watermark = None if full_refresh else current["watermark"]
+    columns = get_snapshot_columns(tablename, [watermark_column] + config["key_columns"])
+    date_column = SNAPSHOT_DATE_COLUMNS.get(tablename)
+
+    delta_df = read_from_rds(spark, database_url, tablename, columns=columns,
+                             predicate=build_watermark_predicate(config, watermark))
+    partition_by = None
+    if date_column:
+        delta_df = delta_df.withColumn(SNAPSHOT_PARTITION_COLUMN, F.to_date(F.col(date_column)))
+        partition_by = [SNAPSHOT_PARTITION_COLUMN]
+    # The delta is read from MySQL once and reused for its stats, the merge and the write
+    delta_df = delta_df.localCheckpoint()
+    stats = delta_df.agg(F.count(F.lit(1)).alias("row_count"), F.max(watermark_column).alias("watermark")).first()
+
+    new_watermark = to_watermark_value(stats["watermark"]) if stats["row_count"] else watermark
+    if bookmark_option == "job-bookmark-pause":
+        logger.info(f"Bookmark paused, keeping {tablename} watermark at {watermark}")
+        new_watermark = watermark
+
+    if full_refresh:
+        logger.info(f"Full extract of {tablename} ({bookmark_option}, watermark={watermark})")
+        snapshot = stage_snapshot(delta_df, current_path, partition_by=partition_by)
+    elif stats["row_count"] == 0:
+        logger.info(f"No rows in {tablename} above watermark {watermark}")
+        snapshot = None
+    elif config.get("append_only"):
+        snapshot = stage_snapshot(delta_df, current_path, partition_by=partition_by)
+        row_count = current["row_count"] + snapshot["row_count"] if current["row_count"] is not None else None
+        snapshot = {**snapshot, "files": current["files"] + snapshot["files"], "row_count": row_count}
+    else:
+        snapshot = merge_into_snapshot(spark, delta_df, current_path, current, config["key_columns"], partition_by)
+    if snapshot is not None:
+        current = commit_snapshot(current_path, {
+            **snapshot,
+            "watermark_column": watermark_column,
+            "watermark": new_watermark,
+            "run_id": run_id,
+            "delta_row_count": stats["row_count"],
+        }, catalog=False)
+    logger.info(f"Incremental {tablename}: {stats['row_count']} rows, watermark {watermark} -> {new_watermark}, "
+                f"version {current['version']}")
+
+    return write_snapshot_manifest(get_snapshot_path(snapshot_root, tablename, run_id), tablename, database_url, run_id,
+                                   current_path, columns, date_column, partition_by, row_count=current["row_count"],
+                                   version=current["version"], workflow_name=workflow_name,
+                                   mode="full" if full_refresh else "incremental", table_version=current["version"],
+                                   delta_row_count=stats["row_count"], watermark=current["watermark"],
+                                   extract_seconds=round(time.time() - start_time, 2))
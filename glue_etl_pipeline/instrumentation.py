@@ -0,0 +1,227 @@
+import json
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from functools import partial
+from datetime import datetime, timezone
+from pyspark.sql import DataFrame
+from pyspark.sql import SparkSession
+from glue_etl_pipeline.utils import write_json,get_optional_arg
+from glue_etl_pipeline.logging import get_logger
+
+# Run metrics go to <METRICS_PATH><job>/<run_id>.json; without --METRICS_PATH, to the
+# _metrics/ folder next to the job outputs (Spark and the catalog skip _ folders)
+METRICS_DIR = "_metrics/"
+# Set together by setJobGroup, and restored together
+JOB_GROUP_PROPERTIES = ["spark.jobGroup.id", "spark.job.description", "spark.job.interruptOnCancel"]
+# The status store is updated from the listener bus, shortly after the stages finish. Every
+# phase waits for it, so the wait is capped low: a stage still running after it is recorded
+# with its status and partial metrics
+SETTLE_SECONDS = 2
+DONE_STATUSES = ("COMPLETE", "FAILED", "SKIPPED")
+
+logger = get_logger("instrumentation")
+
+
+def get_status(spark: SparkSession, path: str):
+    """
+    A document of the application's status API (/api/v1), which serves what Spark's status
+    listener recorded about jobs, stages and tasks. None when the Spark UI is disabled.
+    """
+    sc = spark.sparkContext
+    if not sc.uiWebUrl:
+        return None
+    with urllib.request.urlopen(f"{sc.uiWebUrl}/api/v1/applications/{sc.applicationId}/{path}") as response:
+        return json.load(response)
+
+
+def get_group_stages(spark: SparkSession, group: str):
+    """
+    The stage attempts of the jobs run under a job group or any group nested in it, once
+    they are done. None without the status API.
+    """
+    deadline = time.time() + SETTLE_SECONDS
+    while True:
+        jobs = get_status(spark, "jobs")
+        if jobs is None:
+            return None
+        stage_ids = {stage_id for job in jobs if job.get("jobGroup", "") == group or job.get("jobGroup", "").startswith(group + "/")
+                     for stage_id in job["stageIds"]}
+        stages = [attempt for stage_id in sorted(stage_ids) for attempt in get_status(spark, f"stages/{stage_id}")]
+        if all(stage["status"] in DONE_STATUSES for stage in stages) or time.time() > deadline:
+            return [stage for stage in stages if stage["status"] != "SKIPPED"]
+        time.sleep(0.2)
+
+
+def parse_status_time(value):
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fGMT") if value else None
+
+
+def get_stage_metrics(spark: SparkSession, stage):
+    """
+    Duration, task count, shuffle read/write, spill and skew of a stage attempt. The skew
+    ratio is the slowest task's run time over the median one.
+    """
+    submitted, completed = parse_status_time(stage.get("submissionTime")), parse_status_time(stage.get("completionTime"))
+    metrics = {
+        "stage_id": stage["stageId"],
+        "attempt": stage["attemptId"],
+        "name": stage["name"],
+        "status": stage["status"],
+        "seconds": round((completed - submitted).total_seconds(), 3) if submitted and completed else None,
+        "tasks": stage["numTasks"],
+        "failed_tasks": stage["numFailedTasks"],
+        "executor_run_seconds": round(stage["executorRunTime"] / 1000, 3),
+        "input_bytes": stage["inputBytes"],
+        "output_bytes": stage["outputBytes"],
+        "shuffle_read_bytes": stage["shuffleReadBytes"],
+        "shuffle_write_bytes": stage["shuffleWriteBytes"],
+        "spill_bytes": stage["memoryBytesSpilled"] + stage["diskBytesSpilled"],
+        "skew_ratio": None,
+        "peak_execution_memory": None,
+    }
+    if stage["status"] == "COMPLETE" and stage["numCompleteTasks"]:
+        summary = get_status(spark, f"stages/{stage['stageId']}/{stage['attemptId']}/taskSummary?quantiles=0.5,1.0")
+        median_run_time, max_run_time = summary["executorRunTime"]
+        metrics["skew_ratio"] = round(max_run_time / median_run_time, 2) if median_run_time else None
+        metrics["peak_execution_memory"] = int(summary["peakExecutionMemory"][1])
+    return metrics
+
+
+def summarize_stages(stages):
+    """
+    Totals over stage metrics: stages, tasks, shuffle, spill, the largest task's peak
+    execution memory and the worst skew ratio.
+    """
+    return {
+        "stages": len(stages),
+        "tasks": sum(stage["tasks"] for stage in stages),
+        "shuffle_read_bytes": sum(stage["shuffle_read_bytes"] for stage in stages),
+        "shuffle_write_bytes": sum(stage["shuffle_write_bytes"] for stage in stages),
+        "spill_bytes": sum(stage["spill_bytes"] for stage in stages),
+        "peak_execution_memory": max((stage["peak_execution_memory"] or 0 for stage in stages), default=0),
+        "max_skew_ratio": max((stage["skew_ratio"] or 0 for stage in stages), default=0),
+    }
+
+
+def collect_group_metrics(spark: SparkSession, group: str):
+    """
+    {totals..., "stage_metrics": [per stage]} of a job group, None without the status API.
+    """
+    stages = get_group_stages(spark, group)
+    if stages is None:
+        return None
+    stage_metrics = [get_stage_metrics(spark, stage) for stage in stages]
+    return {**summarize_stages(stage_metrics), "stage_metrics": stage_metrics}
+
+
+@contextmanager
+def job_group(spark: SparkSession, name: str):
+    """
+    Runs the block's Spark jobs under the job group <enclosing group>/<name> and yields the
+    group id, so a measured block inside another one is counted in both.
+    """
+    sc = spark.sparkContext
+    previous = {key: sc.getLocalProperty(key) for key in JOB_GROUP_PROPERTIES}
+    parent = previous[JOB_GROUP_PROPERTIES[0]]
+    group = f"{parent}/{name}" if parent else name
+    sc.setJobGroup(group, name)
+    try:
+        yield group
+    finally:
+        for key, value in previous.items():
+            sc.setLocalProperty(key, value)
+
+
+def measure(spark: SparkSession, action, name=None):
+    """
+    Runs action() and returns (result, metrics): wall time, the stage totals of its Spark
+    jobs and the largest JVM heap an executor has reported in the application so far.
+    """
+    with job_group(spark, name or f"measure-{uuid.uuid4().hex[:8]}") as group:
+        start_time = time.time()
+        result = action()
+        seconds = time.time() - start_time
+    metrics = collect_group_metrics(spark, group) or {}
+    metrics.pop("stage_metrics", None)
+    executors = get_status(spark, "executors") or []
+    jvm_heap_peak = max((executor.get("peakMemoryMetrics", {}).get("JVMHeapMemory", 0) for executor in executors), default=0)
+    return result, {"seconds": round(seconds, 2), **metrics, "jvm_heap_peak": jvm_heap_peak}
+
+
+def new_run(job_name: str):
+    """
+    The metrics document of one run of a job, filled by phase and capture_plan.
+    """
+    started_at = datetime.now(timezone.utc)
+    return {
+        "job": job_name,
+        "run_id": get_optional_arg("WORKFLOW_RUN_ID") or f"{started_at:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}",
+        "started_at": started_at.isoformat(),
+        "phases": {},
+        "plans": {},
+    }
+
+
+@contextmanager
+def phase(spark: SparkSession, run, name: str):
+    """
+    Times a phase of the run (extract, transform, write, ...) and records the metrics of
+    every stage its Spark jobs ran. Plans are lazy, so most stages run in the write phase.
+    """
+    with job_group(spark, f"{run['job']}-{run['run_id']}/{name}") as group:
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            seconds = time.time() - start_time
+    try:
+        metrics = collect_group_metrics(spark, group)
+    except Exception as e:
+        # Metrics are diagnostics: the job goes on without them
+        logger.warning(f"No stage metrics for {run['job']} {name}: {str(e)}")
+        metrics = None
+    run["phases"][name] = {"seconds": round(seconds, 2), **(metrics or {})}
+    if metrics:
+        logger.info(f"{run['job']} {name}: {seconds:.2f}s  stages {metrics['stages']}  tasks {metrics['tasks']}  "
+                    f"shuffle read {metrics['shuffle_read_bytes']}  write {metrics['shuffle_write_bytes']}  "
+                    f"spill {metrics['spill_bytes']}  skew {metrics['max_skew_ratio']}")
+    else:
+        logger.info(f"{run['job']} {name}: {seconds:.2f}s (no stage metrics)")
+
+
+def capture_plan(run, output: str, df: DataFrame):
+    """
+    Records explain("formatted") of an output, the physical plan it is about to be written with.
+    """
+    run["plans"][output] = df.sparkSession._jvm.PythonSQLUtils.explainString(df._jdf.queryExecution(), "formatted")
+
+
+def plan_capture(run, output: str):
+    """
+    An on_write hook for write_to_s3 and the table writes: records the plan of the DataFrame
+    actually written, after the write's own repartitioning and sorting.
+    """
+    return partial(capture_plan, run, output)
+
+
+def get_metrics_path(job_name: str, run_id: str, s3_output_path: str):
+    """
+    <METRICS_PATH or the output's parent>/_metrics/<job>/<run_id>.json: outside the output
+    table, so its prefix only holds the table.
+    """
+    metrics_root = get_optional_arg("METRICS_PATH") or f"{s3_output_path.rstrip('/').rsplit('/', 1)[0]}/{METRICS_DIR}"
+    return f"{metrics_root.rstrip('/')}/{job_name}/{run_id}.json"
+
+
+def write_run_metrics(run, s3_output_path: str):
+    """
+    Writes the run's phases, stage metrics and plans as one JSON document per run, at
+    get_metrics_path.
+    """
+    run["completed_at"] = datetime.now(timezone.utc).isoformat()
+    metrics_path = get_metrics_path(run["job"], run["run_id"], s3_output_path)
+    write_json(metrics_path, run)
+    logger.info(f"Run metrics written: {metrics_path}")
+    return metrics_path
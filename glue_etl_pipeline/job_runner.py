@@ -0,0 +1,84 @@
+import importlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pyspark.sql import SparkSession
+from glue_etl_pipeline.snapshot import share_sources,release_shared_sources
+from glue_etl_pipeline.utils import get_optional_arg
+from glue_etl_pipeline.glue_config import JOB_RDS_SOURCES,RUNNER_JOBS
+from glue_etl_pipeline.glue_job import start_job
+from glue_etl_pipeline.logging import get_logger
+
+# Initialize Logger
+logger = get_logger("job runner")
+
+def run_etl():
+    args, glueContext, job = start_job(["JOB_NAME", "S3_TARGET_PATH"])
+    spark = glueContext.spark_session
+    start_time = time.time()
+    try:
+        jobs = get_optional_arg("JOBS", ",".join(RUNNER_JOBS)).split(",")
+        logger.info(f"Starting ETL Job {args['JOB_NAME']} for {', '.join(jobs)}")
+        if spark.sparkContext.getConf().get("spark.scheduler.mode", "FIFO") != "FAIR":
+            logger.warning("spark.scheduler.mode is not FAIR: concurrent jobs will queue behind each other")
+
+        share_sources(spark, get_shared_tables(jobs))
+        try:
+            durations = run_jobs(spark, jobs, args['S3_TARGET_PATH'], glueContext,
+                                 int(get_optional_arg("RUNNER_PARALLELISM", len(jobs))))
+        finally:
+            release_shared_sources()
+        logger.info(f"Job durations: {durations}")
+
+        logger.info("ETL Job Completed Successfully")
+    except Exception as e:
+        logger.error(f"ETL Job Failed: {str(e)}")
+        raise e
+    finally:
+        duration = time.time() - start_time
+        logger.info(f"ETL Job Duration: {duration:.2f} seconds")
+        job.commit()
+
+
+def get_shared_tables(jobs):
+    """
+    RDS tables read by more than one of the jobs.
+    """
+    readers = {}
+    for name in jobs:
+        for tablename in JOB_RDS_SOURCES.get(name, {}):
+            readers[tablename] = readers.get(tablename, 0) + 1
+    return [tablename for tablename, count in readers.items() if count > 1]
+
+
+def run_job(spark: SparkSession, name: str, s3_target_path: str, glueContext=None):
+    """
+    Runs one job module's run_job in a new session of the application (its own temp views
+    and SQL settings, same cache) and in its own FAIR scheduler pool. Returns its duration.
+    """
+    spark.sparkContext.setLocalProperty("spark.scheduler.pool", name)
+    start_time = time.time()
+    try:
+        importlib.import_module(f"glue_etl_pipeline.{name}").run_job(spark.newSession(), s3_target_path + name, glueContext)
+    finally:
+        spark.sparkContext.setLocalProperty("spark.scheduler.pool", None)
+    duration = time.time() - start_time
+    logger.info(f"Job {name} Completed in {duration:.2f} seconds")
+    return duration
+
+
+def run_jobs(spark: SparkSession, jobs, s3_target_path: str, glueContext=None, parallelism=None):
+    """
+    Runs the jobs concurrently, parallelism at a time, and returns {job: seconds}. Every job
+    runs to the end; the first failure is raised once all have finished.
+    """
+    unknown = [name for name in jobs if name not in RUNNER_JOBS]
+    if unknown:
+        raise ValueError(f"Not runnable by job_runner: {unknown}")
+    with ThreadPoolExecutor(max_workers=parallelism or len(jobs)) as pool:
+        futures = {name: pool.submit(run_job, spark, name, s3_target_path, glueContext) for name in jobs}
+    errors = {name: future.exception() for name, future in futures.items() if future.exception()}
+    for name, error in errors.items():
+        logger.error(f"Job {name} Failed: {str(error)}")
+    if errors:
+        raise next(iter(errors.values()))
+    return {name: round(future.result(), 2) for name, future in futures.items()}
@@ -0,0 +1,135 @@
+import re
+from pyspark.sql import DataFrame
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+from glue_etl_pipeline.glue_config import MYSQL_PROPERTIES,BROADCAST_THRESHOLD_BYTES
+from glue_etl_pipeline.logging import get_logger
+
+logger = get_logger("join planner")
+
+# Size estimates recorded when each source is read, keyed by table/view name
+SOURCE_SIZES = {}
+
+# Join types for which each side can be the broadcast (build) side
+BROADCAST_RIGHT_JOINS = {"inner", "left", "left_outer", "leftouter", "left_semi", "leftsemi", "left_anti", "leftanti", "cross"}
+BROADCAST_LEFT_JOINS = {"inner", "right", "right_outer", "rightouter", "cross"}
+# Optimized plan nodes whose size statistics are not an estimate of the data
+UNRELIABLE_PLAN_NODES = re.compile(r"JDBCRelation|\bJoin\b")
+
+
+def record_source_size(name: str, size_bytes, row_count=None, origin=None):
+    SOURCE_SIZES[name] = {"size_bytes": size_bytes, "row_count": row_count, "origin": origin}
+    logger.info(f"Size estimate {name}: {format_size(size_bytes)}, rows={row_count} ({origin})")
+
+
+def format_size(size_bytes) -> str:
+    if size_bytes is None:
+        return "unknown"
+    return f"{size_bytes / (1024 * 1024):.1f} MB"
+
+
+def estimate_rds_table_size(spark: SparkSession, database_url, tablename: str):
+    """
+    Records MySQL's own size estimate for a table (information_schema, no table scan).
+    The estimate covers every column and row, so it is an upper bound for projected reads.
+    """
+    stats_query = ("(SELECT TABLE_ROWS AS table_rows, DATA_LENGTH AS data_length FROM information_schema.TABLES "
+                   f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '{tablename}') AS table_stats")
+    try:
+        stats = spark.read.jdbc(url=database_url, table=stats_query, properties=MYSQL_PROPERTIES).first()
+    except Exception as e:
+        logger.info(f"No size estimate for {tablename}: {str(e)}")
+        return None
+    if stats is None:
+        return None
+    record_source_size(tablename, int(stats["data_length"] or 0), int(stats["table_rows"] or 0), "information_schema")
+    return SOURCE_SIZES[tablename]
+
+
+def estimate_plan_size(df: DataFrame):
+    """
+    Spark's optimizer estimate for a DataFrame, None when it has no usable statistics. JDBC
+    relations only report spark.sql.defaultSizeInBytes or a guess, and without CBO a join is
+    estimated as the product of its sides, so plans reading JDBC or joining are unknown.
+    """
+    optimized_plan = df._jdf.queryExecution().optimizedPlan()
+    if UNRELIABLE_PLAN_NODES.search(optimized_plan.toString()):
+        return None
+    # py4j returns sizeInBytes (a Scala BigInt) as a Python int on some versions, a JavaObject on others
+    size_bytes = int(str(optimized_plan.stats().sizeInBytes()))
+    default_size = int(df.sparkSession.conf.get("spark.sql.defaultSizeInBytes", str(2 ** 63 - 1)))
+    return None if size_bytes >= default_size else size_bytes
+
+
+def record_plan_size(name: str, df: DataFrame, origin="spark statistics"):
+    size_bytes = estimate_plan_size(df)
+    if size_bytes is not None:
+        record_source_size(name, size_bytes, origin=origin)
+    return size_bytes
+
+
+def get_size(df: DataFrame, name=None):
+    if name in SOURCE_SIZES:
+        return SOURCE_SIZES[name]["size_bytes"]
+    return estimate_plan_size(df)
+
+
+def choose_strategy(left_size, right_size, how="inner"):
+    """
+    Returns "broadcast_right", "broadcast_left", "sort_merge" when both sizes are known and
+    neither side can be broadcast, or "adaptive" when a size is unknown: the join is left
+    unhinted, so AQE can still broadcast a side that turns out small at runtime.
+    """
+    how = how.lower()
+    candidates = []
+    if right_size is not None and right_size <= BROADCAST_THRESHOLD_BYTES and how in BROADCAST_RIGHT_JOINS:
+        candidates.append((right_size, "broadcast_right"))
+    if left_size is not None and left_size <= BROADCAST_THRESHOLD_BYTES and how in BROADCAST_LEFT_JOINS:
+        candidates.append((left_size, "broadcast_left"))
+    if candidates:
+        return min(candidates)[1]
+    return "sort_merge" if left_size is not None and right_size is not None else "adaptive"
+
+
+def describe_joins(df: DataFrame) -> str:
+    """
+    Summarises the physical join operators and shuffle exchanges Spark planned for a DataFrame.
+    """
+    plan = df._jdf.queryExecution().executedPlan().toString()
+    joins = re.findall(r"(BroadcastHashJoin|SortMergeJoin|ShuffledHashJoin|BroadcastNestedLoopJoin)", plan)
+    return f"{', '.join(joins) or 'no join'}; {plan.count('Exchange ')} shuffle exchange(s)"
+
+
+def plan_join(left_df: DataFrame, right_df: DataFrame, on, how="inner", left_name=None, right_name=None) -> DataFrame:
+    """
+    Joins two DataFrames, broadcasting the side estimated under BROADCAST_THRESHOLD_BYTES,
+    forcing a sort-merge join when both sides are known to be larger and leaving the join to
+    Spark when a size is unknown, and logs the choice.
+    """
+    left_size, right_size = get_size(left_df, left_name), get_size(right_df, right_name)
+    strategy = choose_strategy(left_size, right_size, how)
+    if strategy == "broadcast_right":
+        right_df = F.broadcast(right_df)
+    elif strategy == "broadcast_left":
+        left_df = F.broadcast(left_df)
+    elif strategy == "sort_merge":
+        right_df = right_df.hint("merge")
+    joined_df = left_df.join(right_df, on, how)
+    logger.info(f"Join {left_name or 'left'} ({format_size(left_size)}) x {right_name or 'right'} ({format_size(right_size)}) "
+                f"on {on}: {strategy}, planned {describe_joins(joined_df)}")
+    return joined_df
+
+
+def hint_broadcast_views(spark: SparkSession, *view_names):
+    """
+    For Spark SQL transforms: re-registers each view small enough to broadcast with a
+    broadcast hint, which Spark applies wherever the view is joined.
+    """
+    for view_name in view_names:
+        view_df = spark.table(view_name)
+        size_bytes = get_size(view_df, view_name)
+        if size_bytes is not None and size_bytes <= BROADCAST_THRESHOLD_BYTES:
+            view_df.hint("broadcast").createOrReplaceTempView(view_name)
+            logger.info(f"Join strategy {view_name} ({format_size(size_bytes)}): broadcast")
+        else:
+            logger.info(f"Join strategy {view_name} ({format_size(size_bytes)}): {'adaptive' if size_bytes is None else 'sort_merge'}")
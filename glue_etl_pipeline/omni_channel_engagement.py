@@ -1,71 +1,32 @@
-import sys
 import boto3
 import time
-from pyspark.context import SparkContext
 from pyspark.sql import SparkSession
-from awsglue.context import GlueContext
-from awsglue.job import Job
-from awsglue.utils import getResolvedOptions
 from pyspark.sql import functions as F
 from pyspark.sql.functions import col, count, sum, when, coalesce, desc, date_sub, current_date
 from pyspark.sql.window import Window
-from glue_etl_pipeline.utils import read_from_rds,write_to_s3,read_from_dynamodb
-from glue_etl_pipeline.glue_config import USER_MYSQL_URL,ORDER_MYSQL_URL,PRODUCT_MYSQL_URL
+from glue_etl_pipeline.aggregate_store import use_daily_aggregates,get_daily_aggregates_path,read_window
+from glue_etl_pipeline.snapshot import read_source
+from glue_etl_pipeline.state import get_state_root
+from glue_etl_pipeline.table_format import merge_table,write_top_n
+from glue_etl_pipeline.utils import read_from_dynamodb,debug_show,get_output_layout,get_implementation
+from glue_etl_pipeline.glue_config import USER_MYSQL_URL,ORDER_MYSQL_URL,PRODUCT_MYSQL_URL,JOB_RDS_SOURCES,OUTPUT_TOP_N,DYNAMODB_REGION
+from glue_etl_pipeline.instrumentation import new_run,phase,plan_capture,write_run_metrics
+from glue_etl_pipeline.glue_job import start_job
 from glue_etl_pipeline.logging import get_logger
 
-# Parse job arguments
-args = getResolvedOptions(sys.argv, ["JOB_NAME", "S3_TARGET_PATH"])
-
-# Initialize Spark and Glue Context
-sc = SparkContext()
-glueContext = GlueContext(sc)
-spark = glueContext.spark_session
-job = Job(glueContext)
-job.init(args["JOB_NAME"], args)
-s3_output_path =args['S3_TARGET_PATH'] +args["JOB_NAME"]
-
 # Initialize Logger
 logger = get_logger("omni channel engagement")
 
+# Counters published under another name. resolved_ticjet (sic) is the column downstream
+# readers and the catalog table know; renaming it is a schema migration of its own
+OUTPUT_COLUMNS = {"resolved_ticket": "resolved_ticjet"}
+
 def run_etl():
+    args, glueContext, job = start_job(["JOB_NAME", "S3_TARGET_PATH"])
     start_time = time.time()
     try:
         logger.info(f"Starting ETL Job {args['JOB_NAME']}")
-
-        df_cs=read_from_dynamodb(glueContext,"CustomerSupport","ap-south-1")
-        df=read_from_dynamodb(glueContext,"EnterpriseCampaigns","ap-south-1")
-       
-        order_df =read_from_rds(spark,ORDER_MYSQL_URL,"Orders")
-
-
-        exploded_df = df.withColumn("Interaction", F.explode(F.col("Interactions")))
-
-        # Select exploded fields
-        engagement_df  = exploded_df.select(
-            F.col("CustomerID"),
-            F.col("CampaignID"),
-            F.col("Engagement.Opens"),
-            F.col("Engagement.Clicks"),
-            F.col("Interaction.InteractionID").alias("InteractionID"),
-            F.col("Interaction.Timestamp").alias("Timestamp"),
-            F.col("Interaction.Channel").alias("Channel"),
-            F.col("Interaction.Action").alias("Action")
-        )
-
-        engagement_df .show()
-        engagement_df .printSchema()
-        engagement_df .createOrReplaceTempView("engagement")
-
-        support_df=df_cs.select("*","Issue.Status")
-        support_df.createOrReplaceTempView("SupportTickets")
-        support_df.printSchema()
-
-
-        #common tranformation 
-        result_df=transform_sql()
-        #result_df=transform_dataframe(order_df,engagement_df,support_df)
-
-        write_to_s3(result_df,s3_output_path)
+        run_job(glueContext.spark_session, args['S3_TARGET_PATH'] + args["JOB_NAME"], glueContext)
 
         logger.info("ETL Job Completed Successfully")
     except Exception as e:
@@ -77,140 +38,206 @@ def run_etl():
         job.commit()
 
 
+def run_job(spark: SparkSession, s3_output_path: str, glueContext=None):
+    """
+    Customer engagement from the campaign, support and order sources (or the daily aggregates)
+    to s3_output_path, in the given session: the Glue job's, or one of job_runner's. glueContext
+    reads DynamoDB. Phase timings, stage metrics and the output plan are written to
+    the metrics root (get_metrics_path).
+    """
+    run = new_run("omni_channel_engagement")
+    if use_daily_aggregates(get_state_root(), "omni_channel_engagement"):
+        # 90 daily partitions of per-customer counters instead of rescanning every source
+        with phase(spark, run, "extract"):
+            window_df=read_window(spark,get_daily_aggregates_path(get_state_root()),90)
+        with phase(spark, run, "transform"):
+            result_df=transform_aggregates(window_df)
+    else:
+        with phase(spark, run, "extract"):
+            order_df,engagement_df,support_df =read_sources(spark,glueContext)
+
+        #common tranformation (--IMPLEMENTATION or JOB_IMPLEMENTATIONS)
+        with phase(spark, run, "transform"):
+            if get_implementation("omni_channel_engagement") == "sql":
+                result_df=transform_sql(spark)
+            else:
+                result_df=transform_dataframe(order_df,engagement_df,support_df)
+
+    with phase(spark, run, "write"):
+        merge_table(result_df,s3_output_path,["customer_id"],on_write=plan_capture(run, "omni_channel_engagement"),
+                    **get_output_layout("omni_channel_engagement"))
+        write_top_n(spark,s3_output_path,**OUTPUT_TOP_N["omni_channel_engagement"])
+    write_run_metrics(run, s3_output_path)
+
+
+def read_sources(spark: SparkSession, glueContext=None):
+    """
+    (order_df, engagement_df, support_df): the arguments of transform_dataframe, also
+    registered as the Orders, engagement and SupportTickets views transform_sql reads.
+    glueContext reads DynamoDB.
+    """
+    df_cs=read_from_dynamodb(glueContext,"CustomerSupport",DYNAMODB_REGION,spark=spark)
+    df=read_from_dynamodb(glueContext,"EnterpriseCampaigns",DYNAMODB_REGION,spark=spark)
+
+    order_df =read_source(spark,ORDER_MYSQL_URL,"Orders",**JOB_RDS_SOURCES["omni_channel_engagement"]["Orders"])
+
+
+    # Campaigns are read pruned to CustomerID and the three interaction fields the
+    # transforms use (DYNAMODB_SCHEMAS), so the explode only copies those
+    exploded_df = df.select("CustomerID", F.explode(F.col("Interactions")).alias("Interaction"))
+
+    # Select exploded fields
+    engagement_df  = exploded_df.select(
+        F.col("CustomerID"),
+        F.col("Interaction.Timestamp").alias("Timestamp"),
+        F.col("Interaction.Channel").alias("Channel"),
+        F.col("Interaction.Action").alias("Action")
+    )
+
+    debug_show(engagement_df, schema=True)
+    engagement_df .createOrReplaceTempView("engagement")
 
-def transform_sql():
+    support_df=df_cs.select("CustomerID","TicketID","Timestamp","Issue.Status")
+    support_df.createOrReplaceTempView("SupportTickets")
+    debug_show(support_df, schema=True)
+    return order_df,engagement_df,support_df
+
+
+def transform_sql(spark: SparkSession):
+    # Each source is projected to per-row counters and all of them are combined with one
+    # UNION ALL + GROUP BY, so engagement is scanned once and there is a single shuffle
     query = """
-        WITH email_engagement AS (
-            SELECT
-                CustomerID,
-                COUNT(CASE WHEN Action = 'Opened' AND Channel = 'Email' THEN 1 END) AS EmailsOpened,
-                COUNT(CASE WHEN Action = 'Clicked' AND Channel = 'Email' THEN 1 END) AS EmailsClicked
-            FROM engagement
-            WHERE Timestamp >= date_add(current_date(), -90)
-            GROUP BY CustomerID
-        ), 
-        ad_engagement AS (
+        WITH customer_activity AS (
             SELECT
-                CustomerID,
-                COUNT(CASE WHEN Action = 'Clicked' AND Channel IN ('Web', 'App') THEN 1 END) AS AdClicks,
-                COUNT(CASE WHEN Action = 'Opened' AND Channel IN ('Web', 'App') THEN 1 END) AS AdViews
+                CustomerID AS customer_id,
+                CASE WHEN Action = 'Opened' AND Channel = 'Email' THEN 1 ELSE 0 END AS emails_opened,
+                CASE WHEN Action = 'Clicked' AND Channel = 'Email' THEN 1 ELSE 0 END AS emails_clicked,
+                CASE WHEN Action = 'Clicked' AND Channel IN ('Web', 'App') THEN 1 ELSE 0 END AS ad_clicks,
+                CASE WHEN Action = 'Opened' AND Channel IN ('Web', 'App') THEN 1 ELSE 0 END AS ad_views,
+                0 AS purchases,
+                NULL AS total_amount,
+                0 AS total_ticket,
+                0 AS open_ticket,
+                0 AS resolved_ticket
             FROM engagement
             WHERE Timestamp >= date_add(current_date(), -90)
-            GROUP BY CustomerID
-        ),
-        purchase_activity AS (
+            UNION ALL
             SELECT
                 customer_id,
-                COUNT(order_id) AS purchases,
-                SUM(total_amount) AS total_spent
+                0, 0, 0, 0,
+                CASE WHEN order_id IS NOT NULL THEN 1 ELSE 0 END,
+                total_amount,
+                0, 0, 0
             FROM Orders
             WHERE order_date >= date_add(current_date(), -90)
-            GROUP BY customer_id
-        ), 
-        support_analysis AS (
+            UNION ALL
             SELECT
                 CustomerID,
-                COUNT(TicketID) AS TotalTickets,
-                COUNT(CASE WHEN Status = 'Open' THEN 1 END) AS OpenTickets,
-                COUNT(CASE WHEN Status = 'Resolved' THEN 1 END) AS ResolvedTickets
+                0, 0, 0, 0, 0,
+                NULL,
+                CASE WHEN TicketID IS NOT NULL THEN 1 ELSE 0 END,
+                CASE WHEN Status = 'Open' THEN 1 ELSE 0 END,
+                CASE WHEN Status = 'Resolved' THEN 1 ELSE 0 END
             FROM SupportTickets
             WHERE Timestamp >= date_add(current_date(), -90)
-            GROUP BY CustomerID
         )
         SELECT
             customer_id,
-            COALESCE(EmailsOpened, 0) AS emails_opened,
-            COALESCE(EmailsClicked, 0) AS emails_clicked,
-            COALESCE(AdClicks, 0) AS ad_clicks,
-            COALESCE(AdViews, 0) AS ad_views,
-            COALESCE(purchases, 0) AS purchases,
-            COALESCE(total_spent, 0) AS total_spent,
-            COALESCE(TotalTickets, 0) AS total_ticket,
-            COALESCE(OpenTickets, 0) AS open_ticket,
-            COALESCE(ResolvedTickets, 0) AS resolved_ticjet
-        FROM email_engagement e
-        FULL OUTER JOIN ad_engagement a ON e.CustomerID = a.CustomerID
-        FULL OUTER JOIN purchase_activity p ON a.CustomerID = p.customer_id
-        FULL OUTER JOIN support_analysis s ON a.CustomerID = s.CustomerID ORDER BY total_spent DESC;
+            SUM(emails_opened) AS emails_opened,
+            SUM(emails_clicked) AS emails_clicked,
+            SUM(ad_clicks) AS ad_clicks,
+            SUM(ad_views) AS ad_views,
+            SUM(purchases) AS purchases,
+            COALESCE(SUM(total_amount), 0) AS total_spent,
+            SUM(total_ticket) AS total_ticket,
+            SUM(open_ticket) AS open_ticket,
+            SUM(resolved_ticket) AS resolved_ticjet
+        FROM customer_activity
+        GROUP BY customer_id;
         """
 
     result_df = spark.sql(query)
-    result_df.show(100)
+    debug_show(result_df, 100)
 
     return result_df
 
 
 def transform_dataframe(order_df,engagement_df,support_df):
-
-
-    # Email Engagement
-    email_engagement_df = (
-        engagement_df
-        .filter(col("Timestamp") >= date_sub(current_date(), 90))
-        .groupBy("CustomerID")
-        .agg(
-            count(when((col("Action") == "Opened") & (col("Channel") == "Email"), 1)).alias("EmailsOpened"),
-            count(when((col("Action") == "Clicked") & (col("Channel") == "Email"), 1)).alias("EmailsClicked")
+    counters = ["emails_opened", "emails_clicked", "ad_clicks", "ad_views",
+                "purchases", "total_ticket", "open_ticket", "resolved_ticket"]
+
+    def project(df, customer_col, total_amount=None, **flags):
+        # One row per source row: the customer key, 0/1 counters and the order amount
+        return df.select(
+            col(customer_col).alias("customer_id"),
+            *[coalesce(flags.get(name, F.lit(0)).cast("int"), F.lit(0)).alias(name) for name in counters],
+            (total_amount if total_amount is not None else F.lit(None)).alias("total_amount"),
         )
-    )
 
-    # Ad Engagement
-    ad_engagement_df = (
-        engagement_df
-        .filter(col("Timestamp") >= date_sub(current_date(), 90))
-        .groupBy("CustomerID")
-        .agg(
-            count(when((col("Action") == "Clicked") & (col("Channel").isin("Web", "App")), 1)).alias("AdClicks"),
-            count(when((col("Action") == "Opened") & (col("Channel").isin("Web", "App")), 1)).alias("AdViews")
-        )
+    # Engagement: email and ad counters in a single pass
+    engagement_activity = project(
+        engagement_df.filter(col("Timestamp") >= date_sub(current_date(), 90)),
+        "CustomerID",
+        emails_opened=(col("Action") == "Opened") & (col("Channel") == "Email"),
+        emails_clicked=(col("Action") == "Clicked") & (col("Channel") == "Email"),
+        ad_clicks=(col("Action") == "Clicked") & col("Channel").isin("Web", "App"),
+        ad_views=(col("Action") == "Opened") & col("Channel").isin("Web", "App"),
     )
 
     # Purchase Activity
-    purchase_activity_df = (
-        order_df
-        .filter(col("order_date") >= date_sub(current_date(), 90))
-        .groupBy("customer_id")
-        .agg(
-            count("order_id").alias("purchases"),
-            sum("total_amount").alias("total_spent")
-        )
+    purchase_activity = project(
+        order_df.filter(col("order_date") >= date_sub(current_date(), 90)),
+        "customer_id",
+        total_amount=col("total_amount"),
+        purchases=col("order_id").isNotNull(),
     )
 
     # Support Ticket Analysis
-    support_analysis_df = (
-        support_df
-        .filter(col("Timestamp") >= date_sub(current_date(), 90))
-        .groupBy("CustomerID")
-        .agg(
-            count("TicketID").alias("TotalTickets"),
-            count(when(col("Status") == "Open", 1)).alias("OpenTickets"),
-            count(when(col("Status") == "Resolved", 1)).alias("ResolvedTickets")
-        )
+    support_activity = project(
+        support_df.filter(col("Timestamp") >= date_sub(current_date(), 90)),
+        "CustomerID",
+        total_ticket=col("TicketID").isNotNull(),
+        open_ticket=col("Status") == "Open",
+        resolved_ticket=col("Status") == "Resolved",
     )
 
-    # Full Outer Joins
+    # Keyed union and a single aggregation instead of chained full outer joins
     final_df = (
-        email_engagement_df.alias("e")
-        .join(ad_engagement_df.alias("a"), col("e.CustomerID") == col("a.CustomerID"), "fullouter")
-        .join(purchase_activity_df.alias("p"), col("a.CustomerID") == col("p.customer_id"), "fullouter")
-        .join(support_analysis_df.alias("s"), col("a.CustomerID") == col("s.CustomerID"), "fullouter")
-        .select(
-            coalesce(col("e.CustomerID"), col("a.CustomerID"), col("p.customer_id"), col("s.CustomerID")).alias("customer_id"),
-            coalesce(col("EmailsOpened"), col("EmailsOpened"), col("EmailsOpened"), col("EmailsOpened")).alias("emails_opened"),
-            coalesce(col("EmailsClicked"), col("EmailsClicked"), col("EmailsClicked"), col("EmailsClicked")).alias("emails_clicked"),
-            coalesce(col("AdClicks"), col("AdClicks"), col("AdClicks"), col("AdClicks")).alias("ad_clicks"),
-            coalesce(col("AdViews"), col("AdViews"), col("AdViews"), col("AdViews")).alias("ad_views"),
-            coalesce(col("purchases"), col("purchases")).alias("purchases"),
-            coalesce(col("total_spent"), col("total_spent")).alias("total_spent"),
-            coalesce(col("TotalTickets"), col("TotalTickets")).alias("total_ticket"),
-            coalesce(col("OpenTickets"), col("OpenTickets")).alias("open_ticket"),
-            coalesce(col("ResolvedTickets"), col("ResolvedTickets")).alias("resolved_ticket")
+        engagement_activity
+        .unionByName(purchase_activity)
+        .unionByName(support_activity)
+        .groupBy("customer_id")
+        .agg(
+            *[sum(name).alias(name) for name in counters[:5]],
+            coalesce(sum("total_amount"), F.lit(0)).alias("total_spent"),
+            *[sum(name).alias(OUTPUT_COLUMNS.get(name, name)) for name in counters[5:]],
         )
-        .orderBy(desc("total_spent"))
     )
 
     # Show results
-    final_df.show(10)
-
+    debug_show(final_df, 10)
+
+
+    return final_df
+
+
+def transform_aggregates(window_df):
+    # Window totals from the daily aggregate store. The raw transforms publish every customer
+    # with an engagement, order or ticket row, even one whose counters are all 0, so the
+    # filter is on those rows (channel_rows) rather than on the counters; customers with
+    # only logins in the window are left out
+    result_df = window_df.filter(col("channel_rows") > 0).select(
+        "customer_id",
+        "emails_opened",
+        "emails_clicked",
+        "ad_clicks",
+        "ad_views",
+        col("order_count").alias("purchases"),
+        coalesce(col("total_spent"), F.lit(0)).alias("total_spent"),
+        "total_ticket",
+        "open_ticket",
+        col("resolved_ticket").alias(OUTPUT_COLUMNS["resolved_ticket"]),
+    )
+    debug_show(result_df, 10)
 
-    return final_df
\ No newline at end of file
+    return result_df
@@ -1,49 +1,24 @@
-import sys
-import boto3
 import time
-from pyspark.context import SparkContext
 from pyspark.sql import SparkSession
-from awsglue.context import GlueContext
-from awsglue.job import Job
-from awsglue.utils import getResolvedOptions
-from pyspark.sql import functions as F
-from pyspark.sql.functions import sum, count, col
-from pyspark.sql.functions import col, avg, sum, date_format, year, month
-from pyspark.sql.window import Window
-from glue_etl_pipeline.utils import read_from_rds,write_to_s3
-from glue_etl_pipeline.glue_config import USER_MYSQL_URL,ORDER_MYSQL_URL,PRODUCT_MYSQL_URL
+from pyspark.sql.functions import col, avg, sum, count, year, month
+from glue_etl_pipeline.join_planner import plan_join,hint_broadcast_views
+from glue_etl_pipeline.snapshot import read_source
+from glue_etl_pipeline.table_format import write_tables
+from glue_etl_pipeline.utils import debug_show,get_output_layout,get_implementation
+from glue_etl_pipeline.glue_config import ORDER_MYSQL_URL,PRODUCT_MYSQL_URL,JOB_RDS_SOURCES
+from glue_etl_pipeline.instrumentation import new_run,phase,capture_plan,write_run_metrics
+from glue_etl_pipeline.glue_job import start_job
 from glue_etl_pipeline.logging import get_logger
 
-# Parse job arguments
-args = getResolvedOptions(sys.argv, ["JOB_NAME", "S3_TARGET_PATH"])
-
-# Initialize Spark and Glue Context
-sc = SparkContext()
-glueContext = GlueContext(sc)
-spark = glueContext.spark_session
-job = Job(glueContext)
-job.init(args["JOB_NAME"], args)
-s3_output_path =args['S3_TARGET_PATH'] +args["JOB_NAME"]
-
 # Initialize Logger
 logger = get_logger("pricing trends")
 
 def run_etl():
+    args, glueContext, job = start_job(["JOB_NAME", "S3_TARGET_PATH"])
     start_time = time.time()
     try:
         logger.info(f"Starting ETL Job {args['JOB_NAME']}")
-
-        customer_df =read_from_rds(spark,USER_MYSQL_URL,"Customers")
-        order_df =read_from_rds(spark,ORDER_MYSQL_URL,"Orders")
-        order_items_df =read_from_rds(spark,ORDER_MYSQL_URL,"Order_Items")
-        products_df =read_from_rds(spark,PRODUCT_MYSQL_URL,"Products")
-
-        #common tranformation 
-        #(monthly_trends,quarterly_trends)=transform_sql()
-        (monthly_trends,quarterly_trends)=transform_dataframe(order_df,products_df,order_items_df)
-
-        write_to_s3(monthly_trends,s3_output_path)
-        write_to_s3(quarterly_trends,s3_output_path)
+        run_job(glueContext.spark_session, args['S3_TARGET_PATH'] + args["JOB_NAME"], glueContext)
 
         logger.info("ETL Job Completed Successfully")
     except Exception as e:
@@ -55,70 +30,117 @@ def run_etl():
         job.commit()
 
 
+def run_job(spark: SparkSession, s3_output_path: str, glueContext=None):
+    """
+    Quarterly price trends from the order and product sources to s3_output_path, and the
+    monthly and yearly trends to s3_output_path_monthly and s3_output_path_yearly, in the
+    given session: the Glue job's, or one of job_runner's. Phase timings, stage metrics and
+    the three output plans are written to the metrics root (get_metrics_path).
+    """
+    run = new_run("pricing_trends")
+    with phase(spark, run, "extract"):
+        order_df,products_df,order_items_df =read_sources(spark)
+
+    #common tranformation (--IMPLEMENTATION or JOB_IMPLEMENTATIONS)
+    with phase(spark, run, "transform"):
+        if get_implementation("pricing_trends") == "sql":
+            (monthly_trends,quarterly_trends,yearly_trends)=transform_sql(spark)
+        else:
+            (monthly_trends,quarterly_trends,yearly_trends)=transform_dataframe(order_df,products_df,order_items_df)
+
+    # The quarterly trends stay the pricing_trends table, with the columns and types the job
+    # always published (order_quarter as the "Q" string). pricing_trends_monthly and
+    # pricing_trends_yearly are additional tables. The three roll up from the persisted
+    # monthly aggregate, which monthly_trends reads as is: counting it runs the join once
+    # before the concurrent writes
+    outputs = {"quarterly": quarterly_trends, "monthly": monthly_trends, "yearly": yearly_trends}
+    try:
+        with phase(spark, run, "write"):
+            write_tables(outputs, s3_output_path, shared=[monthly_trends], paths={"quarterly": s3_output_path},
+                         on_write=lambda grain, df: capture_plan(run, f"pricing_trends_{grain}", df),
+                         **get_output_layout("pricing_trends"))
+    finally:
+        # Both transforms cache the monthly aggregate as the monthly_sales view
+        spark.catalog.uncacheTable("monthly_sales")
+    write_run_metrics(run, s3_output_path)
 
-def transform_sql():
-    # Run Spark SQL Query
-    spark.sql("""
-                WITH sales_data AS (
-                    SELECT 
-                        o.order_id,
-                        o.customer_id,
-                        o.order_date,
-                        oi.product_id,
-                        oi.quantity,
-                        oi.unit_price,
-                        (oi.quantity * oi.unit_price) AS sales_amount
-                    FROM Orders o
-                    INNER JOIN Order_Items oi ON o.order_id = oi.order_id
-                    INNER JOIN Products p ON oi.product_id = p.product_id
-                ),
-
-                sales_data_with_time AS (
-                    SELECT 
-                        s.*,
-                        YEAR(s.order_date) AS order_year,
-                        MONTH(s.order_date) AS order_month,
-                        QUARTER(s.order_date) AS order_quarter
-                    FROM sales_data s
-                ),
-
-                monthly_trends AS (
-                    SELECT 
-                        product_id,
-                        order_year,
-                        order_month,
-                        AVG(unit_price) AS avg_unit_price,
-                        SUM(sales_amount) AS total_sales,
-                        SUM(quantity) AS total_qt
-                    FROM sales_data_with_time
-                    GROUP BY product_id, order_year, order_month
-                ),
-
-                quarterly_trends AS (
-                    SELECT 
-                        product_id,
-                        order_year,
-                        order_quarter,
-                        AVG(unit_price) AS avg_unit_price,
-                        SUM(sales_amount) AS total_sales,
-                        SUM(quantity) AS total_qt
-                    FROM sales_data_with_time
-                    GROUP BY product_id, order_year, order_quarter
-                )""").show()
-     
-    monthly_trends = spark.sql(""" SELECT * FROM monthly_trends ORDER BY product_id, order_year, order_month; """)
-    quarterly_trends = spark.sql(""" SELECT * FROM quarterly_trends ORDER BY product_id, order_year, order_month; """)
-
-    return (monthly_trends,quarterly_trends)
 
+def read_sources(spark: SparkSession, glueContext=None):
+    """
+    (order_df, products_df, order_items_df): the arguments of transform_dataframe, also
+    registered as the Orders, Products and Order_Items views transform_sql reads.
+    """
+    order_df =read_source(spark,ORDER_MYSQL_URL,"Orders",**JOB_RDS_SOURCES["pricing_trends"]["Orders"])
+    order_items_df =read_source(spark,ORDER_MYSQL_URL,"Order_Items",**JOB_RDS_SOURCES["pricing_trends"]["Order_Items"])
+    products_df =read_source(spark,PRODUCT_MYSQL_URL,"Products",**JOB_RDS_SOURCES["pricing_trends"]["Products"])
+    return order_df,products_df,order_items_df
 
-def transform_dataframe(order_df,products_df,order_items_df):
 
+def transform_sql(spark: SparkSession):
+    # Run Spark SQL Query
+    # The join is aggregated once at the monthly grain and cached; quarterly and yearly
+    # trends roll up from it. AVG is carried as SUM / COUNT so the rollup stays exact.
+    hint_broadcast_views(spark, "Products")
+    trend_types = get_trend_types(spark.table("Order_Items"))
+    monthly_sales = spark.sql("""
+                SELECT 
+                    oi.product_id,
+                    YEAR(o.order_date) AS order_year,
+                    MONTH(o.order_date) AS order_month,
+                    SUM(oi.unit_price) AS sum_unit_price,
+                    COUNT(oi.unit_price) AS count_unit_price,
+                    SUM(oi.quantity * oi.unit_price) AS total_sales,
+                    SUM(oi.quantity) AS total_qt
+                FROM Orders o
+                INNER JOIN Order_Items oi ON o.order_id = oi.order_id
+                INNER JOIN Products p ON oi.product_id = p.product_id
+                GROUP BY oi.product_id, YEAR(o.order_date), MONTH(o.order_date)
+                """).persist()
+    monthly_sales.createOrReplaceTempView("monthly_sales")
+
+    monthly_trends = spark.sql("""
+                SELECT 
+                    product_id,
+                    order_year,
+                    order_month,
+                    sum_unit_price / count_unit_price AS avg_unit_price,
+                    total_sales,
+                    total_qt
+                FROM monthly_sales
+                """)
+
+    quarterly_trends = spark.sql("""
+                SELECT 
+                    product_id,
+                    order_year,
+                    CAST((order_month + 2) DIV 3 AS STRING) AS order_quarter,
+                    SUM(sum_unit_price) / SUM(count_unit_price) AS avg_unit_price,
+                    SUM(total_sales) AS total_sales,
+                    SUM(total_qt) AS total_qt
+                FROM monthly_sales
+                GROUP BY product_id, order_year, CAST((order_month + 2) DIV 3 AS STRING)
+                """)
+
+    yearly_trends = spark.sql("""
+                SELECT 
+                    product_id,
+                    order_year,
+                    SUM(sum_unit_price) / SUM(count_unit_price) AS avg_unit_price,
+                    SUM(total_sales) AS total_sales,
+                    SUM(total_qt) AS total_qt
+                FROM monthly_sales
+                GROUP BY product_id, order_year
+                """)
+
+    return (conform_trends(monthly_trends, trend_types),
+            conform_trends(quarterly_trends, trend_types),
+            conform_trends(yearly_trends, trend_types))
 
 
+def transform_dataframe(order_df,products_df,order_items_df):
     # Join orders with order_items to get product-level sales
-    sales_data = order_df.join(order_items_df, "order_id", "inner") \
-        .join(products_df, "product_id", "inner") \
+    order_lines = plan_join(order_df, order_items_df, "order_id", "inner", "Orders", "Order_Items")
+    sales_data = plan_join(order_lines, products_df, "product_id", "inner", "Order_Lines", "Products") \
         .select(
             order_df.order_id,
             order_df.customer_id,
@@ -129,39 +151,72 @@ def transform_dataframe(order_df,products_df,order_items_df):
             (order_items_df.quantity * order_items_df.unit_price).alias("sales_amount")
         )
 
-    historical_customer_sales_df=spark.read.parquet("s3://feb2025-training-bucket/RetailCustomer360/historical_sales_data")
-    #sales_data = sales_data.withColumn("order_year", year(col("order_date"))) .withColumn("order_month", month(col("order_date"))) 
-    #historical_customer_sales_df.count()
-    #sales_data = sales_data.union(historical_customer_sales_df)
-    #historical_customer_sales_df.printSchema()
-    #sales_data.printSchema()
-
     sales_data = sales_data.withColumn("order_year", year(col("order_date"))) \
         .withColumn("order_month", month(col("order_date"))) 
 
-
-
-    # Extract Year, Month, and Quarter
-    df = sales_data.withColumn("order_quarter", date_format(col("order_date"), "Q"))
+    # Aggregate the join once at the monthly grain and cache it; the quarterly and yearly
+    # trends roll up from this instead of re-running the join. AVG is carried as sum/count
+    monthly_sales = sales_data.groupBy("product_id","order_year", "order_month").agg(
+        sum("unit_price").alias("sum_unit_price"),
+        count("unit_price").alias("count_unit_price"),
+        sum("sales_amount").alias("total_sales"),
+        sum("quantity").alias("total_qt"),
+    ).persist()
+    monthly_sales.createOrReplaceTempView("monthly_sales")
 
     # Calculate Seasonal Trends
     # 1. Monthly Price Trend
-    monthly_trends = df.groupBy("product_id","order_year", "order_month").agg(
-        avg("unit_price").alias("avg_unit_price"),
-        sum("sales_amount").alias("total_sales"),
-        sum("quantity").alias("total_qt"),
-    ).orderBy("product_id","order_year", "order_month")
+    monthly_trends = monthly_sales.select(
+        "product_id", "order_year", "order_month",
+        (col("sum_unit_price") / col("count_unit_price")).alias("avg_unit_price"),
+        "total_sales",
+        "total_qt",
+    )
 
     # 2. Quarterly Price Trend
-    quarterly_trends = df.groupBy("product_id","order_year", "order_quarter").agg(
-        avg("unit_price").alias("avg_unit_price"),
-        sum("sales_amount").alias("total_sales"),
-        sum("quantity").alias("total_qt"),
-    ).orderBy("product_id","order_year", "order_quarter")
+    quarterly_trends = rollup_trends(
+        monthly_sales.withColumn("order_quarter", ((col("order_month") + 2) / 3).cast("int").cast("string")),
+        "order_quarter",
+    )
+
+    # 3. Yearly Price Trend
+    yearly_trends = rollup_trends(monthly_sales)
+
+    # Published with the types AVG / SUM over the order lines give
+    trend_types = get_trend_types(order_items_df)
+    monthly_trends = conform_trends(monthly_trends, trend_types)
+    quarterly_trends = conform_trends(quarterly_trends, trend_types)
+    yearly_trends = conform_trends(yearly_trends, trend_types)
 
     # Show Results
-    monthly_trends.show()
-    quarterly_trends.show()
+    debug_show(monthly_trends)
+    debug_show(quarterly_trends)
+
+    return (monthly_trends,quarterly_trends,yearly_trends)
+
+
+def rollup_trends(monthly_sales, *period_columns):
+    return monthly_sales.groupBy("product_id", "order_year", *period_columns).agg(
+        (sum("sum_unit_price") / sum("count_unit_price")).alias("avg_unit_price"),
+        sum("total_sales").alias("total_sales"),
+        sum("total_qt").alias("total_qt"),
+    )
+
+
+def get_trend_types(order_items_df):
+    """
+    {column: type} of avg_unit_price, total_sales and total_qt as an AVG / SUM over the
+    order lines types them. The rollups sum the monthly sums, which widens the decimals;
+    they are cast back so every grain keeps the published types. Only analyses the plan.
+    """
+    schema = order_items_df.agg(
+        avg("unit_price").alias("avg_unit_price"),
+        sum(col("quantity") * col("unit_price")).alias("total_sales"),
+        sum("quantity").alias("total_qt"),
+    ).schema
+    return {field.name: field.dataType for field in schema.fields}
 
 
-    return (monthly_trends,quarterly_trends)
\ No newline at end of file
+def conform_trends(trends_df, trend_types):
+    return trends_df.select(*[col(name).cast(trend_types[name]).alias(name) if name in trend_types else col(name)
+                              for name in trends_df.columns])
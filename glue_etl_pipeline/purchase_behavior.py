@@ -1,51 +1,29 @@
-import sys
 import boto3
 import time
-from pyspark.context import SparkContext
 from pyspark.sql import SparkSession
-from awsglue.context import GlueContext
-from awsglue.job import Job
-from awsglue.utils import getResolvedOptions
 from pyspark.sql import functions as F
 from pyspark.sql.window import Window
-from glue_etl_pipeline.utils import read_from_rds,write_to_s3
-from glue_etl_pipeline.glue_config import USER_MYSQL_URL,ORDER_MYSQL_URL,PRODUCT_MYSQL_URL
+from glue_etl_pipeline.aggregate_store import use_daily_aggregates,get_daily_aggregates_path,read_window
+from glue_etl_pipeline.join_planner import plan_join,hint_broadcast_views
+from glue_etl_pipeline.snapshot import read_source
+from glue_etl_pipeline.state import get_state_root
+from glue_etl_pipeline.top_k import top_k_by_group
+from glue_etl_pipeline.table_format import merge_table
+from glue_etl_pipeline.utils import debug_show,get_output_layout,get_implementation
+from glue_etl_pipeline.glue_config import USER_MYSQL_URL,ORDER_MYSQL_URL,PRODUCT_MYSQL_URL,JOB_RDS_SOURCES
+from glue_etl_pipeline.instrumentation import new_run,phase,plan_capture,write_run_metrics
+from glue_etl_pipeline.glue_job import start_job
 from glue_etl_pipeline.logging import get_logger
 
-# Parse job arguments
-args = getResolvedOptions(sys.argv, ["JOB_NAME", "S3_TARGET_PATH"])
-
-
-# Initialize Spark and Glue Context
-sc = SparkContext()
-glueContext = GlueContext(sc)
-spark = glueContext.spark_session
-job = Job(glueContext)
-job.init(args["JOB_NAME"], args)
-s3_output_path =args['S3_TARGET_PATH'] +args["JOB_NAME"]
-
 # Initialize Logger
 logger = get_logger("purchase behavior")
 
 def run_etl():
+    args, glueContext, job = start_job(["JOB_NAME", "S3_TARGET_PATH"])
     start_time = time.time()
     try:
         logger.info(f"Starting ETL Job {args['JOB_NAME']}")
-
-        print("starting Puchase Behaviour ETL1")
-        customer_df =read_from_rds(spark,USER_MYSQL_URL,"Customers")
-        order_df =read_from_rds(spark,ORDER_MYSQL_URL,"Orders")
-
-        #common tranformation 
-        top_customers=transform_sql()
-        
-        top_customers.show()
-        print(top_customers.count())
-        #top_customers=transform_dataframe(order_df,customer_df)
-
-        
-
-        write_to_s3(top_customers,s3_output_path)
+        run_job(glueContext.spark_session, args['S3_TARGET_PATH'] + args["JOB_NAME"], glueContext)
 
         logger.info("ETL Job Completed Successfully")
     except Exception as e:
@@ -57,9 +35,53 @@ def run_etl():
         job.commit()
 
 
-
-def transform_sql():
+def run_job(spark: SparkSession, s3_output_path: str, glueContext=None):
+    """
+    Top customers per country from the orders (or the daily aggregates) to s3_output_path, in
+    the given session: the Glue job's, or one of job_runner's. Phase timings, stage metrics
+    and the output plan are written to the metrics root (get_metrics_path).
+    """
+    print("starting Puchase Behaviour ETL1")
+    run = new_run("purchase_behavior")
+
+    if use_daily_aggregates(get_state_root(), "purchase_behavior"):
+        with phase(spark, run, "extract"):
+            customer_df =read_source(spark,USER_MYSQL_URL,"Customers",**JOB_RDS_SOURCES["purchase_behavior"]["Customers"])
+            # 365 daily partitions of per-customer counters instead of a year of raw orders
+            customer_spending=read_window(spark,get_daily_aggregates_path(get_state_root()),365)
+        with phase(spark, run, "transform"):
+            top_customers=transform_aggregates(customer_spending,customer_df)
+    else:
+        with phase(spark, run, "extract"):
+            order_df,customer_df =read_sources(spark)
+
+        #common tranformation (--IMPLEMENTATION or JOB_IMPLEMENTATIONS)
+        with phase(spark, run, "transform"):
+            if get_implementation("purchase_behavior") == "sql":
+                top_customers=transform_sql(spark)
+            else:
+                top_customers=transform_dataframe(order_df,customer_df)
+    debug_show(top_customers)
+
+    with phase(spark, run, "write"):
+        merge_table(top_customers,s3_output_path,["customer_id"],on_write=plan_capture(run, "purchase_behavior"),
+                    **get_output_layout("purchase_behavior"))
+    write_run_metrics(run, s3_output_path)
+
+
+def read_sources(spark: SparkSession, glueContext=None):
+    """
+    (order_df, customer_df): the arguments of transform_dataframe, also registered as the
+    Orders and Customers views transform_sql reads.
+    """
+    customer_df =read_source(spark,USER_MYSQL_URL,"Customers",**JOB_RDS_SOURCES["purchase_behavior"]["Customers"])
+    order_df =read_source(spark,ORDER_MYSQL_URL,"Orders",**JOB_RDS_SOURCES["purchase_behavior"]["Orders"])
+    return order_df,customer_df
+
+
+def transform_sql(spark: SparkSession):
             # Run Spark SQL Query
+        hint_broadcast_views(spark, "Customers")
         top_customers = spark.sql("""
             WITH customer_spending AS (
                 SELECT
@@ -71,6 +93,11 @@ def transform_sql():
                 WHERE o.order_date >= date_add(current_date(), -365)  -- Last 1 year
                 GROUP BY o.customer_id
             ),
+            target_customers AS (
+                SELECT customer_id, country, first_name, email
+                FROM Customers
+                WHERE country LIKE 'United %'  -- filtered before the join and the window
+            ),
             customer_ranking AS (
                 SELECT
                     c.country,
@@ -82,9 +109,9 @@ def transform_sql():
                     cs.last_purchase_date,
                     RANK() OVER (PARTITION BY c.country ORDER BY cs.total_spent DESC) AS spending_rank
                 FROM customer_spending cs
-                JOIN Customers c ON cs.customer_id = c.customer_id
+                JOIN target_customers c ON cs.customer_id = c.customer_id
             )
-            SELECT * FROM customer_ranking WHERE spending_rank <= 10 and country like 'United %';
+            SELECT * FROM customer_ranking WHERE spending_rank <= 10;
         """)
         return top_customers
 
@@ -104,19 +131,31 @@ def transform_dataframe(order_df,customer_df):
         )
     )
 
-    # Join with customers table
-    customer_data = customer_spending.join(customer_df, "customer_id")
+    return rank_customers(customer_spending, customer_df)
 
-    # Define window specification for ranking
-    window_spec = Window.partitionBy("country").orderBy(F.desc("total_spent"))
 
-    # Add ranking column
-    customer_ranking = customer_data.withColumn("spending_rank", F.rank().over(window_spec))
+def transform_aggregates(customer_spending,customer_df):
+    # Window totals from the daily aggregate store, in the shape of the order aggregation
+    customer_spending = customer_spending.filter(F.col("order_count") > 0).select(
+        "customer_id",
+        "total_spent",
+        F.col("order_count").alias("total_orders"),
+        F.col("last_order_date").alias("last_purchase_date"),
+    )
+    return rank_customers(customer_spending, customer_df)
+
+
+def rank_customers(customer_spending,customer_df):
+    # Only the target countries are joined and ranked
+    target_customers = customer_df.filter(F.col("country").like("United %"))
+
+    # Join with customers table
+    customer_data = plan_join(customer_spending, target_customers, "customer_id", "inner", "customer_spending", "Customers")
 
-    # Filter top 100 customers
-    top_customers = customer_ranking.filter( (F.col("spending_rank") <= 10) &  (F.col("country").like("United %")))
+    # Top 10 per country with RANK() semantics
+    top_customers = top_k_by_group(customer_data, "country", "total_spent", 10, rank_column="spending_rank")
 
     # Show results
-    top_customers.select("country","customer_id","first_name","email","total_spent","total_orders","spending_rank").show(20)
+    debug_show(top_customers.select("country","customer_id","first_name","email","total_spent","total_orders","spending_rank"), 20)
 
     return top_customers
\ No newline at end of file
@@ -0,0 +1,235 @@
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pyspark import StorageLevel
+from pyspark.sql import DataFrame
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+from glue_etl_pipeline.glue_config import JOB_RDS_SOURCES,SNAPSHOT_DATE_COLUMNS,SNAPSHOT_TTL_HOURS,RDS_TABLE_URLS
+from glue_etl_pipeline.join_planner import record_plan_size
+from glue_etl_pipeline.table_format import read_table
+from glue_etl_pipeline.utils import read_from_rds,to_session,write_to_s3,get_optional_arg,read_json,write_json,list_subpaths,delete_path
+from glue_etl_pipeline.logging import get_logger
+
+SNAPSHOT_MANIFEST = "_SNAPSHOT.json"
+SNAPSHOT_PARTITION_COLUMN = "dt"
+
+logger = get_logger("source snapshot")
+
+# Tables read once and cached for every job of the application (job_runner): {table: (manifest, DataFrame)}
+shared_sources = {}
+
+
+def get_snapshot_root():
+    """
+    Returns the --SNAPSHOT_PATH job argument, None when snapshots are not configured.
+    """
+    snapshot_root = get_optional_arg("SNAPSHOT_PATH")
+    return snapshot_root.rstrip("/") + "/" if snapshot_root else None
+
+
+def get_workflow_run_id():
+    """
+    Returns the Glue workflow run ID, passed to every job started by a workflow trigger.
+    """
+    return get_optional_arg("WORKFLOW_RUN_ID")
+
+
+def get_snapshot_path(snapshot_root: str, tablename: str, run_id: str) -> str:
+    return f"{snapshot_root}{tablename}/run_id={run_id}/"
+
+
+def get_snapshot_columns(tablename: str, required_columns=()):
+    """
+    Returns the union of the columns the jobs read from a table, None when any job needs all of them.
+    """
+    columns = []
+    for job_sources in JOB_RDS_SOURCES.values():
+        if tablename not in job_sources:
+            continue
+        job_columns = job_sources[tablename].get("columns")
+        if not job_columns:
+            return None
+        columns += [column for column in job_columns if column not in columns]
+    if columns:
+        date_column = SNAPSHOT_DATE_COLUMNS.get(tablename)
+        required_columns = list(required_columns) + ([date_column] if date_column else [])
+        columns += [column for column in required_columns if column not in columns]
+    return columns or None
+
+
+def is_snapshot_valid(manifest, run_id: str) -> bool:
+    """
+    A snapshot is only served to the workflow run that created it, and only until it expires.
+    """
+    if manifest is None or manifest.get("run_id") != run_id:
+        return False
+    return datetime.now(timezone.utc) < datetime.fromisoformat(manifest["expires_at"])
+
+
+def get_valid_manifest(snapshot_root: str, tablename: str, run_id: str):
+    """
+    Returns the manifest of this run's snapshot of the table, None when there is no valid one.
+    """
+    if not snapshot_root or not run_id:
+        return None
+    manifest = read_json(get_snapshot_path(snapshot_root, tablename, run_id) + SNAPSHOT_MANIFEST)
+    return manifest if is_snapshot_valid(manifest, run_id) else None
+
+
+def write_snapshot_manifest(snapshot_path: str, tablename: str, database_url, run_id: str, data_path: str, columns=None,
+                            date_column=None, partition_by=None, row_count=None, version=None, workflow_name=None, **details):
+    """
+    Records the identity, version and expiry of a table snapshot taken for a workflow run.
+    """
+    created_at = datetime.now(timezone.utc)
+    manifest = {
+        "snapshot_id": str(uuid.uuid4()),
+        "version": version if version is not None else int(created_at.timestamp() * 1000),
+        "table": tablename,
+        "source_url": database_url,
+        "run_id": run_id,
+        "workflow_name": workflow_name,
+        "path": data_path,
+        "columns": columns,
+        "date_column": date_column,
+        "partition_by": partition_by,
+        "row_count": row_count,
+        "created_at": created_at.isoformat(),
+        "expires_at": (created_at + timedelta(hours=SNAPSHOT_TTL_HOURS)).isoformat(),
+        **details,
+    }
+    write_json(snapshot_path + SNAPSHOT_MANIFEST, manifest)
+    logger.info(f"Snapshot {tablename} run_id={run_id} version={manifest['version']} path={data_path}")
+    return manifest
+
+
+def create_snapshot(spark: SparkSession, database_url, tablename: str, snapshot_root: str, run_id: str, workflow_name=None):
+    """
+    Extracts a table from RDS once into partitioned Parquet and records the snapshot manifest.
+    """
+    start_time = time.time()
+    snapshot_path = get_snapshot_path(snapshot_root, tablename, run_id)
+    columns = get_snapshot_columns(tablename)
+    date_column = SNAPSHOT_DATE_COLUMNS.get(tablename)
+
+    df = read_from_rds(spark, database_url, tablename, columns=columns)
+    partition_by = None
+    if date_column:
+        df = df.withColumn(SNAPSHOT_PARTITION_COLUMN, F.to_date(F.col(date_column)))
+        partition_by = [SNAPSHOT_PARTITION_COLUMN]
+    row_count = write_to_s3(df, snapshot_path, partition_by=partition_by)
+
+    return write_snapshot_manifest(snapshot_path, tablename, database_url, run_id, snapshot_path, columns, date_column,
+                                   partition_by, row_count, workflow_name=workflow_name,
+                                   extract_seconds=round(time.time() - start_time, 2))
+
+
+def expire_snapshots(snapshot_root: str, tablename: str, keep_run_id=None):
+    """
+    Deletes the snapshots of other workflow runs once they are past their TTL.
+    """
+    for run_path in list_subpaths(f"{snapshot_root}{tablename}/"):
+        if "/run_id=" not in run_path:
+            continue
+        manifest = read_json(run_path + SNAPSHOT_MANIFEST)
+        if manifest is not None and manifest.get("run_id") == keep_run_id:
+            continue
+        if manifest is None or datetime.now(timezone.utc) >= datetime.fromisoformat(manifest["expires_at"]):
+            logger.info(f"Expiring snapshot {run_path}")
+            delete_path(run_path)
+
+
+def read_snapshot_data(spark: SparkSession, manifest) -> DataFrame:
+    """
+    The whole snapshot of a table. Incremental snapshots are the version of the current
+    table their manifest pinned (table_version), read from that version's file list.
+    """
+    if manifest.get("table_version") is not None:
+        return read_table(spark, manifest["path"], version=manifest["table_version"])
+    return spark.read.parquet(manifest["path"])
+
+
+def read_snapshot(spark: SparkSession, manifest, columns=None, date_column=None, window_days=None, since=None) -> DataFrame:
+    """
+    Reads a table snapshot, pruning dt partitions outside the date window or before since.
+    """
+    return filter_snapshot(read_snapshot_data(spark, manifest), manifest, columns, date_column, window_days, since)
+
+
+def filter_snapshot(df: DataFrame, manifest, columns=None, date_column=None, window_days=None, since=None) -> DataFrame:
+    """
+    Applies a job's projection, date window and since to a whole snapshot of a table.
+    """
+    if date_column and window_days:
+        window_start = F.date_add(F.current_date(), -int(window_days))
+        if manifest.get("partition_by"):
+            df = df.filter(F.col(SNAPSHOT_PARTITION_COLUMN) >= window_start)
+        df = df.filter(F.col(date_column) >= window_start)
+    if date_column and since is not None:
+        if manifest.get("partition_by"):
+            df = df.filter(F.col(SNAPSHOT_PARTITION_COLUMN) >= F.to_date(F.lit(str(since))))
+        df = df.filter(F.col(date_column) > F.lit(str(since)).cast(df.schema[date_column].dataType))
+    if manifest.get("partition_by"):
+        df = df.drop(SNAPSHOT_PARTITION_COLUMN)
+    if columns:
+        df = df.select(*columns)
+    return df
+
+
+def read_source(spark: SparkSession, database_url, tablename: str, columns=None, date_column=None, window_days=None,
+                since=None, **rds_options) -> DataFrame:
+    """
+    Reads a source table from this workflow run's snapshot, or from RDS when there is no valid snapshot.
+    With since, only rows whose date_column is strictly after it are returned. A predicate
+    is sent to MySQL, or applied as a Spark SQL filter on the snapshot. Tables cached by
+    share_sources are read from the cache instead.
+    """
+    if tablename in shared_sources:
+        manifest, shared_df = shared_sources[tablename]
+        print(f"Reading from shared source -- {tablename}  version -- {manifest['version']}")
+        df = filter_snapshot(to_session(shared_df, spark), manifest, columns, date_column, window_days, since)
+    else:
+        manifest = get_valid_manifest(get_snapshot_root(), tablename, get_workflow_run_id())
+        if manifest is None:
+            if since is not None:
+                rds_options["predicate"] = f"{date_column} > '{since}'"
+            return read_from_rds(spark, database_url, tablename, columns=columns, date_column=date_column,
+                                 window_days=window_days, **rds_options)
+        print(f"Reading from snapshot -- {tablename}  version -- {manifest['version']}  path -- {manifest['path']}")
+        df = read_snapshot(spark, manifest, columns, date_column, window_days, since)
+    if rds_options.get("predicate"):
+        df = df.filter(rds_options["predicate"])
+    df.createOrReplaceTempView(tablename)
+    record_plan_size(tablename, df, "snapshot parquet")
+    return df
+
+
+def share_sources(spark: SparkSession, tablenames):
+    """
+    Reads each table once, from this run's snapshot or else from RDS with the columns any job
+    reads, and caches it for every read_source of the table in this application, whatever the
+    session. Returns {table: row_count}.
+    """
+    row_counts = {}
+    for tablename in tablenames:
+        manifest = get_valid_manifest(get_snapshot_root(), tablename, get_workflow_run_id())
+        if manifest is not None:
+            df = read_snapshot_data(spark, manifest)
+        else:
+            df = read_from_rds(spark, RDS_TABLE_URLS[tablename], tablename, columns=get_snapshot_columns(tablename))
+            manifest = {"table": tablename, "version": "rds", "path": None, "partition_by": None}
+        df = df.persist(StorageLevel.MEMORY_AND_DISK)
+        row_counts[tablename] = df.count()
+        shared_sources[tablename] = (manifest, df)
+        logger.info(f"Shared source {tablename} version={manifest['version']} rows={row_counts[tablename]}")
+    return row_counts
+
+
+def release_shared_sources():
+    """
+    Unpersists the shared sources; read_source goes back to the snapshot or RDS.
+    """
+    for _, df in shared_sources.values():
+        df.unpersist()
+    shared_sources.clear()
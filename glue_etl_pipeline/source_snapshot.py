@@ -0,0 +1,40 @@
+import time
+from glue_etl_pipeline.glue_config import RDS_TABLE_URLS,INCREMENTAL_TABLES
+from glue_etl_pipeline.incremental import create_incremental_snapshot
+from glue_etl_pipeline.snapshot import get_snapshot_root,get_workflow_run_id,get_valid_manifest,create_snapshot,expire_snapshots
+from glue_etl_pipeline.utils import get_optional_arg
+from glue_etl_pipeline.glue_job import start_job
+from glue_etl_pipeline.logging import get_logger
+
+# Initialize Logger
+logger = get_logger("source snapshot")
+
+def run_etl():
+    args, glueContext, job = start_job(["JOB_NAME", "SNAPSHOT_PATH"])
+    spark = glueContext.spark_session
+    start_time = time.time()
+    try:
+        logger.info(f"Starting ETL Job {args['JOB_NAME']}")
+        snapshot_root = get_snapshot_root()
+        # Outside a workflow every run gets its own snapshot, which the analytics jobs will not see
+        run_id = get_workflow_run_id() or f"manual_{int(start_time)}"
+        workflow_name = get_optional_arg("WORKFLOW_NAME")
+
+        for tablename, database_url in RDS_TABLE_URLS.items():
+            manifest = get_valid_manifest(snapshot_root, tablename, run_id)
+            if manifest is not None:
+                logger.info(f"Snapshot {tablename} already taken for run_id={run_id}, version={manifest['version']}")
+            elif tablename in INCREMENTAL_TABLES:
+                create_incremental_snapshot(spark, database_url, tablename, snapshot_root, run_id, workflow_name)
+            else:
+                create_snapshot(spark, database_url, tablename, snapshot_root, run_id, workflow_name)
+            expire_snapshots(snapshot_root, tablename, keep_run_id=run_id)
+
+        logger.info("ETL Job Completed Successfully")
+    except Exception as e:
+        logger.error(f"ETL Job Failed: {str(e)}")
+        raise e
+    finally:
+        duration = time.time() - start_time
+        logger.info(f"ETL Job Duration: {duration:.2f} seconds")
+        job.commit()
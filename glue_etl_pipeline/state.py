@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+from pyspark.sql import DataFrame
+from pyspark.sql import SparkSession
+from glue_etl_pipeline.utils import write_to_s3,get_optional_arg,read_json,write_json,delete_path
+from glue_etl_pipeline.logging import get_logger
+
+STATE_POINTER = "_state.json"
+
+logger = get_logger("state store")
+
+
+def get_state_root():
+    """
+    Returns the --STATE_PATH job argument, None when persisted job state is not configured.
+    """
+    state_root = get_optional_arg("STATE_PATH")
+    return state_root.rstrip("/") + "/" if state_root else None
+
+
+def read_state(spark: SparkSession, state_path: str):
+    """
+    Returns (DataFrame, pointer) for the committed version of a state table, (None, None) before the first commit.
+    """
+    pointer = read_json(state_path + STATE_POINTER)
+    if pointer is None:
+        return None, None
+    logger.info(f"Reading state {state_path} version={pointer['version']}")
+    return spark.read.parquet(pointer["path"]), pointer
+
+
+def commit_state(df: DataFrame, state_path: str, previous_pointer=None, **details):
+    """
+    Writes a new version of a state table next to the current one, then switches the
+    pointer to it in a single put. A failed run leaves the previous version in place.
+    """
+    version = (previous_pointer or {}).get("version", 0) + 1
+    version_path = f"{state_path}version={version}/"
+    row_count = write_to_s3(df, version_path)
+    pointer = {
+        "version": version,
+        "path": version_path,
+        "row_count": row_count,
+        "committed_at": datetime.now(timezone.utc).isoformat(),
+        **details,
+    }
+    write_json(state_path + STATE_POINTER, pointer)
+    # Keep the version just replaced, in case a reader planned against it
+    if version > 2:
+        delete_path(f"{state_path}version={version - 2}/")
+    logger.info(f"Committed state {state_path} version={version} rows={row_count}")
+    return pointer
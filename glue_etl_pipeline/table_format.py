@@ -0,0 +1,437 @@
+import math
+import uuid
+from functools import partial, reduce
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import boto3
+from pyspark.sql import DataFrame
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+from pyspark.sql.types import StructType
+from glue_etl_pipeline.utils import write_to_s3,get_optional_arg,read_json,write_json,write_text,list_files,list_subpaths,delete_path,inherit_local_properties
+from glue_etl_pipeline.glue_config import GLUE_DATABASE,TABLE_RETAIN_VERSIONS,MERGE_BUCKETS,MERGE_MAX_SNAPSHOTS,TARGET_FILE_BYTES
+from glue_etl_pipeline.join_planner import estimate_plan_size
+from glue_etl_pipeline.logging import get_logger
+
+# A table is a prefix holding immutable snapshots and the manifests that commit them:
+#   <table>/_snapshots/<snapshot_id>/...          data files of one write
+#   <table>/_manifest/v00000042.json              files, partitions, schema and row count of version 42
+#   <table>/_manifest/_latest.json                the committed version; one put commits a new one
+#   <table>/_symlink_format_manifest/v00000042/   file lists the Glue catalog table points at
+MANIFEST_DIR = "_manifest/"
+LATEST_POINTER = "_latest.json"
+SNAPSHOT_DIR = "_snapshots/"
+SYMLINK_DIR = "_symlink_format_manifest/"
+# Partition column of merge tables (no leading underscore: Spark skips _ folders)
+BUCKET_COLUMN = "key_bucket"
+
+logger = get_logger("table format")
+
+
+def get_table_path(table_path: str):
+    """
+    The table prefix with a trailing slash.
+    """
+    return table_path.rstrip("/") + "/"
+
+
+def get_manifest_path(table_path: str, version: int):
+    """
+    Path of the manifest of one version of a table.
+    """
+    return f"{get_table_path(table_path)}{MANIFEST_DIR}v{version:08d}.json"
+
+
+def read_manifest(table_path: str, version=None, as_of=None):
+    """
+    Returns the manifest of the committed version of a table, None before the first commit.
+    version reads an earlier retained version; as_of (an ISO timestamp) the version that was
+    committed at that time.
+    """
+    table_path = get_table_path(table_path)
+    latest = read_json(table_path + MANIFEST_DIR + LATEST_POINTER)
+    if latest is None:
+        return None
+    version = latest["version"] if version is None else version
+    while version > 0:
+        manifest = read_json(get_manifest_path(table_path, version))
+        if manifest is None:
+            raise ValueError(f"Version {version} of {table_path} has expired or was never committed")
+        if as_of is None or manifest["committed_at"] <= as_of:
+            return manifest
+        version = manifest["parent_version"] or 0
+    raise ValueError(f"{table_path} has no retained version committed before {as_of}")
+
+
+def get_partition_values(relative_path: str):
+    """
+    {column: value} of the key=value folders in a data file path.
+    """
+    return dict(part.split("=", 1) for part in relative_path.split("/")[:-1] if "=" in part)
+
+
+def stage_snapshot(df: DataFrame, table_path: str, **write_options):
+    """
+    Writes a DataFrame as a new, not yet visible snapshot of the table and returns its
+    description for commit_snapshot. The files are listed once here, so readers never list them.
+    """
+    snapshot_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}_{uuid.uuid4().hex[:8]}"
+    snapshot_path = f"{get_table_path(table_path)}{SNAPSHOT_DIR}{snapshot_id}/"
+    row_count = write_to_s3(df, snapshot_path, **write_options)
+    files = [
+        {"path": f["path"], "size": f["size"], "snapshot_path": snapshot_path,
+         "partition": get_partition_values(f["path"][len(snapshot_path):])}
+        for f in list_files(snapshot_path)
+    ]
+    return {
+        "snapshot_id": snapshot_id,
+        "snapshot_path": snapshot_path,
+        "files": files,
+        "row_count": row_count,
+        "partition_by": list(write_options.get("partition_by") or []),
+        "schema": df.schema.jsonValue(),
+    }
+
+
+def commit_snapshot(table_path: str, snapshot: dict, catalog=True):
+    """
+    Commits a staged snapshot as the next version of the table. The version manifest is
+    written first and _latest.json switched to it in a single put: readers see either the
+    previous version or the new one, never a partial write. With catalog, an S3 table is
+    registered in the Glue catalog at the new version.
+    The version check below is a read followed by a plain put, not a conditional write: two
+    writers committing the same table at once can both pass it and the later put wins. Each
+    table has a single writer (its job, which the workflow never runs twice at once), and
+    the check only turns a second writer that starts after a commit into an error.
+    """
+    table_path = get_table_path(table_path)
+    latest = read_json(table_path + MANIFEST_DIR + LATEST_POINTER)
+    parent_version = latest["version"] if latest else None
+    version = (parent_version or 0) + 1
+    manifest_path = get_manifest_path(table_path, version)
+    if read_json(manifest_path) is not None:
+        raise RuntimeError(f"Version {version} of {table_path} was committed concurrently")
+    manifest = {
+        "version": version,
+        "parent_version": parent_version,
+        **snapshot,
+        "committed_at": datetime.now(timezone.utc).isoformat(),
+    }
+    write_json(manifest_path, manifest)
+    write_json(table_path + MANIFEST_DIR + LATEST_POINTER, {"version": version, "manifest": manifest_path})
+    logger.info(f"Committed {table_path} version={version} files={len(manifest['files'])} rows={manifest['row_count']}")
+
+    if catalog and table_path.startswith("s3://"):
+        register_catalog_table(table_path, manifest)
+    expire_versions(table_path, manifest)
+    return manifest
+
+
+def write_table(df: DataFrame, table_path: str, **write_options):
+    """
+    Writes a DataFrame as the next version of a manifest table and returns its row count.
+    write_options are passed to write_to_s3 (partition_by, sort_by, ...).
+    """
+    snapshot = stage_snapshot(df, table_path, **write_options)
+    return commit_snapshot(table_path, snapshot)["row_count"]
+
+
+def write_tables(outputs: dict, s3_path: str, shared=(), paths=None, on_write=None, **write_options):
+    """
+    Writes the named datasets of one job, each as the table <s3_path>_<name> or at its path
+    in paths ({name: path}), and returns {name: row_count}. on_write(name, df) is called
+    with each laid-out output as it is written. shared are persisted DataFrames whose
+    lineage the outputs have in common: one count over each fills the cache, so the concurrent writes read it instead of
+    all recomputing it. All snapshots are staged, one Spark job per thread, before any is
+    committed, so a failed run leaves every table on its previous version.
+    """
+    for df in shared:
+        df.count()
+    table_paths = {name: (paths or {}).get(name, f"{s3_path.rstrip('/')}_{name}").rstrip("/") + "/" for name in outputs}
+    with ThreadPoolExecutor(max_workers=len(outputs)) as pool:
+        # The writes run in the caller's scheduler pool and job group
+        futures = {name: pool.submit(inherit_local_properties(df.sparkSession, stage_snapshot), df, table_paths[name],
+                                     on_write=partial(on_write, name) if on_write else None, **write_options)
+                   for name, df in outputs.items()}
+        snapshots = {name: future.result() for name, future in futures.items()}
+    row_counts = {name: commit_snapshot(table_paths[name], snapshots[name])["row_count"] for name in outputs}
+    logger.info(f"Write tables Completed: {s3_path}  counts -- {row_counts}")
+    return row_counts
+
+
+def read_table(spark: SparkSession, table_path: str, version=None, as_of=None, partition_filter=None) -> DataFrame:
+    """
+    Reads a version of a manifest table (the committed one by default). The scan is planned
+    from the manifest's file list, without listing the prefix. partition_filter
+    ({column: value}) drops the files of other partitions before Spark sees them. Files of
+    merged versions come from several snapshots, each read from its own base path.
+    """
+    manifest = read_manifest(table_path, version, as_of)
+    if manifest is None:
+        raise ValueError(f"{table_path} has no committed version")
+    files_by_snapshot = {}
+    for f in manifest["files"]:
+        if all(f["partition"].get(column) == str(value) for column, value in (partition_filter or {}).items()):
+            files_by_snapshot.setdefault(f["snapshot_path"], []).append(f["path"])
+    schema = StructType.fromJson(manifest["schema"])
+    if not files_by_snapshot:
+        return spark.createDataFrame([], schema)
+    # basePath keeps the key=value folders as partition columns of the listed files
+    return reduce(DataFrame.unionByName, [
+        spark.read.option("basePath", snapshot_path).parquet(*files)
+        .select(*(F.col(field.name).cast(field.dataType) for field in schema.fields))
+        for snapshot_path, files in files_by_snapshot.items()
+    ])
+
+
+def merge_table(df: DataFrame, table_path: str, key_columns, changed_keys=None, buckets=None, details=None, catalog=True,
+                **write_options):
+    """
+    Writes a DataFrame holding the full result as the next version of a table bucketed on
+    key_columns, rewriting only the buckets whose rows changed, and returns the number of
+    rows rewritten. Unchanged buckets keep their files from the previous version. The change
+    set is changed_keys (a DataFrame of keys) when the caller knows it, otherwise the keys
+    whose rows differ from the committed version, including added and removed keys. The
+    first write, a change of bucketing or schema, or a version whose files already span
+    MERGE_MAX_SNAPSHOTS snapshots rewrite the whole table.
+    Without buckets (or --MERGE_BUCKETS), the bucket count follows the table size
+    (get_merge_buckets), so small tables are not split into hundreds of tiny files.
+    details ({name: value}, e.g. a watermark) are committed in the version manifest with the
+    rows; a change of details alone commits a version keeping every file. catalog is passed
+    to commit_snapshot.
+    """
+    details = details or {}
+    current = read_manifest(table_path)
+    buckets = buckets or get_optional_arg("MERGE_BUCKETS")
+    buckets = int(buckets) if buckets else get_merge_buckets(df, current)
+    bucketing = {"key_columns": list(key_columns), "buckets": buckets}
+    write_options["partition_by"] = [BUCKET_COLUMN, *(write_options.get("partition_by") or [])]
+    bucketed_df = df.withColumn(BUCKET_COLUMN, get_bucket(key_columns, buckets))
+
+    if (current is None or current.get("bucketing") != bucketing or current["schema"] != bucketed_df.schema.jsonValue()
+            or len({f["snapshot_path"] for f in current["files"]}) >= MERGE_MAX_SNAPSHOTS):
+        logger.info(f"Rewriting {table_path} in {buckets} buckets of {', '.join(key_columns)}")
+        snapshot = stage_snapshot(bucketed_df, table_path, **write_options)
+        return commit_snapshot(table_path, {**snapshot, "bucketing": bucketing, **details}, catalog=catalog)["row_count"]
+
+    # The result is read by the count, the comparison and the write of the changed buckets
+    bucketed_df = bucketed_df.persist()
+    try:
+        row_count = bucketed_df.count()
+        if changed_keys is None:
+            changed_keys = get_changed_keys(bucketed_df, read_table(df.sparkSession, table_path), key_columns)
+        changed_buckets = sorted(row[0] for row in changed_keys.select(get_bucket(key_columns, buckets)).distinct().collect())
+        if not changed_buckets:
+            if all(current.get(name) == value for name, value in details.items()):
+                logger.info(f"No changed keys, {table_path} stays at version={current['version']}")
+                return 0
+            unchanged = {name: value for name, value in current.items() if name not in ("version", "parent_version", "committed_at")}
+            commit_snapshot(table_path, {**unchanged, "changed_buckets": [], "rewritten_rows": 0, **details}, catalog=catalog)
+            return 0
+        logger.info(f"Rewriting {len(changed_buckets)} of {buckets} buckets of {table_path}")
+        snapshot = stage_snapshot(bucketed_df.filter(F.col(BUCKET_COLUMN).isin(changed_buckets)), table_path, **write_options)
+    finally:
+        bucketed_df.unpersist()
+    kept_files = [f for f in current["files"] if int(f["partition"][BUCKET_COLUMN]) not in changed_buckets]
+    commit_snapshot(table_path, {**snapshot, "files": kept_files + snapshot["files"], "row_count": row_count,
+                                 "bucketing": bucketing, "changed_buckets": changed_buckets,
+                                 "rewritten_rows": snapshot["row_count"], **details}, catalog=catalog)
+    return snapshot["row_count"]
+
+
+def get_bucket(key_columns, buckets: int):
+    """
+    The bucket of a row, 0 to buckets - 1, from a hash of key_columns. The hash may be
+    negative, so the remainder is shifted back into range (F.pmod needs PySpark 3.4).
+    """
+    key_hash = F.xxhash64(*key_columns)
+    return (((key_hash % buckets) + buckets) % buckets).cast("int")
+
+
+def get_merge_buckets(df: DataFrame, current=None, target_file_bytes=TARGET_FILE_BYTES, max_buckets=MERGE_BUCKETS):
+    """
+    About one target_file_bytes file per bucket, at most max_buckets. The size is that of the
+    committed version's files, else the optimizer's estimate of df (one bucket when it has
+    none: the next merge rebuckets from the files). The committed bucket count is kept while
+    it is within a factor of 2 of that, since changing it rewrites the whole table.
+    """
+    if current is not None:
+        size_bytes = sum(f["size"] for f in current["files"])
+    else:
+        size_bytes = estimate_plan_size(df) or 0
+    buckets = min(max(math.ceil(size_bytes / target_file_bytes), 1), max_buckets)
+    current_buckets = ((current or {}).get("bucketing") or {}).get("buckets")
+    if current_buckets and buckets / 2 <= current_buckets <= buckets * 2:
+        return current_buckets
+    return buckets
+
+
+def get_changed_keys(new_df: DataFrame, current_df: DataFrame, key_columns) -> DataFrame:
+    """
+    Keys whose row was added, removed or changed between the committed and the new version,
+    compared by a hash of every column.
+    """
+    value_columns = sorted(name for name in new_df.columns if name != BUCKET_COLUMN)
+    new_rows = new_df.select(*key_columns, F.xxhash64(*value_columns).alias("new_hash"))
+    current_rows = current_df.select(*key_columns, F.xxhash64(*value_columns).alias("current_hash"))
+    return (new_rows.join(current_rows, list(key_columns), "full_outer")
+            .filter(~F.col("new_hash").eqNullSafe(F.col("current_hash")))
+            .select(*key_columns))
+
+
+def write_top_n(spark: SparkSession, table_path: str, order_by: str, n: int, ascending=False):
+    """
+    Writes the first n rows of the committed version of a table, ordered by order_by, as the
+    table <table_path>_top_<n>. Reading the output back keeps the job's lineage from running
+    twice, and orderBy + limit plans a per-partition top-n instead of a global sort.
+    """
+    sort_column = F.col(order_by).asc() if ascending else F.col(order_by).desc()
+    top_n_df = read_table(spark, table_path).orderBy(sort_column).limit(n)
+    return write_table(top_n_df.coalesce(1), f"{table_path.rstrip('/')}_top_{n}")
+
+
+def expire_versions(table_path: str, manifest: dict, retain=TABLE_RETAIN_VERSIONS):
+    """
+    Deletes the manifests, symlink manifests and snapshots of versions older than the last
+    retain, and snapshots of failed runs staged before the committed one.
+    """
+    table_path = get_table_path(table_path)
+    oldest_retained = max(manifest["version"] - retain + 1, 1)
+    retained_snapshots = set()
+    for version in range(oldest_retained, manifest["version"] + 1):
+        retained = read_json(get_manifest_path(table_path, version))
+        if retained:
+            retained_snapshots.add(retained["snapshot_id"])
+            # Merged versions keep files of earlier snapshots
+            retained_snapshots.update(f["snapshot_path"].rstrip("/").split("/")[-1] for f in retained["files"])
+    for snapshot_path in list_subpaths(table_path + SNAPSHOT_DIR):
+        snapshot_id = snapshot_path.rstrip("/").split("/")[-1]
+        # Snapshots staged after the committed one may belong to a run still in progress
+        if snapshot_id not in retained_snapshots and snapshot_id < manifest["snapshot_id"]:
+            delete_path(snapshot_path)
+    for version in range(max(oldest_retained - retain, 1), oldest_retained):
+        delete_path(f"{table_path}{SYMLINK_DIR}v{version:08d}/")
+        delete_path(get_manifest_path(table_path, version))
+
+
+def get_hive_columns(schema: StructType, names):
+    """
+    Glue catalog columns for the named fields of a Spark schema.
+    """
+    return [{"Name": field.name, "Type": field.dataType.simpleString()} for field in schema.fields if field.name in names]
+
+
+def write_symlink_manifests(table_path: str, manifest: dict):
+    """
+    Writes the file list of a version as symlink manifests, one per partition, and returns
+    {partition values: manifest folder}. Athena and Hive read exactly these files.
+    """
+    symlink_path = f"{get_table_path(table_path)}{SYMLINK_DIR}v{manifest['version']:08d}/"
+    partitions = {}
+    for f in manifest["files"]:
+        values = tuple(f["partition"].get(column) for column in manifest["partition_by"])
+        partitions.setdefault(values, []).append(f["path"])
+    locations = {}
+    for values, paths in partitions.items():
+        location = symlink_path + "".join(f"{column}={value}/" for column, value in zip(manifest["partition_by"], values))
+        write_text(location + "manifest", "\n".join(paths) + "\n")
+        locations[values] = location
+    return locations
+
+
+def register_catalog_table(table_path: str, manifest: dict, database_name=None):
+    """
+    Points the Glue catalog table named after the table prefix at the symlink manifests of
+    the committed version, so catalog readers switch versions with the table, not mid-write.
+    Partitions are changed as a diff, in an order that never hides data: the new partitions
+    are added, the kept ones moved to the new version, and only then are the partitions the
+    version no longer has deleted.
+    """
+    database_name = database_name or get_optional_arg("CATALOG_DATABASE", GLUE_DATABASE)
+    table_name = get_catalog_table_name(table_path)
+    locations = write_symlink_manifests(table_path, manifest)
+    schema = StructType.fromJson(manifest["schema"])
+    partition_by = manifest["partition_by"]
+    input_format = "org.apache.hadoop.hive.ql.io.SymlinkTextInputFormat"
+
+    data_columns = get_hive_columns(schema, [field.name for field in schema.fields if field.name not in partition_by])
+    table_input = {
+        "Name": table_name,
+        "TableType": "EXTERNAL_TABLE",
+        "PartitionKeys": get_hive_columns(schema, partition_by),
+        "StorageDescriptor": get_storage_descriptor(f"{get_table_path(table_path)}{SYMLINK_DIR}v{manifest['version']:08d}/",
+                                                    data_columns, input_format),
+        "Parameters": {"classification": "parquet", "table_version": str(manifest["version"])},
+    }
+    client = boto3.client("glue")
+    put_catalog_table(client, database_name, table_input)
+
+    if partition_by:
+        existing = {}
+        for page in client.get_paginator("get_partitions").paginate(DatabaseName=database_name, TableName=table_name):
+            existing.update({tuple(partition["Values"]): partition["StorageDescriptor"]["Location"] for partition in page["Partitions"]})
+        added = [{"Values": list(values), "StorageDescriptor": get_storage_descriptor(location, data_columns, input_format)}
+                 for values, location in locations.items() if values not in existing]
+        updated = [{"PartitionValueList": list(values),
+                    "PartitionInput": {"Values": list(values), "StorageDescriptor": get_storage_descriptor(location, data_columns, input_format)}}
+                   for values, location in locations.items() if values in existing and existing[values] != location]
+        removed = [{"Values": list(values)} for values in existing if values not in locations]
+        for start in range(0, len(added), 100):
+            check_batch(client.batch_create_partition(DatabaseName=database_name, TableName=table_name,
+                                                      PartitionInputList=added[start:start + 100]), "create")
+        for start in range(0, len(updated), 100):
+            check_batch(client.batch_update_partition(DatabaseName=database_name, TableName=table_name,
+                                                      Entries=updated[start:start + 100]), "update")
+        for start in range(0, len(removed), 25):
+            check_batch(client.batch_delete_partition(DatabaseName=database_name, TableName=table_name,
+                                                      PartitionsToDelete=removed[start:start + 25]), "delete")
+        logger.info(f"Partitions of {database_name}.{table_name}: {len(added)} added, {len(updated)} updated, {len(removed)} deleted")
+    logger.info(f"Registered {database_name}.{table_name} at version={manifest['version']}")
+
+
+def register_parquet_table(table_path: str, schema: StructType, database_name=None):
+    """
+    Registers an unpartitioned prefix of plain Parquet files (an append-only output, not a
+    manifest table) as the Glue catalog table named after it.
+    """
+    database_name = database_name or get_optional_arg("CATALOG_DATABASE", GLUE_DATABASE)
+    table_input = {
+        "Name": get_catalog_table_name(table_path),
+        "TableType": "EXTERNAL_TABLE",
+        "StorageDescriptor": get_storage_descriptor(get_table_path(table_path), get_hive_columns(schema, schema.fieldNames()),
+                                                    "org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat"),
+        "Parameters": {"classification": "parquet"},
+    }
+    put_catalog_table(boto3.client("glue"), database_name, table_input)
+    logger.info(f"Registered {database_name}.{table_input['Name']} at {get_table_path(table_path)}")
+
+
+def get_catalog_table_name(table_path: str):
+    return get_table_path(table_path).rstrip("/").split("/")[-1]
+
+
+def get_storage_descriptor(location: str, columns, input_format: str):
+    return {
+        "Columns": columns,
+        "Location": location,
+        "InputFormat": input_format,
+        "OutputFormat": "org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat",
+        "SerdeInfo": {"SerializationLibrary": "org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe"},
+    }
+
+
+def put_catalog_table(client, database_name: str, table_input: dict):
+    try:
+        client.create_table(DatabaseName=database_name, TableInput=table_input)
+    except client.exceptions.AlreadyExistsException:
+        client.update_table(DatabaseName=database_name, TableInput=table_input)
+
+
+def check_batch(response: dict, action: str):
+    """
+    Raises for the partitions a batch call failed on: Glue reports them in the response
+    instead of raising.
+    """
+    errors = response.get("Errors") or []
+    if errors:
+        raise RuntimeError(f"Failed to {action} {len(errors)} partition(s), e.g. {errors[0]}")
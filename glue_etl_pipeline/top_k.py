@@ -0,0 +1,16 @@
+from pyspark.sql import DataFrame
+from pyspark.sql import functions as F
+from pyspark.sql.window import Window
+
+
+def top_k_by_group(df: DataFrame, group_column: str, score_column: str, k: int, rank_column="rank") -> DataFrame:
+    """
+    Returns the rows of df with RANK() OVER (PARTITION BY group_column ORDER BY score_column DESC) <= k,
+    plus the rank column: the k best rows of each group and any rows tied with the k-th.
+    The rows stay in the JVM instead of going through a Python RDD, but nothing bounds the
+    work by k: every row is shuffled by group_column and sorted within its group, as the SQL
+    RANK() is. On Glue 4.0 (Spark 3.3) memory is not limited to k rows per group; the
+    per-partition group limit before the shuffle (WindowGroupLimit) only exists from Spark 3.5.
+    """
+    window_spec = Window.partitionBy(group_column).orderBy(F.col(score_column).desc())
+    return df.withColumn(rank_column, F.rank().over(window_spec)).filter(F.col(rank_column) <= k)
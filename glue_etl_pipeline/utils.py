@@ -1,8 +1,27 @@
 import boto3
+import json
+import logging
+import math
+import os
+import shutil
+import sys
+import time
+from typing import TYPE_CHECKING
 from pyspark.sql import DataFrame
+from pyspark.sql import Observation
+from pyspark.sql import functions as F
 from pyspark.sql import SparkSession
-from awsglue.context import GlueContext
+from pyspark.sql.types import ArrayType, StructType, _parse_datatype_string
+from botocore.exceptions import ClientError
 from glue_etl_pipeline.glue_config import USER_MYSQL_URL,ORDER_MYSQL_URL,PRODUCT_MYSQL_URL,MYSQL_PROPERTIES
+from glue_etl_pipeline.glue_config import JDBC_FETCH_SIZE,RDS_PARTITION_CONFIG,DYNAMODB_READ_CONFIG,DYNAMODB_SCHEMAS
+from glue_etl_pipeline.glue_config import TARGET_FILE_BYTES,OUTPUT_COMPRESSION,OUTPUT_LAYOUT,JOB_IMPLEMENTATIONS
+from glue_etl_pipeline.dynamodb_scan import scan_table
+from glue_etl_pipeline.join_planner import estimate_rds_table_size,estimate_plan_size
+
+if TYPE_CHECKING:
+    # Only Glue's runtime provides awsglue; the module itself imports without it
+    from awsglue.context import GlueContext
 
 
 def get_glue_logger():
@@ -13,46 +32,483 @@ def get_glue_logger():
     logger.setLevel(logging.INFO)
     return logger
 
-def read_from_rds(spark: SparkSession, database_url, tablename:str) -> DataFrame:
+def get_optional_arg(name:str, default=None):
+    """
+    Returns the value of an optional --NAME job argument (getResolvedOptions only handles required ones).
+    """
+    flag = f"--{name}"
+    for index, arg in enumerate(sys.argv):
+        if arg == flag and index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+        if arg.startswith(flag + "="):
+            return arg.split("=", 1)[1]
+    return default
+
+
+def is_enabled_for(name: str, job_name: str) -> bool:
+    """
+    True when the --NAME job argument is true, or a comma-separated list of job names that
+    includes job_name: job_runner runs several jobs with one set of arguments.
+    """
+    value = str(get_optional_arg(name, "false")).strip().lower()
+    return value == "true" or job_name in [job.strip() for job in value.split(",")]
+
+
+def get_current_date(spark: SparkSession):
+    """
+    current_date() of the session, as a date: the clock the jobs' window filters use, so
+    the days listed on the driver agree with the partitions the filters select.
+    """
+    return spark.sql("SELECT current_date()").first()[0]
+
+
+def is_verbose() -> bool:
+    """
+    True when the job runs with --VERBOSE true (or ETL_VERBOSE=true), enabling the debug actions
+    that re-scan a dataset: counts, show() and printSchema().
+    """
+    return str(get_optional_arg("VERBOSE", os.getenv("ETL_VERBOSE", "false"))).lower() == "true"
+
+
+def debug_show(df: DataFrame, num_rows=20, schema=False):
+    """
+    Shows the first rows (and optionally the schema) of a DataFrame, only when running verbose.
+    """
+    if not is_verbose():
+        return
+    df.show(num_rows)
+    if schema:
+        df.printSchema()
+
+
+def read_from_rds(spark: SparkSession, database_url, tablename:str, columns=None, date_column=None, window_days=None,
+                  predicate=None, partition_column=None, num_partitions=None, fetch_size=JDBC_FETCH_SIZE, verbose=None) -> DataFrame:
     """
     Reads data from an Database .
+    Only the given columns, and rows whose date_column falls in the last window_days days
+    and that match the optional SQL predicate, are sent back by MySQL. When a partition column is given (or configured in
+    RDS_PARTITION_CONFIG) the table is read over num_partitions parallel JDBC connections,
+    each fetching fetch_size rows at a time. The per-partition row counts are only
+    reported when verbose, since they cost an extra query against the database.
     """
-    df=spark.read.jdbc(url=database_url, table=tablename, properties=MYSQL_PROPERTIES)
+    config = RDS_PARTITION_CONFIG.get(tablename, {})
+    partition_column = partition_column or config.get("column")
+    num_partitions = num_partitions or config.get("num_partitions", 1)
+    properties = dict(MYSQL_PROPERTIES, fetchsize=str(fetch_size))
+    if columns and partition_column and partition_column not in columns:
+        columns = list(columns) + [partition_column]
+    source = build_source_query(tablename, columns, date_column, window_days, predicate)
+
+    lower_bound, upper_bound = None, None
+    if partition_column and num_partitions > 1:
+        lower_bound, upper_bound = config.get("lower_bound"), config.get("upper_bound")
+        if lower_bound is None or upper_bound is None:
+            lower_bound, upper_bound = get_partition_bounds(spark, database_url, source, partition_column)
+
+    print(f"Reading from RDS Table -- {tablename}  query -- {source}")
+    if lower_bound is not None and upper_bound is not None:
+        print(f"Reading from RDS Table -- {tablename}  partitioned on {partition_column} "
+              f"[{lower_bound}, {upper_bound}] into {num_partitions} partitions")
+        df = spark.read.jdbc(url=database_url, table=source, column=partition_column,
+                             lowerBound=lower_bound, upperBound=upper_bound,
+                             numPartitions=num_partitions, properties=properties)
+    else:
+        df = spark.read.jdbc(url=database_url, table=source, properties=properties)
     df.createOrReplaceTempView(tablename)
-    print("Reading from RDS Table -- " +tablename+ "  count -- " + str(df.count()))
+    estimate_rds_table_size(spark, database_url, tablename)
+    if is_verbose() if verbose is None else verbose:
+        report_partition_stats(df, tablename)
     return df
 
 
-def read_from_dynamodb(glueContext: GlueContext, tableName:str,region) -> DataFrame:
+def build_source_query(tablename:str, columns=None, date_column=None, window_days=None, predicate=None) -> str:
+    """
+    Returns the table name, or a subquery projecting columns and filtering on the date window and predicate.
+    """
+    conditions = []
+    if date_column and window_days:
+        conditions.append(f"{date_column} >= DATE_SUB(CURDATE(), INTERVAL {int(window_days)} DAY)")
+    if predicate:
+        conditions.append(f"({predicate})")
+    if not columns and not conditions:
+        return tablename
+    select_list = ", ".join(columns) if columns else "*"
+    query = f"SELECT {select_list} FROM {tablename}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return f"({query}) AS {tablename}"
+
+
+def get_partition_bounds(spark: SparkSession, database_url, source:str, partition_column:str):
+    """
+    Returns the MIN and MAX of the partition column, computed on the database side.
+    """
+    bounds_query = (f"(SELECT MIN({partition_column}) AS lower_bound, MAX({partition_column}) AS upper_bound "
+                    f"FROM {source}) AS bounds")
+    bounds = spark.read.jdbc(url=database_url, table=bounds_query, properties=MYSQL_PROPERTIES).first()
+    if bounds is None or bounds["lower_bound"] is None:
+        return None, None
+    return int(bounds["lower_bound"]), int(bounds["upper_bound"])
+
+
+def report_partition_stats(df: DataFrame, tablename:str, source="RDS Table"):
+    """
+    Prints the row count and fetch time of every partition, plus the table total.
+    """
+    def count_partition(index, rows):
+        start_time = time.time()
+        row_count = 0
+        for _ in rows:
+            row_count += 1
+        yield (index, row_count, time.time() - start_time)
+
+    stats = df.rdd.mapPartitionsWithIndex(count_partition).collect()
+    for index, row_count, duration in stats:
+        print(f"Reading from {source} -- {tablename}  partition {index}  count -- {row_count}  time -- {duration:.2f}s")
+    print(f"Reading from {source} -- " +tablename+ "  count -- " + str(sum(row_count for _, row_count, _ in stats)))
+    return stats
+
+
+def read_from_dynamodb(glueContext: "GlueContext", tableName:str,region, verbose=None, method=None, splits=None, read_percent=None, prune=True,
+                       spark: SparkSession = None) -> DataFrame:
     """
     Reads data from an Database .
+    method, splits (parallel scan segments) and read_percent (share of the read capacity)
+    default to the table's DYNAMODB_READ_CONFIG entry; --DYNAMODB_READ_METHOD and
+    --DYNAMODB_SPLITS override them for a run. With --DYNAMODB_ENDPOINT (e.g. DynamoDB Local)
+    the table is always read with a segmented scan against that endpoint. Segmented scans
+    report every segment's item count and time; the connector's splits are only reported when verbose.
+    With prune, a table declared in DYNAMODB_SCHEMAS is read as only those attributes, with those types.
+    spark is the session to return the DataFrame in, by default the Glue context's.
     """
-    print("Reading from dynamodb Table --   "+tableName +"   region -- " + region )
-    dyf = glueContext.create_dynamic_frame.from_options(
-        connection_type="dynamodb",
-        connection_options={
-            "dynamodb.input.tableName": tableName,
-            "dynamodb.region": region
-        }
-    )
-    df = dyf.toDF()
-    print("Reading from dynamodb Table -- " +tableName+ "  count -- " + str(df.count()))
-    df.printSchema()
+    config = DYNAMODB_READ_CONFIG.get(tableName, {})
+    endpoint_url = get_optional_arg("DYNAMODB_ENDPOINT")
+    method = "scan" if endpoint_url else method or get_optional_arg("DYNAMODB_READ_METHOD") or config.get("method", "glue")
+    splits = int(splits or get_optional_arg("DYNAMODB_SPLITS") or config.get("splits", 1))
+    read_percent = float(read_percent or config.get("read_percent", 0.5))
+    schema = get_dynamodb_schema(tableName) if prune else None
+    print(f"Reading from dynamodb Table -- {tableName}  region -- {region}  method -- {method}  "
+          f"splits -- {splits}  read percent -- {read_percent}  attributes -- {get_schema_paths(schema) if schema else 'all'}")
+    start_time = time.time()
+
+    if method == "scan":
+        # The declared schema is the JSON read schema: nothing is inferred
+        df, stats = scan_table(spark or glueContext.spark_session, tableName, region, splits, read_percent, endpoint_url, schema)
+        for segment in stats:
+            print(f"Reading from dynamodb Table -- {tableName}  segment {segment['segment']}  count -- {segment['items']}  "
+                  f"pages -- {segment['pages']}  capacity -- {segment['consumed_capacity']:.1f}  time -- {segment['seconds']:.2f}s")
+    else:
+        if method == "export":
+            connection_options = get_dynamodb_export_options(tableName, region)
+        else:
+            connection_options = {
+                "dynamodb.input.tableName": tableName,
+                "dynamodb.region": region,
+                "dynamodb.splits": str(splits),
+                "dynamodb.throughput.read.percent": str(read_percent),
+            }
+        dyf = glueContext.create_dynamic_frame.from_options(
+            connection_type="dynamodb",
+            connection_options=connection_options
+        )
+        if schema is not None:
+            # Prune and resolve choice types on the DynamicFrame, so toDF() only infers the declared attributes
+            dyf = dyf.select_fields(get_schema_paths(schema)).resolveChoice(specs=get_choice_specs(schema))
+        df = dyf.toDF()
+        if schema is not None:
+            df = conform_to_schema(df, schema)
+        if spark is not None:
+            df = to_session(df, spark)
+    print(f"Reading from dynamodb Table -- {tableName}  time -- {time.time() - start_time:.2f}s")
+
+    if is_verbose() if verbose is None else verbose:
+        if method != "scan":
+            report_partition_stats(df, tableName, "dynamodb Table")
+        print("Reading from dynamodb Table -- " +tableName+ "  count -- " + str(df.count()))
+        df.printSchema()
     return df
 
-def read_from_s3(glue_context: GlueContext, s3_path: str, format="csv", options=None) -> DataFrame:
+
+def inherit_local_properties(spark: SparkSession, action):
+    """
+    action wrapped to run with the calling thread's local properties (scheduler pool, job
+    group), which threads of a pool do not inherit.
+    """
+    sc = spark.sparkContext
+    properties = sc._jsc.sc().getLocalProperties().clone()
+
+    def run(*args, **kwargs):
+        sc._jsc.sc().setLocalProperties(properties)
+        return action(*args, **kwargs)
+    return run
+
+
+def to_session(df: DataFrame, spark: SparkSession) -> DataFrame:
+    """
+    The same DataFrame in another session of the application, e.g. one job's session in
+    job_runner. Its plan is reused as is, so data cached for it is read from the cache.
+    """
+    if df.sparkSession is spark:
+        return df
+    jdf = spark._jvm.org.apache.spark.sql.Dataset.ofRows(spark._jsparkSession, df._jdf.queryExecution().analyzed())
+    return DataFrame(jdf, spark)
+
+
+def get_dynamodb_schema(tableName:str):
+    """
+    The declared DYNAMODB_SCHEMAS entry as a StructType, None for undeclared tables.
+    """
+    ddl = DYNAMODB_SCHEMAS.get(tableName)
+    return _parse_datatype_string(ddl) if ddl else None
+
+
+def get_schema_paths(schema: StructType, prefix=""):
+    """
+    Field paths to select from a DynamicFrame: nested struct fields one by one, arrays whole.
+    """
+    paths = []
+    for field in schema.fields:
+        if isinstance(field.dataType, StructType):
+            paths += get_schema_paths(field.dataType, f"{prefix}{field.name}.")
+        else:
+            paths.append(f"{prefix}{field.name}")
+    return paths
+
+
+def get_choice_specs(schema: StructType, prefix=""):
+    """
+    resolveChoice specs casting every declared leaf (including inside arrays of structs) to its type.
+    """
+    specs = []
+    for field in schema.fields:
+        data_type = field.dataType
+        if isinstance(data_type, ArrayType) and isinstance(data_type.elementType, StructType):
+            specs += get_choice_specs(data_type.elementType, f"{prefix}{field.name}[].")
+        elif isinstance(data_type, StructType):
+            specs += get_choice_specs(data_type, f"{prefix}{field.name}.")
+        elif not isinstance(data_type, ArrayType):
+            specs.append((f"{prefix}{field.name}", "cast:" + {"integer": "int"}.get(data_type.typeName(), data_type.typeName())))
+    return specs
+
+
+def conform_column(column, actual_type, declared_type):
+    """
+    Rebuilds a column with exactly the declared fields and types; declared fields missing
+    from the data become NULL, extra fields (also inside arrays of structs) are dropped.
+    """
+    if isinstance(declared_type, StructType):
+        actual_fields = {field.name: field.dataType for field in actual_type.fields} if isinstance(actual_type, StructType) else {}
+        struct = F.struct(*[
+            (conform_column(column.getField(field.name), actual_fields[field.name], field.dataType)
+             if field.name in actual_fields else F.lit(None).cast(field.dataType)).alias(field.name)
+            for field in declared_type.fields
+        ])
+        return F.when(column.isNull(), F.lit(None)).otherwise(struct)
+    if isinstance(declared_type, ArrayType) and isinstance(actual_type, ArrayType) and isinstance(declared_type.elementType, StructType):
+        return F.transform(column, lambda element: conform_column(element, actual_type.elementType, declared_type.elementType))
+    return column.cast(declared_type)
+
+
+def conform_to_schema(df: DataFrame, schema: StructType) -> DataFrame:
+    actual_fields = {field.name: field.dataType for field in df.schema.fields}
+    return df.select(*[
+        (conform_column(F.col(f"`{field.name}`"), actual_fields[field.name], field.dataType)
+         if field.name in actual_fields else F.lit(None).cast(field.dataType)).alias(field.name)
+        for field in schema.fields
+    ])
+
+
+def get_dynamodb_export_options(tableName:str, region):
+    """
+    Connector options for reading a table through a DynamoDB export to <DYNAMODB_EXPORT_PATH><table>/.
+    """
+    export_path = get_optional_arg("DYNAMODB_EXPORT_PATH")
+    if not export_path:
+        raise ValueError(f"--DYNAMODB_EXPORT_PATH is required to read {tableName} from a DynamoDB export")
+    bucket, prefix = split_s3_path(export_path.rstrip("/") + "/")
+    table_arn = boto3.client("dynamodb", region_name=region).describe_table(TableName=tableName)["Table"]["TableArn"]
+    return {
+        "dynamodb.export": "ddb",
+        "dynamodb.tableArn": table_arn,
+        "dynamodb.s3.bucket": bucket,
+        "dynamodb.s3.prefix": f"{prefix}{tableName}/",
+        "dynamodb.unnestDDBJson": True,
+    }
+
+def read_from_s3(glue_context: "GlueContext", s3_path: str, format="csv", options=None) -> DataFrame:
     """
     Reads data from an S3 location.
     """
     options = options or {"header": "true"}
     return glue_context.read.format(format).options(**options).load(s3_path)
 
-def write_to_s3(df: DataFrame, s3_path: str, format="parquet", mode="overwrite"):
+def write_to_s3(df: DataFrame, s3_path: str, format="parquet", mode="overwrite", partition_by=None, options=None, verbose=None,
+                sort_by=None, target_file_bytes=TARGET_FILE_BYTES, compression=None, on_write=None):
     """
     Writes a Spark DataFrame to an S3 location.
+    The row count is collected by an observation on the write itself, so the data is only
+    computed once; the preview and the separate count only run when verbose.
+    Files are laid out by layout_for_write (about target_file_bytes each, rows sorted by
+    partition_by then sort_by) and Parquet/ORC is compressed with compression, by default
+    --OUTPUT_COMPRESSION or OUTPUT_COMPRESSION. on_write, when given, is called with the
+    laid-out DataFrame right before it is written (instrumentation.plan_capture).
     """
     print(f"Write data to S3 Started: {s3_path}")
-    df.show(10)
-    print(df.count())
-    df.write.mode(mode).format(format).save(s3_path)
-    print(f"Write data to S3 Completed: {s3_path}")
\ No newline at end of file
+    if is_verbose() if verbose is None else verbose:
+        df.show(10)
+        print(df.count())
+    df, max_records_per_file = layout_for_write(df, partition_by, sort_by, target_file_bytes)
+    if on_write:
+        on_write(df)
+    observation = Observation()
+    writer = df.observe(observation, F.count(F.lit(1)).alias("row_count")).write.mode(mode).format(format)
+    if partition_by:
+        writer = writer.partitionBy(*partition_by)
+    if format in ("parquet", "orc"):
+        writer = writer.option("compression", compression or get_optional_arg("OUTPUT_COMPRESSION", OUTPUT_COMPRESSION))
+    if max_records_per_file:
+        writer = writer.option("maxRecordsPerFile", max_records_per_file)
+    if options:
+        writer = writer.options(**options)
+    writer.save(s3_path)
+    row_count = observation.get["row_count"]
+    print(f"Write data to S3 Completed: {s3_path}  count -- {row_count}")
+    return row_count
+
+
+def get_output_layout(name: str):
+    """
+    write_to_s3 keyword arguments (partition_by, sort_by, ...) for a job output, from OUTPUT_LAYOUT.
+    """
+    return dict(OUTPUT_LAYOUT.get(name, {}))
+
+
+def get_implementation(name: str) -> str:
+    """
+    "sql" or "dataframe": the transform a job runs, from --IMPLEMENTATION or JOB_IMPLEMENTATIONS.
+    """
+    implementation = get_optional_arg("IMPLEMENTATION", JOB_IMPLEMENTATIONS.get(name, "sql")).lower()
+    if implementation not in ("sql", "dataframe"):
+        raise ValueError(f"Unknown --IMPLEMENTATION {implementation}: expected sql or dataframe")
+    return implementation
+
+
+def layout_for_write(df: DataFrame, partition_by=None, sort_by=None, target_file_bytes=TARGET_FILE_BYTES):
+    """
+    Returns (df, max_records_per_file) laid out for writing. Partitioned outputs are shuffled
+    on the partition columns, so each partition value is written by one task instead of as a
+    small file from every task. Unpartitioned outputs whose size Spark can estimate are
+    coalesced to about one partition per target_file_bytes. maxRecordsPerFile caps every file
+    at target_file_bytes of uncompressed rows, so large partitions are split into several files.
+    Rows are sorted within each file by partition_by then sort_by.
+    """
+    max_records_per_file = None
+    if target_file_bytes:
+        row_bytes = max(int(df._jdf.schema().defaultSize()), 1)
+        max_records_per_file = max(int(target_file_bytes // row_bytes), 1)
+        if partition_by:
+            df = df.repartition(*partition_by)
+        else:
+            size_bytes = estimate_plan_size(df)
+            if size_bytes is not None:
+                # coalesce only ever lowers the partition count, without a shuffle
+                df = df.coalesce(max(math.ceil(size_bytes / target_file_bytes), 1))
+    if partition_by or sort_by:
+        df = df.sortWithinPartitions(*(partition_by or []), *(sort_by or []))
+    return df, max_records_per_file
+
+
+def split_s3_path(s3_path: str):
+    """
+    Splits s3://bucket/key into (bucket, key).
+    """
+    bucket, _, key = s3_path[len("s3://"):].partition("/")
+    return bucket, key
+
+
+def read_json(path: str):
+    """
+    Reads a JSON document from S3 or the local filesystem, None when it does not exist.
+    """
+    if path.startswith("s3://"):
+        bucket, key = split_s3_path(path)
+        try:
+            body = boto3.client("s3").get_object(Bucket=bucket, Key=key)["Body"].read()
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise
+        return json.loads(body)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(path: str, document):
+    """
+    Writes a JSON document to S3 or the local filesystem.
+    """
+    write_text(path, json.dumps(document, indent=2, default=str))
+
+
+def write_text(path: str, body: str):
+    """
+    Writes a text object to S3 or a text file locally, in a single put.
+    """
+    if path.startswith("s3://"):
+        bucket, key = split_s3_path(path)
+        boto3.client("s3").put_object(Bucket=bucket, Key=key, Body=body.encode("utf-8"))
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        f.write(body)
+
+
+def list_files(path: str):
+    """
+    Lists the data files under an S3 prefix or local directory, recursively, as
+    [{"path", "size"}]. Hidden names (_SUCCESS, .crc, _temporary) are skipped, as Spark does.
+    """
+    path = path.rstrip("/") + "/"
+    files = []
+    if path.startswith("s3://"):
+        bucket, prefix = split_s3_path(path)
+        paginator = boto3.client("s3").get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            files += [{"path": f"s3://{bucket}/{obj['Key']}", "size": obj["Size"]} for obj in page.get("Contents", [])
+                      if not any(part.startswith(("_", ".")) for part in obj["Key"][len(prefix):].split("/"))]
+        return files
+    for directory, subdirectories, names in os.walk(path):
+        subdirectories[:] = sorted(name for name in subdirectories if not name.startswith(("_", ".")))
+        files += [{"path": os.path.join(directory, name), "size": os.path.getsize(os.path.join(directory, name))}
+                  for name in sorted(names) if not name.startswith(("_", "."))]
+    return files
+
+
+def list_subpaths(path: str):
+    """
+    Lists the immediate child "directories" of an S3 prefix or local directory.
+    """
+    path = path.rstrip("/") + "/"
+    if path.startswith("s3://"):
+        bucket, prefix = split_s3_path(path)
+        paginator = boto3.client("s3").get_paginator("list_objects_v2")
+        children = []
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+            children += [f"s3://{bucket}/{p['Prefix']}" for p in page.get("CommonPrefixes", [])]
+        return children
+    if not os.path.isdir(path):
+        return []
+    return [os.path.join(path, name) + "/" for name in sorted(os.listdir(path)) if os.path.isdir(os.path.join(path, name))]
+
+
+def delete_path(path: str):
+    """
+    Deletes every object under an S3 prefix, or a local directory tree.
+    """
+    if path.startswith("s3://"):
+        bucket, prefix = split_s3_path(path.rstrip("/") + "/")
+        boto3.resource("s3").Bucket(bucket).objects.filter(Prefix=prefix).delete()
+        return
+    shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,66 @@
+import time
+from datetime import datetime, timezone
+from glue_etl_pipeline.instrumentation import get_metrics_path
+from glue_etl_pipeline.snapshot import get_workflow_run_id
+from glue_etl_pipeline.table_format import read_manifest
+from glue_etl_pipeline.utils import get_optional_arg,read_json,write_json
+from glue_etl_pipeline.glue_config import RUNNER_JOBS
+from glue_etl_pipeline.glue_job import start_job
+from glue_etl_pipeline.logging import get_logger
+
+# Initialize Logger
+logger = get_logger("workflow summary")
+
+def run_etl():
+    args, glueContext, job = start_job(["JOB_NAME", "S3_TARGET_PATH"])
+    start_time = time.time()
+    try:
+        logger.info(f"Starting ETL Job {args['JOB_NAME']}")
+        run_id = get_workflow_run_id()
+        if not run_id:
+            raise RuntimeError("No --WORKFLOW_RUN_ID: the summary only runs as the last step of a workflow run")
+        jobs = get_optional_arg("JOBS", ",".join(RUNNER_JOBS)).split(",")
+        summary = summarize_run(args['S3_TARGET_PATH'], jobs, run_id)
+        summary_path = get_metrics_path(args["JOB_NAME"], run_id, args['S3_TARGET_PATH'] + args["JOB_NAME"])
+        write_json(summary_path, summary)
+        logger.info(f"Workflow run {run_id} complete, summary written: {summary_path}")
+
+        logger.info("ETL Job Completed Successfully")
+    except Exception as e:
+        logger.error(f"ETL Job Failed: {str(e)}")
+        raise e
+    finally:
+        duration = time.time() - start_time
+        logger.info(f"ETL Job Duration: {duration:.2f} seconds")
+        job.commit()
+
+
+def summarize_run(s3_target_path: str, jobs, run_id: str):
+    """
+    The workflow run's summary: per analytics job, its phase timings from its run metrics and
+    the version and row count its table is at. Raises RuntimeError when a job of the run wrote
+    no run metrics. Jobs without instrumentation (source_snapshot, daily_aggregates) are
+    listed by name only; the trigger starting this job already required them to succeed.
+    """
+    summary = {"workflow_run_id": run_id, "jobs": {}}
+    missing = []
+    for name in jobs:
+        if name not in RUNNER_JOBS:
+            summary["jobs"][name] = {}
+            continue
+        output_path = s3_target_path + name
+        run = read_json(get_metrics_path(name, run_id, output_path))
+        if run is None:
+            missing.append(name)
+            continue
+        manifest = read_manifest(output_path) or {}
+        summary["jobs"][name] = {
+            "seconds": round(sum(phase["seconds"] for phase in run["phases"].values()), 2),
+            "phases": {phase_name: phase["seconds"] for phase_name, phase in run["phases"].items()},
+            "version": manifest.get("version"),
+            "row_count": manifest.get("row_count"),
+        }
+    if missing:
+        raise RuntimeError(f"No run metrics for workflow run {run_id}: {missing}")
+    summary["completed_at"] = datetime.now(timezone.utc).isoformat()
+    return summary
@@ -0,0 +1,3 @@
+from glue_etl_pipeline.daily_aggregates import run_etl
+
+run_etl()
\ No newline at end of file
@@ -0,0 +1,32 @@
+import boto3
+import sys
+
+# The jobs register their output tables in this database on every commit
+# (glue_etl_pipeline/table_format.py), so no crawler catalogs the analytics prefix.
+# Crawlers named on the command line, left by earlier deployments, are deleted.
+
+def ensure_database_exists(client, database_name):
+    try:
+        client.get_database(Name=database_name)
+        print(f"✅ Database '{database_name}' already exists.")
+    except client.exceptions.EntityNotFoundException:
+        print(f"📁 Database '{database_name}' not found. Creating...")
+        client.create_database(DatabaseInput={"Name": database_name})
+        print(f"✅ Database '{database_name}' created successfully.")
+
+def delete_glue_crawler(client, crawler_name):
+    try:
+        client.delete_crawler(Name=crawler_name)
+        print(f"🗑️ Crawler '{crawler_name}' deleted.")
+    except client.exceptions.EntityNotFoundException:
+        return
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python create_glue_database.py <database_name> [<obsolete_crawler_name> ...]")
+        sys.exit(1)
+
+    client = boto3.client('glue')
+    ensure_database_exists(client, sys.argv[1])
+    for crawler_name in sys.argv[2:]:
+        delete_glue_crawler(client, crawler_name)
@@ -1,8 +1,23 @@
 import boto3
 import sys
 
+# Arguments given to some jobs only, with paths relative to the bucket. The analytics jobs run
+# their JOB_IMPLEMENTATIONS transform over the sources unless opted into a state path here:
+#   "--STATE_PATH": "state/", "--DAILY_AGGREGATES": "true"  reads the daily aggregate store
+#       (purchase_behavior, omni_channel_engagement, fraud_detection; the job then depends on
+#       daily_aggregates in WORKFLOW_DAG and daily_aggregates joins the workflow)
+#   "--STATE_PATH": "state/", "--INCREMENTAL_STATE": "true" maintains churn_prediction's customer state
+#   "--STATE_PATH": "state/", "--FRAUD_LOGIN_MODE": "sketch" keeps fraud_detection's login sketches
+# job_runner takes a comma-separated list of jobs instead of true for either store flag.
+JOB_ARGUMENTS = {
+    "daily_aggregates": {"--STATE_PATH": "state/"},
+    "fraud_detection_stream": {"--STATE_PATH": "state/"},
+}
+
 def create_glue_job(job_name, role_arn, script_location, bucket_name, project_lib_path, glue_version="4.0", worker_type="Standard", worker_count=2, rds_connection_name="my-rds-mysql-connection"):
     client = boto3.client('glue')
+    # *_stream jobs run Structured Streaming queries continuously
+    command_name = 'gluestreaming' if job_name.endswith("_stream") else 'glueetl'
 
     # Define Default Arguments
     default_arguments = {
@@ -10,16 +25,22 @@ def create_glue_job(job_name, role_arn, script_location, bucket_name, project_li
         "--job-bookmark-option": "job-bookmark-enable",
         "--TempDir": f"s3://{bucket_name}/code/temp/{job_name}/",
         "--S3_TARGET_PATH": f"s3://{bucket_name}/analytics/",
+        "--SNAPSHOT_PATH": f"s3://{bucket_name}/snapshots/",
         "--extra-py-files": project_lib_path,
         "--job-language": "python"
     }
+    for name, value in JOB_ARGUMENTS.get(job_name, {}).items():
+        default_arguments[name] = f"s3://{bucket_name}/{value}" if name.endswith("_PATH") else value
+    if job_name == "job_runner":
+        # Runs several jobs concurrently in one application, in FAIR scheduler pools
+        default_arguments["--conf"] = "spark.scheduler.mode=FAIR"
 
     try:
         response = client.create_job(
             Name=job_name,
             Role=role_arn,
             Command={
-                'Name': 'glueetl',
+                'Name': command_name,
                 'ScriptLocation': script_location,
                 'PythonVersion': '3'
             },
@@ -39,7 +60,7 @@ def create_glue_job(job_name, role_arn, script_location, bucket_name, project_li
             JobUpdate={
                 'Role': role_arn,
                 'Command': {
-                    'Name': 'glueetl',
+                    'Name': command_name,
                     'ScriptLocation': script_location,
                     'PythonVersion': '3'
                 },
@@ -2,60 +2,82 @@ import boto3
 import os
 import sys
 import json
+import time
+from workflow_dag import WORKFLOW_DAG,FAN_IN_JOB,select_jobs,add_fan_in,get_trigger_groups
 
 glue_client = boto3.client("glue", region_name=os.environ["REGION"])
 
-def create_glue_trigger(trigger_name, workflow_name, job_name=None, prev_job_name=None, schedule_expression=None, crawler_name=None):
+def create_glue_trigger(trigger_name, workflow_name, job_names, prev_job_names=None, schedule_expression=None, job_arguments=None):
     trigger_params = {
         "Name": trigger_name,
         "WorkflowName": workflow_name,
-        "Actions": []
+        "Actions": [{"JobName": job_name, **({"Arguments": job_arguments[job_name]} if job_name in (job_arguments or {}) else {})}
+                    for job_name in job_names]
     }
 
-    if crawler_name:
-        trigger_params["Actions"].append({"CrawlerName": crawler_name})
-    else:
-        trigger_params["Actions"].append({"JobName": job_name})
-
     if schedule_expression:
         trigger_params["Type"] = "SCHEDULED"
         trigger_params["Schedule"] = schedule_expression
-    elif not prev_job_name:
+    elif not prev_job_names:
         trigger_params["Type"] = "ON_DEMAND"
     else:
+        # Fan-in: fires once every previous job has SUCCEEDED in the same workflow run
         trigger_params["Type"] = "CONDITIONAL"
         trigger_params["Predicate"] = {
+            "Logical": "AND",
             "Conditions": [{
                 "LogicalOperator": "EQUALS",
                 "JobName": prev_job_name,
                 "State": "SUCCEEDED"
-            }]
+            } for prev_job_name in prev_job_names]
         }
 
+    # Triggers cannot change type in place, and the previous deployment may have chained
+    # the same jobs differently
+    delete_glue_trigger(trigger_name)
     response = glue_client.create_trigger(**trigger_params)
     print(f"✅ Trigger Created: {trigger_name}")
-    if prev_job_name is not None:
+    if prev_job_names:
         glue_client.start_trigger(Name=trigger_name)
         print(f"🚀 Trigger Activated: {trigger_name}")
     return response
 
+def delete_glue_trigger(trigger_name):
+    try:
+        glue_client.delete_trigger(Name=trigger_name)
+    except glue_client.exceptions.EntityNotFoundException:
+        return
+    # Deletion is asynchronous; the name can only be reused once it is gone
+    while True:
+        try:
+            glue_client.get_trigger(Name=trigger_name)
+        except glue_client.exceptions.EntityNotFoundException:
+            break
+        time.sleep(2)
+    print(f"🗑️ Trigger Deleted: {trigger_name}")
+
+def get_workflow_triggers(workflow_name):
+    workflow = glue_client.get_workflow(Name=workflow_name, IncludeGraph=True)["Workflow"]
+    return [node["Name"] for node in workflow.get("Graph", {}).get("Nodes", []) if node["Type"] == "TRIGGER"]
+
 if __name__ == "__main__":
     BUCKET_NAME = sys.argv[3]
     REGION = sys.argv[2]
-    WORKFLOW_NAME = sys.argv[5]
-    CRAWLER_NAME = sys.argv[4]
-
-    # Get job names from command line JSON string
-    glue_jobs = json.loads(sys.argv[1])  # e.g., '["purchase_behavior", "churn_prediction", ...]'
-
-    prev_job = None
-    for job in glue_jobs:
-        create_glue_trigger(f"trigger_{job}", WORKFLOW_NAME, job_name=job, prev_job_name=prev_job)
-        prev_job = job
-
-    create_glue_trigger(
-        trigger_name=f"trigger_{CRAWLER_NAME}",
-        workflow_name=WORKFLOW_NAME,
-        prev_job_name=glue_jobs[-1],
-        crawler_name=CRAWLER_NAME
-    )
+    WORKFLOW_NAME = sys.argv[4]
+
+    # Get job names from command line JSON string; their dependencies come from WORKFLOW_DAG
+    glue_jobs = json.loads(sys.argv[1])  # e.g., '["source_snapshot", "purchase_behavior", ...]'
+    # The fan-in job runs after all of them and summarizes the run of each
+    dag = add_fan_in(select_jobs(WORKFLOW_DAG, glue_jobs))
+    job_arguments = {FAN_IN_JOB: {"--JOBS": ",".join(glue_jobs)}}
+
+    trigger_names = []
+    for prev_jobs, jobs in get_trigger_groups(dag).items():
+        trigger_name = f"trigger_{jobs[0]}" if len(jobs) == 1 else f"trigger_after_{'_'.join(prev_jobs)}"
+        create_glue_trigger(trigger_name, WORKFLOW_NAME, job_names=jobs, prev_job_names=list(prev_jobs), job_arguments=job_arguments)
+        trigger_names.append(trigger_name)
+
+    # Triggers of the former linear chain, and the former crawler trigger, that the graph no longer uses
+    for trigger_name in get_workflow_triggers(WORKFLOW_NAME):
+        if trigger_name not in trigger_names:
+            delete_glue_trigger(trigger_name)
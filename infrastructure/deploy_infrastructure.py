@@ -24,8 +24,8 @@ def deploy_infrastructure():
     # Step 3: Create Glue Jobs (example for a job)
     subprocess.run(["python", "infrastructure/create_glue_jobs.py", "churn_prediction", "arn:aws:iam::123456789012:role/GlueDevRole", "s3://your-bucket-name/code/churn_prediction.py"])
 
-    # Step 4: Create Glue Crawlers (example for a crawler)
-    subprocess.run(["python", "infrastructure/create_glue_crawlers.py", "churn_crawler", "arn:aws:iam::123456789012:role/GlueDevRole", "your-database-name", "s3://your-bucket-name/data/churn_data/"])
+    # Step 4: Create the Glue Database the jobs register their tables in
+    subprocess.run(["python", "infrastructure/create_glue_database.py", "your-database-name"])
 
     # Step 5: Create Glue Workflows (example for a workflow)
     subprocess.run(["python", "infrastructure/create_glue_workflows.py", "customer360_workflow"])
@@ -0,0 +1,150 @@
+import argparse
+import json
+import sys
+
+# Dependency graph of the Glue workflow. Each job starts once every job it depends on has
+# SUCCEEDED; jobs with the same dependencies start together from one trigger. add_fan_in
+# appends FAN_IN_JOB after the last jobs, behind one ALL SUCCEEDED trigger: it marks the
+# run complete (the jobs register their own catalog tables, so no crawler follows them).
+# minutes are the expected run times used for the critical path when no run history is read.
+# A job opted into the daily aggregate store (create_glue_jobs.JOB_ARGUMENTS) depends on
+# daily_aggregates instead of source_snapshot. The graph is cut to the deployed jobs with
+# select_jobs before it is validated or triggered, so daily_aggregates only joins the
+# workflow when the deploy lists it.
+WORKFLOW_DAG = {
+    "source_snapshot": {"depends_on": [], "minutes": 8},
+    "daily_aggregates": {"depends_on": ["source_snapshot"], "minutes": 6},
+    "purchase_behavior": {"depends_on": ["source_snapshot"], "minutes": 4},
+    "omni_channel_engagement": {"depends_on": ["source_snapshot"], "minutes": 5},
+    "fraud_detection": {"depends_on": ["source_snapshot"], "minutes": 5},
+    "churn_prediction": {"depends_on": ["source_snapshot"], "minutes": 6},
+    "pricing_trends": {"depends_on": ["source_snapshot"], "minutes": 7},
+}
+
+# Reads the run metrics of every job of the run and writes the workflow run's summary
+FAN_IN_JOB = "workflow_summary"
+FAN_IN_MINUTES = 1
+
+
+def select_jobs(dag, jobs=None):
+    """
+    The part of the graph covering jobs (all of it by default).
+    """
+    if jobs is None:
+        return dict(dag)
+    unknown = [job for job in jobs if job not in dag]
+    if unknown:
+        raise ValueError(f"Jobs missing from WORKFLOW_DAG: {unknown}")
+    return {job: dag[job] for job in jobs}
+
+
+def validate_dag(dag):
+    """
+    Raises ValueError for dependencies outside the graph or cycles, and returns the jobs in
+    topological order.
+    """
+    for job, node in dag.items():
+        missing = [dependency for dependency in node["depends_on"] if dependency not in dag]
+        if missing:
+            raise ValueError(f"{job} depends on jobs outside the workflow: {missing}")
+    order, state = [], {}
+
+    def visit(job, path):
+        if state.get(job) == "done":
+            return
+        if state.get(job) == "visiting":
+            raise ValueError(f"Cycle in WORKFLOW_DAG: {' -> '.join(path + [job])}")
+        state[job] = "visiting"
+        for dependency in dag[job]["depends_on"]:
+            visit(dependency, path + [job])
+        state[job] = "done"
+        order.append(job)
+
+    for job in dag:
+        visit(job, [])
+    return order
+
+
+def get_sinks(dag):
+    """
+    Jobs no other job depends on, the last ones of a workflow run.
+    """
+    dependencies = {dependency for node in dag.values() for dependency in node["depends_on"]}
+    return [job for job in dag if job not in dependencies]
+
+
+def add_fan_in(dag, job=FAN_IN_JOB, minutes=FAN_IN_MINUTES):
+    """
+    The graph with job depending on all of its sinks, so it starts once every one of them
+    has SUCCEEDED in the same workflow run.
+    """
+    return {**dag, job: {"depends_on": get_sinks(dag), "minutes": minutes}}
+
+
+def get_trigger_groups(dag):
+    """
+    {dependencies: [jobs]}: one trigger per distinct dependency set, starting all its jobs.
+    """
+    groups = {}
+    for job in validate_dag(dag):
+        groups.setdefault(tuple(sorted(dag[job]["depends_on"])), []).append(job)
+    return groups
+
+
+def get_critical_path(dag, minutes=None):
+    """
+    Returns (path, total minutes) of the longest chain of run times through the graph.
+    minutes overrides the expected run time of some jobs.
+    """
+    minutes = {job: (minutes or {}).get(job, node["minutes"]) for job, node in dag.items()}
+    finish, previous = {}, {}
+    for job in validate_dag(dag):
+        start = max((finish[dependency] for dependency in dag[job]["depends_on"]), default=0)
+        previous[job] = max(dag[job]["depends_on"], key=finish.get, default=None)
+        finish[job] = start + minutes[job]
+    job = max(get_sinks(dag), key=finish.get)
+    total = finish[job]
+    path = []
+    while job:
+        path.append(job)
+        job = previous[job]
+    return path[::-1], total
+
+
+def get_run_history_minutes(jobs, region=None, runs=10):
+    """
+    Average execution time in minutes of the last successful runs of each job, from Glue.
+    """
+    import boto3
+    client = boto3.client("glue", region_name=region)
+    minutes = {}
+    for job in jobs:
+        job_runs = [run for run in client.get_job_runs(JobName=job, MaxResults=50)["JobRuns"]
+                    if run["JobRunState"] == "SUCCEEDED"][:runs]
+        if job_runs:
+            minutes[job] = sum(run["ExecutionTime"] for run in job_runs) / len(job_runs) / 60
+    return minutes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validates WORKFLOW_DAG and prints its triggers and critical path")
+    parser.add_argument("jobs", nargs="?", help='JSON list of the deployed jobs, e.g. \'["source_snapshot", ...]\'')
+    parser.add_argument("--history", action="store_true", help="use the average run times of recent Glue runs")
+    parser.add_argument("--region")
+    options = parser.parse_args()
+
+    try:
+        dag = add_fan_in(select_jobs(WORKFLOW_DAG, json.loads(options.jobs) if options.jobs else None))
+        groups = get_trigger_groups(dag)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    for dependencies, jobs in groups.items():
+        print(f"{' + '.join(dependencies) or 'start'} -> {', '.join(jobs)}")
+    print(f"{' + '.join(get_sinks(dag))} -> end")
+
+    minutes = get_run_history_minutes(dag, options.region) if options.history else None
+    path, total = get_critical_path(dag, minutes)
+    sequential = sum((minutes or {}).get(job, node["minutes"]) for job, node in dag.items())
+    print(f"Critical path: {' -> '.join(path)} ({total:.1f} min, {sequential:.1f} min as a linear chain)")
@@ -0,0 +1,18 @@
+import pytest
+
+
+@pytest.fixture(scope="session")
+def spark():
+    """
+    A small local session shared by the tests, with the UI off and few shuffle partitions.
+    """
+    sql = pytest.importorskip("pyspark.sql")
+    spark = (
+        sql.SparkSession.builder.master("local[2]").appName("glue_etl_pipeline tests")
+        .config("spark.sql.shuffle.partitions", "2")
+        .config("spark.sql.session.timeZone", "UTC")
+        .config("spark.ui.enabled", "false")
+        .getOrCreate()
+    )
+    yield spark
+    spark.stop()
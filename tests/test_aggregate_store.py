@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("pyspark")
+import datetime
+from decimal import Decimal
+from glue_etl_pipeline.aggregate_store import STORE_STATE,project_activity,aggregate_daily,get_days_to_build,update_daily_aggregates,read_window
+from glue_etl_pipeline.utils import get_current_date,read_json
+
+
+def daily_orders(spark, rows):
+    order_df = spark.createDataFrame(rows, "customer_id BIGINT, order_id BIGINT, order_date TIMESTAMP, total_amount DECIMAL(12,2)")
+    return aggregate_daily(project_activity(
+        order_df, "customer_id", "order_date",
+        total_amount=order_df["total_amount"], last_order_date=order_df["order_date"],
+        order_count=order_df["order_id"].isNotNull(),
+    ))
+
+
+def at_noon(day):
+    return datetime.datetime.combine(day, datetime.time(12))
+
+
+def test_rebuilt_day_without_rows_keeps_none(spark, tmp_path):
+    store_path = str(tmp_path / "daily_aggregates") + "/"
+    today = get_current_date(spark)
+    yesterday = today - datetime.timedelta(days=1)
+
+    days = get_days_to_build(None, today, window_days=3)
+    update_daily_aggregates(store_path, daily_orders(spark, [(1, 10, at_noon(yesterday), Decimal("5.00")), (1, 11, at_noon(today), Decimal("7.00"))]),
+                            days, today, window_days=3)
+    assert read_window(spark, store_path, 3).first().order_count == 2
+
+    # Today's order was cancelled upstream: the rebuild has no row for today
+    days = get_days_to_build(read_json(store_path + STORE_STATE), today, window_days=3)
+    assert days == [yesterday, today]
+    update_daily_aggregates(store_path, daily_orders(spark, [(1, 10, at_noon(yesterday), Decimal("5.00"))]), days, today, window_days=3)
+
+    window = read_window(spark, store_path, 3).first()
+    assert (window.order_count, float(window.total_spent)) == (1, 5.0)
+    assert read_json(store_path + STORE_STATE)["days"] == sorted((today - datetime.timedelta(days=offset)).isoformat() for offset in range(4))
@@ -0,0 +1,47 @@
+import datetime
+import pytest
+
+pytest.importorskip("pyspark")
+from glue_etl_pipeline.churn_prediction import transform_dataframe,transform_state,update_customer_state,fold_changed_customers
+
+SCHEMA = "customer_id BIGINT, order_id BIGINT, order_date TIMESTAMP"
+
+
+def make_orders(spark):
+    start = datetime.datetime(2023, 1, 1)
+    rows = [(customer_id, customer_id * 100 + i, start + datetime.timedelta(days=customer_id * 3 + i * (customer_id + 5)))
+            for customer_id in range(1, 6) for i in range(customer_id + 1)]
+    return spark.createDataFrame(rows, SCHEMA)
+
+
+def as_dict(df):
+    return {row["customer_id"]: (row["total_orders"], row["last_order_date"], round(row["avg_order_gap"], 6))
+            for row in df.collect()}
+
+
+def test_state_folded_in_two_steps_matches_the_full_transform(spark):
+    orders_df = make_orders(spark)
+    settled_through = datetime.datetime(2023, 1, 20)
+    settled_df = orders_df.filter(orders_df.order_date <= settled_through)
+    open_df = orders_df.filter(orders_df.order_date > settled_through)
+
+    state_df = update_customer_state(None, settled_df)
+    assert as_dict(transform_state(update_customer_state(state_df, open_df))) == as_dict(transform_dataframe(orders_df))
+
+
+def test_state_with_no_new_orders_is_unchanged(spark):
+    orders_df = make_orders(spark)
+    state_df = update_customer_state(None, orders_df)
+    folded_df = update_customer_state(state_df, orders_df.limit(0))
+    assert sorted(folded_df.collect()) == sorted(state_df.collect())
+
+
+def test_folding_only_the_changed_customers_matches_the_full_fold(spark):
+    orders_df = make_orders(spark)
+    settled_through = datetime.datetime(2023, 1, 20)
+    state_df = update_customer_state(None, orders_df.filter(orders_df.order_date <= settled_through))
+    new_orders_df = orders_df.filter((orders_df.order_date > settled_through) & (orders_df.customer_id != 5))
+
+    changed_keys = new_orders_df.select("customer_id").distinct()
+    folded_df = fold_changed_customers(state_df, new_orders_df, changed_keys)
+    assert sorted(folded_df.collect()) == sorted(update_customer_state(state_df, new_orders_df).collect())
@@ -0,0 +1,56 @@
+import pytest
+
+pytest.importorskip("pyspark")
+from glue_etl_pipeline import hll
+
+
+def test_small_sets_stay_sparse_and_exact():
+    sketch = hll.add_all(hll.empty_sketch(12), [f"10.0.0.{i}" for i in range(50)] + ["10.0.0.1", None])
+    assert sketch[0] == hll.SPARSE
+    assert hll.estimate(sketch) == 50
+
+
+def test_merge_of_sparse_sketches_is_the_union():
+    left = hll.add_all(hll.empty_sketch(12), ["a", "b", "c"])
+    right = hll.add_all(hll.empty_sketch(12), ["c", "d"])
+    assert hll.estimate(hll.merge(left, right)) == 4
+
+
+def test_dense_estimate_within_error():
+    precision = 10
+    values = [f"ip-{i}" for i in range(20000)]
+    sketch = hll.add_all(hll.empty_sketch(precision), values)
+    assert sketch[0] == hll.DENSE
+    assert abs(hll.estimate(sketch) - len(values)) <= 4 * hll.relative_error(precision) * len(values)
+
+
+def test_merge_of_dense_and_sparse_equals_one_sketch_of_all_values():
+    precision = 8
+    dense = hll.add_all(hll.empty_sketch(precision), [f"ip-{i}" for i in range(5000)])
+    sparse = hll.add_all(hll.empty_sketch(precision), [f"ip-{i}" for i in range(4990, 5010)])
+    expected = hll.add_all(hll.empty_sketch(precision), [f"ip-{i}" for i in range(5010)])
+    assert hll.merge(dense, sparse) == expected
+    assert hll.merge(sparse, dense) == expected
+
+
+def test_merge_rejects_other_precisions():
+    with pytest.raises(ValueError):
+        hll.merge(hll.empty_sketch(10), hll.empty_sketch(12))
+
+
+def test_read_login_features_merges_the_daily_sketches(spark, tmp_path):
+    from datetime import date, timedelta
+    from glue_etl_pipeline.fraud_detection import build_sketch, read_login_features
+
+    today = date.today()
+    rows = [
+        (1, 3, build_sketch(["a", "b"], 12), today),
+        (1, 2, build_sketch(["b", "c"], 12), today - timedelta(days=1)),
+        (2, 1, build_sketch(["a"], 12), today),
+    ]
+    spark.createDataFrame(rows, "customer_id BIGINT, login_attempts BIGINT, ip_sketch BINARY, dt DATE") \
+        .write.partitionBy("dt").parquet(str(tmp_path / "sketches"))
+
+    features = {row.customer_id: (row.unique_ips, row.total_attempts)
+                for row in read_login_features(spark, str(tmp_path / "sketches") + "/").collect()}
+    assert features == {1: (3, 5), 2: (1, 1)}
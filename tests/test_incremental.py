@@ -0,0 +1,54 @@
+import datetime
+import pytest
+
+pytest.importorskip("pyspark")
+from glue_etl_pipeline.incremental import merge_into_snapshot
+from glue_etl_pipeline.table_format import read_manifest,read_table,stage_snapshot,commit_snapshot
+
+SCHEMA = "order_id BIGINT, total_amount DOUBLE, dt DATE"
+
+
+def test_merge_into_snapshot_rewrites_only_the_touched_partitions(spark, tmp_path):
+    current_path = str(tmp_path / "Orders" / "current") + "/"
+    day_1, day_2 = datetime.date(2024, 5, 1), datetime.date(2024, 5, 2)
+    initial_df = spark.createDataFrame([(1, 10.0, day_1), (2, 20.0, day_1), (3, 30.0, day_2)], SCHEMA)
+    commit_snapshot(current_path, {**stage_snapshot(initial_df, current_path, partition_by=["dt"]), "watermark": "2024-05-02"},
+                    catalog=False)
+    current = read_manifest(current_path)
+
+    delta_df = spark.createDataFrame([(3, 35.0, day_2), (4, 40.0, day_2)], SCHEMA)
+    snapshot = merge_into_snapshot(spark, delta_df, current_path, current, ["order_id"], ["dt"])
+    manifest = commit_snapshot(current_path, {**snapshot, "watermark": "2024-05-03"}, catalog=False)
+
+    day_1_files = [f["path"] for f in current["files"] if f["partition"]["dt"] == str(day_1)]
+    assert set(day_1_files) <= {f["path"] for f in manifest["files"]}
+    rows = {row["order_id"]: row["total_amount"] for row in read_table(spark, current_path).collect()}
+    assert rows == {1: 10.0, 2: 20.0, 3: 35.0, 4: 40.0}
+    # The previous version still reads as it was committed
+    previous_rows = {row["order_id"]: row["total_amount"] for row in read_table(spark, current_path, version=1).collect()}
+    assert previous_rows == {1: 10.0, 2: 20.0, 3: 30.0}
+
+
+def test_merge_into_snapshot_moves_a_row_whose_day_changed(spark, tmp_path):
+    current_path = str(tmp_path / "Orders" / "current") + "/"
+    day_1, day_2 = datetime.date(2024, 5, 1), datetime.date(2024, 5, 2)
+    initial_df = spark.createDataFrame([(1, 10.0, day_1), (2, 20.0, day_1)], SCHEMA)
+    commit_snapshot(current_path, {**stage_snapshot(initial_df, current_path, partition_by=["dt"]), "watermark": "2024-05-01"},
+                    catalog=False)
+
+    # Order 2 is re-extracted with its order date moved to the next day
+    delta_df = spark.createDataFrame([(2, 20.0, day_2)], SCHEMA)
+    snapshot = merge_into_snapshot(spark, delta_df, current_path, read_manifest(current_path), ["order_id"], ["dt"])
+    commit_snapshot(current_path, {**snapshot, "watermark": "2024-05-02"}, catalog=False)
+
+    rows = sorted((row["order_id"], row["dt"]) for row in read_table(spark, current_path).collect())
+    assert rows == [(1, day_1), (2, day_2)]
+
+
+def test_uncommitted_snapshot_is_invisible(spark, tmp_path):
+    current_path = str(tmp_path / "Order_Items" / "current") + "/"
+    df = spark.createDataFrame([(1, 10.0, datetime.date(2024, 5, 1))], SCHEMA)
+    commit_snapshot(current_path, stage_snapshot(df, current_path), catalog=False)
+    # A run that stages its delta and fails before the commit leaves the table as it was
+    stage_snapshot(df, current_path)
+    assert read_table(spark, current_path).count() == 1
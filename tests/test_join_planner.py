@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("pyspark")
+from glue_etl_pipeline import join_planner
+from glue_etl_pipeline.join_planner import estimate_plan_size,choose_strategy,plan_join,describe_joins
+
+
+def test_estimate_plan_size_of_a_parquet_relation(spark, tmp_path):
+    # A DataFrame built from a Python list is an RDD scan with no statistics; files have a size
+    path = str(tmp_path / "names")
+    spark.range(100).selectExpr("id", "concat('name_', id) AS name").write.parquet(path)
+    df = spark.read.parquet(path)
+    size_bytes = estimate_plan_size(df)
+    assert isinstance(size_bytes, int)
+    assert 0 < size_bytes < join_planner.BROADCAST_THRESHOLD_BYTES
+
+
+def test_estimate_plan_size_of_a_join_is_unknown(spark):
+    left = spark.createDataFrame([(i,) for i in range(10)], "id BIGINT")
+    right = spark.createDataFrame([(i, i * 2) for i in range(10)], "id BIGINT, value BIGINT")
+    assert estimate_plan_size(left.join(right, "id")) is None
+
+
+def test_choose_strategy():
+    small, large = 1024, join_planner.BROADCAST_THRESHOLD_BYTES + 1
+    assert choose_strategy(large, small) == "broadcast_right"
+    assert choose_strategy(small, large) == "broadcast_left"
+    assert choose_strategy(small, small // 2) == "broadcast_right"
+    assert choose_strategy(small, large, "left") == "sort_merge"
+    assert choose_strategy(large, large) == "sort_merge"
+    assert choose_strategy(large, None) == "adaptive"
+    assert choose_strategy(None, None) == "adaptive"
+
+
+def test_plan_join_leaves_unknown_sizes_unhinted(spark):
+    left = spark.createDataFrame([(i,) for i in range(10)], "id BIGINT")
+    right = spark.createDataFrame([(i, i * 2) for i in range(10)], "id BIGINT, value BIGINT")
+    # A join of joins has no size estimate: no merge hint may force a sort-merge join
+    joined = plan_join(left.join(right, "id"), right.join(left, "id"), "id")
+    assert "merge" not in joined._jdf.queryExecution().analyzed().toString().lower()
+    assert joined.count() == 10
+    assert "shuffle exchange" in describe_joins(joined)
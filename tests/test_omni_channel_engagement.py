@@ -0,0 +1,48 @@
+import datetime
+import pytest
+
+pytest.importorskip("pyspark")
+from glue_etl_pipeline.aggregate_store import DAILY_COUNTERS
+from glue_etl_pipeline.omni_channel_engagement import transform_sql,transform_dataframe,transform_aggregates
+
+
+def make_sources(spark):
+    today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    recent, old = today - datetime.timedelta(days=5), today - datetime.timedelta(days=200)
+    order_df = spark.createDataFrame(
+        [(1, 10, 25.0, recent), (1, 11, 5.0, recent), (2, 12, 40.0, old)],
+        "customer_id BIGINT, order_id BIGINT, total_amount DOUBLE, order_date TIMESTAMP")
+    engagement_df = spark.createDataFrame(
+        [(1, recent.isoformat(), "Email", "Opened"), (1, recent.isoformat(), "Web", "Clicked"),
+         (3, recent.isoformat(), "App", "Opened"), (2, old.isoformat(), "Email", "Clicked")],
+        "CustomerID BIGINT, Timestamp STRING, Channel STRING, Action STRING")
+    support_df = spark.createDataFrame(
+        [(1, "T1", recent.isoformat(), "Resolved"), (4, "T2", recent.isoformat(), "Open")],
+        "CustomerID BIGINT, TicketID STRING, Timestamp STRING, Status STRING")
+    order_df.createOrReplaceTempView("Orders")
+    engagement_df.createOrReplaceTempView("engagement")
+    support_df.createOrReplaceTempView("SupportTickets")
+    return order_df, engagement_df, support_df
+
+
+def test_sql_and_dataframe_transforms_publish_the_same_rows(spark):
+    sources = make_sources(spark)
+    sql_df, dataframe_df = transform_sql(spark), transform_dataframe(*sources)
+    # The published column keeps its original name
+    assert "resolved_ticjet" in sql_df.columns and "resolved_ticket" not in sql_df.columns
+    assert sql_df.columns == dataframe_df.columns
+    sql_rows = sorted(tuple(row) for row in sql_df.collect())
+    assert sql_rows == sorted(tuple(row) for row in dataframe_df.collect())
+    assert {row[0] for row in sql_rows} == {1, 3, 4}
+
+
+def test_aggregates_keep_customers_whose_counters_are_all_zero(spark):
+    # 1: an engagement action that is neither Opened nor Clicked; 2: logins only
+    window = [dict.fromkeys(DAILY_COUNTERS, 0) for _ in range(2)]
+    window[0].update(customer_id=1, channel_rows=1)
+    window[1].update(customer_id=2, login_attempts=3)
+    window_df = spark.createDataFrame([tuple(row[name] for name in ["customer_id", *DAILY_COUNTERS]) for row in window],
+                                      ", ".join(["customer_id BIGINT"] + [f"{name} BIGINT" for name in DAILY_COUNTERS]))
+
+    rows = transform_aggregates(window_df).collect()
+    assert [(row.customer_id, row.purchases, row.total_spent) for row in rows] == [(1, 0, 0)]
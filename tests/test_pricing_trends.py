@@ -0,0 +1,48 @@
+import datetime
+from decimal import Decimal
+import pytest
+
+pytest.importorskip("pyspark")
+from pyspark.sql import functions as F
+from glue_etl_pipeline.pricing_trends import transform_sql,transform_dataframe
+
+
+def make_sources(spark):
+    order_df = spark.createDataFrame(
+        [(10, 1, datetime.datetime(2024, 2, 3)), (11, 2, datetime.datetime(2024, 3, 9)), (12, 1, datetime.datetime(2024, 11, 20))],
+        "order_id BIGINT, customer_id BIGINT, order_date TIMESTAMP")
+    products_df = spark.createDataFrame([(100, "Books"), (101, "Home")], "product_id BIGINT, category STRING")
+    order_items_df = spark.createDataFrame(
+        [(10, 100, 2, Decimal("5.00")), (11, 100, 1, Decimal("7.50")), (12, 101, 3, Decimal("20.00"))],
+        "order_id BIGINT, product_id BIGINT, quantity INT, unit_price DECIMAL(10,2)")
+    order_df.createOrReplaceTempView("Orders")
+    products_df.createOrReplaceTempView("Products")
+    order_items_df.createOrReplaceTempView("Order_Items")
+    return order_df, products_df, order_items_df
+
+
+def test_quarterly_trends_keep_the_published_columns_and_types(spark):
+    order_df, products_df, order_items_df = make_sources(spark)
+    # What the job published before the monthly rollup: AVG / SUM over the order lines
+    expected = (
+        order_df.join(order_items_df, "order_id")
+        .groupBy("product_id", F.year("order_date").alias("order_year"), F.date_format("order_date", "Q").alias("order_quarter"))
+        .agg(F.avg("unit_price").alias("avg_unit_price"),
+             F.sum(F.col("quantity") * F.col("unit_price")).alias("total_sales"),
+             F.sum("quantity").alias("total_qt"))
+    )
+    for quarterly_df in (transform_sql(spark)[1], transform_dataframe(order_df, products_df, order_items_df)[1]):
+        assert [(field.name, field.dataType) for field in quarterly_df.schema.fields] == \
+            [(field.name, field.dataType) for field in expected.schema.fields]
+        assert sorted(quarterly_df.collect()) == sorted(expected.collect())
+
+
+def test_monthly_aggregate_is_released_by_name(spark):
+    order_df, products_df, order_items_df = make_sources(spark)
+    for transform in (lambda: transform_sql(spark), lambda: transform_dataframe(order_df, products_df, order_items_df)):
+        monthly_trends = transform()[0]
+        monthly_trends.count()
+        assert spark.catalog.isCached("monthly_sales")
+        # What run_job does after the writes
+        spark.catalog.uncacheTable("monthly_sales")
+        assert not spark.catalog.isCached("monthly_sales")
@@ -0,0 +1,107 @@
+import pytest
+
+pytest.importorskip("pyspark")
+from glue_etl_pipeline.table_format import BUCKET_COLUMN,stage_snapshot,commit_snapshot,write_table,merge_table,read_table,read_manifest,get_merge_buckets
+
+
+def rows(df):
+    return sorted(tuple(row) for row in df.collect())
+
+
+def test_commit_round_trip_and_earlier_versions(spark, tmp_path):
+    table_path = str(tmp_path / "orders")
+    first = spark.createDataFrame([(1, "a", 2024), (2, "b", 2025)], "id BIGINT, name STRING, order_year INT")
+    second = spark.createDataFrame([(3, "c", 2025)], "id BIGINT, name STRING, order_year INT")
+
+    assert read_manifest(table_path) is None
+    assert write_table(first, table_path, partition_by=["order_year"]) == 2
+    assert write_table(second, table_path, partition_by=["order_year"]) == 1
+
+    manifest = read_manifest(table_path)
+    assert (manifest["version"], manifest["parent_version"], manifest["row_count"]) == (2, 1, 1)
+    assert {f["partition"]["order_year"] for f in manifest["files"]} == {"2025"}
+    assert rows(read_table(spark, table_path)) == [(3, "c", 2025)]
+    assert rows(read_table(spark, table_path, version=1)) == [(1, "a", 2024), (2, "b", 2025)]
+    assert rows(read_table(spark, table_path, version=1, partition_filter={"order_year": 2024})) == [(1, "a", 2024)]
+
+
+def test_staged_snapshot_is_invisible_until_committed(spark, tmp_path):
+    table_path = str(tmp_path / "orders")
+    write_table(spark.createDataFrame([(1,)], "id BIGINT"), table_path)
+    snapshot = stage_snapshot(spark.createDataFrame([(2,), (3,)], "id BIGINT"), table_path)
+
+    assert rows(read_table(spark, table_path)) == [(1,)]
+    commit_snapshot(table_path, snapshot)
+    assert rows(read_table(spark, table_path)) == [(2,), (3,)]
+
+
+def test_commit_refuses_a_version_written_concurrently(spark, tmp_path):
+    table_path = str(tmp_path / "orders")
+    write_table(spark.createDataFrame([(1,)], "id BIGINT"), table_path)
+    snapshot = stage_snapshot(spark.createDataFrame([(2,)], "id BIGINT"), table_path)
+    # Another writer already wrote version 2 but has not switched _latest.json yet
+    other = stage_snapshot(spark.createDataFrame([(3,)], "id BIGINT"), table_path)
+    commit_snapshot(table_path, other)
+    (tmp_path / "orders" / "_manifest" / "_latest.json").write_text('{"version": 1}')
+
+    with pytest.raises(RuntimeError):
+        commit_snapshot(table_path, snapshot)
+
+
+def customers(spark, rows):
+    return spark.createDataFrame(rows, "customer_id BIGINT, total_spent DOUBLE")
+
+
+def test_merge_rewrites_only_the_changed_buckets(spark, tmp_path):
+    table_path = str(tmp_path / "customers")
+    merge_table(customers(spark, [(i, float(i)) for i in range(40)]), table_path, ["customer_id"], buckets=4)
+    first = read_manifest(table_path)
+
+    changed = [(i, float(i) + (100.0 if i == 7 else 0.0)) for i in range(40) if i != 3] + [(40, 40.0)]
+    merge_table(customers(spark, changed), table_path, ["customer_id"], buckets=4)
+    merged = read_manifest(table_path)
+
+    assert rows(read_table(spark, table_path).drop(BUCKET_COLUMN)) == sorted(changed)
+    assert merged["row_count"] == 40
+    kept = [f for f in merged["files"] if f["snapshot_path"] == first["snapshot_path"]]
+    assert {int(f["partition"][BUCKET_COLUMN]) for f in kept}.isdisjoint(merged["changed_buckets"])
+    assert 0 < len(merged["changed_buckets"]) <= 3
+
+    assert merge_table(customers(spark, changed), table_path, ["customer_id"], buckets=4) == 0
+    assert read_manifest(table_path)["version"] == merged["version"]
+
+
+def test_merge_buckets_follow_the_table_size(spark, tmp_path):
+    table_path = str(tmp_path / "customers")
+    merge_table(customers(spark, [(i, float(i)) for i in range(400)]), table_path, ["customer_id"])
+    manifest = read_manifest(table_path)
+    assert manifest["bucketing"]["buckets"] == 1
+    assert len(manifest["files"]) == 1
+
+    size_bytes = sum(f["size"] for f in manifest["files"])
+    # Kept while within a factor of 2, rebucketed beyond it
+    assert get_merge_buckets(None, manifest, target_file_bytes=size_bytes / 2) == 1
+    assert get_merge_buckets(None, manifest, target_file_bytes=size_bytes / 8) == 8
+    assert get_merge_buckets(None, manifest, target_file_bytes=1, max_buckets=16) == 16
+
+
+def test_merge_commits_changed_details_without_rewriting(spark, tmp_path):
+    table_path = str(tmp_path / "customers")
+    df = customers(spark, [(i, float(i)) for i in range(10)])
+    merge_table(df, table_path, ["customer_id"], buckets=2, details={"watermark": "2024-05-01"}, catalog=False)
+    first = read_manifest(table_path)
+
+    assert merge_table(df, table_path, ["customer_id"], buckets=2, details={"watermark": "2024-05-02"}, catalog=False) == 0
+    manifest = read_manifest(table_path)
+    assert (manifest["version"], manifest["watermark"]) == (first["version"] + 1, "2024-05-02")
+    assert manifest["files"] == first["files"]
+    assert rows(read_table(spark, table_path).drop(BUCKET_COLUMN)) == rows(df)
+
+
+def test_on_write_sees_the_dataframe_written(spark, tmp_path):
+    table_path = str(tmp_path / "customers")
+    written = []
+    merge_table(customers(spark, [(1, 1.0), (2, 2.0)]), table_path, ["customer_id"], buckets=2, on_write=written.append)
+
+    assert len(written) == 1
+    assert BUCKET_COLUMN in written[0].columns
@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("pyspark")
+from glue_etl_pipeline.top_k import top_k_by_group
+
+
+def test_top_k_by_group_keeps_ties_with_the_kth(spark):
+    df = spark.createDataFrame([
+        ("US", 1, 50.0), ("US", 2, 40.0), ("US", 3, 40.0), ("US", 4, 10.0),
+        ("UK", 5, 30.0), ("UK", 6, None),
+    ], "country STRING, customer_id BIGINT, total_spent DOUBLE")
+
+    rows = top_k_by_group(df, "country", "total_spent", 2, rank_column="spending_rank").collect()
+
+    assert sorted((row.country, row.customer_id, row.spending_rank) for row in rows) == [
+        ("UK", 5, 1), ("UK", 6, 2), ("US", 1, 1), ("US", 2, 2), ("US", 3, 2),
+    ]
+
+
+def test_top_k_by_group_matches_rank_in_sql(spark):
+    df = spark.createDataFrame([(i % 3, i, float(i % 7)) for i in range(60)], "grp INT, id BIGINT, score DOUBLE")
+    df.createOrReplaceTempView("top_k_input")
+    expected = spark.sql("""
+        SELECT * FROM (
+            SELECT *, RANK() OVER (PARTITION BY grp ORDER BY score DESC) AS rank FROM top_k_input
+        ) WHERE rank <= 4
+    """)
+
+    assert sorted(top_k_by_group(df, "grp", "score", 4).collect()) == sorted(expected.collect())
@@ -0,0 +1,41 @@
+import pytest
+from infrastructure.workflow_dag import WORKFLOW_DAG,FAN_IN_JOB,select_jobs,validate_dag,get_sinks,add_fan_in,get_trigger_groups,get_critical_path
+
+
+def node(depends_on, minutes=1):
+    return {"depends_on": depends_on, "minutes": minutes}
+
+
+def test_workflow_dag_is_valid():
+    order = validate_dag(WORKFLOW_DAG)
+    assert sorted(order) == sorted(WORKFLOW_DAG)
+    for job, job_node in WORKFLOW_DAG.items():
+        assert all(order.index(dependency) < order.index(job) for dependency in job_node["depends_on"])
+
+
+def test_validate_dag_rejects_cycles_and_missing_jobs():
+    with pytest.raises(ValueError, match="Cycle"):
+        validate_dag({"a": node(["c"]), "b": node(["a"]), "c": node(["b"])})
+    with pytest.raises(ValueError, match="outside the workflow"):
+        validate_dag({"a": node(["snapshot"])})
+    with pytest.raises(ValueError, match="missing from WORKFLOW_DAG"):
+        select_jobs(WORKFLOW_DAG, ["source_snapshot", "unknown_job"])
+
+
+def test_trigger_groups_and_sinks():
+    dag = {"snapshot": node([]), "a": node(["snapshot"]), "b": node(["snapshot"]), "c": node(["a", "b"])}
+    assert get_trigger_groups(dag) == {(): ["snapshot"], ("snapshot",): ["a", "b"], ("a", "b"): ["c"]}
+    assert get_sinks(dag) == ["c"]
+
+
+def test_fan_in_follows_every_deployed_sink():
+    dag = add_fan_in(select_jobs(WORKFLOW_DAG, ["source_snapshot", "purchase_behavior", "pricing_trends"]))
+    assert get_sinks(dag) == [FAN_IN_JOB]
+    assert get_trigger_groups(dag)[("pricing_trends", "purchase_behavior")] == [FAN_IN_JOB]
+
+
+def test_critical_path_follows_the_longest_chain():
+    dag = {"snapshot": node([], 8), "a": node(["snapshot"], 4), "b": node(["snapshot"], 7), "c": node(["a", "b"], 2)}
+    assert get_critical_path(dag) == (["snapshot", "b", "c"], 17)
+    # Run history overrides the expected minutes
+    assert get_critical_path(dag, {"a": 10}) == (["snapshot", "a", "c"], 20)